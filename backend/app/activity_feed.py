@@ -0,0 +1,234 @@
+"""
+In-process activity feed for the admin dashboard
+Recent events live in a bounded ring buffer so polling never touches the database;
+events are persisted asynchronously to the activity_log table and reloaded on startup.
+Processes without a running feed (queue workers, scripts) write their events
+straight to activity_log, and the API's writer thread pulls them in.
+The API must run as a single process: with several uvicorn workers each one
+would only show the events it recorded itself.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from . import database, models
+
+logger = logging.getLogger(__name__)
+
+# How often the API picks up events recorded by other processes
+SYNC_SECONDS = float(os.getenv("ACTIVITY_FEED_SYNC_SECONDS", "5"))
+# Events committed late by another process can carry an earlier created_at
+SYNC_OVERLAP = timedelta(seconds=30)
+# activity_log rows older than this are deleted; 0 keeps them forever
+RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "90"))
+PRUNE_SECONDS = 3600
+
+EVENT_DESCRIPTIONS = {
+    "signup": "New learner signup",
+    "enrollment": "Enrolled in {course_title}",
+    "quiz_submission": "Scored {score}% on {course_title}",
+    "completion": "Completed {course_title}",
+}
+
+
+class ActivityFeed:
+    """Bounded ring buffer of recent events with a background persistence writer"""
+
+    def __init__(self, capacity: int = 500, batch_size: int = 100):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = None
+        self._stopping = threading.Event()
+        # Newest persisted created_at seen; later rows come from other processes
+        self._synced_to = None
+
+    def record(
+        self,
+        event_type: str,
+        user_id: Optional[UUID] = None,
+        full_name: Optional[str] = None,
+        course_id: Optional[UUID] = None,
+        course_title: Optional[str] = None,
+        score: Optional[int] = None,
+    ) -> Dict:
+        """
+        Add an event to the feed and queue it for persistence. Without a
+        running writer (outside the API) the event is persisted immediately,
+        so the API process can pick it up.
+        """
+        event = {
+            "id": uuid.uuid4(),
+            "event_type": event_type,
+            "user_id": user_id,
+            "full_name": full_name,
+            "course_id": course_id,
+            "course_title": course_title,
+            "description": EVENT_DESCRIPTIONS.get(event_type, event_type).format(
+                course_title=course_title or "a course", score=score
+            ),
+            "created_at": datetime.utcnow(),
+        }
+        with self._lock:
+            self._events.append(event)
+        if self._writer and self._writer.is_alive():
+            self._pending.put(event)
+        else:
+            self._persist([event])
+        return event
+
+    def recent(self, limit: int = 20, event_type: Optional[str] = None) -> List[Dict]:
+        """Newest-first events from the ring buffer"""
+        with self._lock:
+            events = list(self._events)
+        events.reverse()
+        if event_type:
+            events = [e for e in events if e["event_type"] == event_type]
+        return events[:limit]
+
+    def rehydrate(self, db) -> int:
+        """Load the most recent persisted events into the ring buffer"""
+        rows = (
+            db.query(models.ActivityLog)
+            .order_by(models.ActivityLog.created_at.desc())
+            .limit(self.capacity)
+            .all()
+        )
+        with self._lock:
+            self._events.clear()
+            for row in reversed(rows):
+                self._events.append(self._from_row(row))
+            self._synced_to = rows[0].created_at if rows else None
+        logger.info(f"Rehydrated activity feed with {len(rows)} events")
+        return len(rows)
+
+    def sync(self, db) -> int:
+        """Merge in events persisted by other processes since the last sync"""
+        query = db.query(models.ActivityLog)
+        if self._synced_to is not None:
+            query = query.filter(
+                models.ActivityLog.created_at > self._synced_to - SYNC_OVERLAP
+            )
+        rows = (
+            query.order_by(models.ActivityLog.created_at.desc())
+            .limit(self.capacity)
+            .all()
+        )
+        if not rows:
+            return 0
+        with self._lock:
+            known = {event["id"] for event in self._events}
+            new = [self._from_row(row) for row in rows if row.id not in known]
+            if new:
+                events = sorted(list(self._events) + new, key=lambda e: e["created_at"])
+                self._events.clear()
+                self._events.extend(events)
+            if self._synced_to is None or rows[0].created_at > self._synced_to:
+                self._synced_to = rows[0].created_at
+        return len(new)
+
+    def prune(self, db, retention_days: int = RETENTION_DAYS) -> int:
+        """Delete persisted events older than the retention period"""
+        if retention_days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        deleted = (
+            db.query(models.ActivityLog)
+            .filter(models.ActivityLog.created_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} activity events older than {cutoff}")
+        return deleted
+
+    @staticmethod
+    def _from_row(row) -> Dict:
+        return {
+            "id": row.id,
+            "event_type": row.event_type,
+            "user_id": row.user_id,
+            "full_name": row.full_name,
+            "course_id": row.course_id,
+            "course_title": row.course_title,
+            "description": row.description,
+            "created_at": row.created_at,
+        }
+
+    def start(self):
+        """Start the background writer that persists queued events"""
+        if self._writer and self._writer.is_alive():
+            return
+        self._stopping.clear()
+        self._writer = threading.Thread(
+            target=self._run_writer, name="activity-feed-writer", daemon=True
+        )
+        self._writer.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer after flushing whatever is still queued"""
+        self._stopping.set()
+        if self._writer:
+            self._writer.join(timeout=timeout)
+            self._writer = None
+
+    def _run_writer(self):
+        next_sync = time.monotonic() + SYNC_SECONDS
+        next_prune = time.monotonic()
+        while not (self._stopping.is_set() and self._pending.empty()):
+            now = time.monotonic()
+            sync, prune = now >= next_sync, now >= next_prune
+            if sync or prune:
+                self._maintain(sync, prune)
+                if sync:
+                    next_sync = now + SYNC_SECONDS
+                if prune:
+                    next_prune = now + PRUNE_SECONDS
+            try:
+                batch = [self._pending.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._persist(batch)
+
+    def _maintain(self, sync: bool, prune: bool):
+        db = database.SessionLocal()
+        try:
+            if prune:
+                self.prune(db)
+            if sync:
+                self.sync(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Activity feed maintenance failed: {e}")
+        finally:
+            db.close()
+
+    def _persist(self, batch: List[Dict]):
+        db = database.SessionLocal()
+        try:
+            db.bulk_insert_mappings(models.ActivityLog, batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to persist {len(batch)} activity events: {e}")
+        finally:
+            db.close()
+
+
+# Shared feed used by the write paths in crud and the admin endpoint
+feed = ActivityFeed()
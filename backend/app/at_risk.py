@@ -0,0 +1,148 @@
+"""
+At-risk learner detection
+Scores every open enrollment with a vectorized logistic model over features
+loaded in chunks from learning_facts, and stores the flagged enrollments
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from . import models
+from .crud import PASSING_SCORE
+
+logger = logging.getLogger(__name__)
+
+# Logistic model weights over normalized features (each roughly 0-1)
+INTERCEPT = -3.5
+WEIGHTS = {
+    "low_coverage": 2.0,  # 1 - playback coverage
+    "stalled": 2.5,  # days since last activity, saturating at STALL_DAYS
+    "failed_attempts": 1.5,  # failed quiz attempts, saturating at 3
+    "assignment_age": 1.5,  # days since assignment, saturating at DUE_DAYS
+    "never_started": 1.0,
+}
+STALL_DAYS = 14.0
+DUE_DAYS = 30.0
+RISK_THRESHOLD = 0.5
+
+REASON_LABELS = {
+    "low_coverage": "Low video coverage",
+    "stalled": "No recent activity",
+    "failed_attempts": "Failed quiz attempts",
+    "assignment_age": "Assignment is getting old",
+    "never_started": "Never started",
+}
+
+
+def _iter_fact_chunks(db, chunk_size: int) -> Iterator[List[tuple]]:
+    query = (
+        db.query(
+            models.LearningFact.user_id,
+            models.LearningFact.course_id,
+            models.LearningFact.enrolled_at,
+            models.LearningFact.started,
+            models.LearningFact.playback_position,
+            models.LearningFact.best_score,
+            models.LearningFact.attempts,
+            models.LearningFact.last_activity_at,
+        )
+        .filter(
+            models.LearningFact.enrolled_at.isnot(None),
+            models.LearningFact.completed.isnot(True),
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+    chunk = []
+    for row in query:
+        chunk.append(tuple(row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def score_features(rows: List[tuple], now: datetime) -> Dict[str, np.ndarray]:
+    """Build the feature matrix for a chunk of enrollments and score it"""
+    _, _, enrolled_at, started, position, best_score, attempts, last_activity = zip(
+        *rows
+    )
+    now_ts = now.timestamp()
+
+    enrolled_ts = np.array([d.timestamp() for d in enrolled_at], dtype=np.float64)
+    last_ts = np.array(
+        [d.timestamp() if d else np.nan for d in last_activity], dtype=np.float64
+    )
+    last_ts = np.where(np.isnan(last_ts), enrolled_ts, last_ts)
+    coverage = np.clip(
+        np.array([p or 0.0 for p in position], dtype=np.float64), 0.0, 1.0
+    )
+    best = np.array([s if s is not None else -1 for s in best_score], dtype=np.float64)
+    attempt_count = np.array([a or 0 for a in attempts], dtype=np.float64)
+    started_flag = np.array([bool(s) for s in started], dtype=bool)
+
+    seconds_per_day = 86400.0
+    features = np.column_stack(
+        [
+            1.0 - coverage,
+            np.minimum((now_ts - last_ts) / seconds_per_day / STALL_DAYS, 1.0),
+            np.where(best < PASSING_SCORE, np.minimum(attempt_count / 3.0, 1.0), 0.0),
+            np.minimum((now_ts - enrolled_ts) / seconds_per_day / DUE_DAYS, 1.0),
+            (~started_flag).astype(np.float64),
+        ]
+    )
+    weights = np.array(list(WEIGHTS.values()), dtype=np.float64)
+    risk = 1.0 / (1.0 + np.exp(-(INTERCEPT + features @ weights)))
+    return {"features": features, "risk": risk}
+
+
+def detect_at_risk(db, chunk_size: int = 5000, now: datetime = None) -> Dict[str, int]:
+    """
+    Rescore every open enrollment and replace the at_risk_enrollments table
+    with the ones at or above RISK_THRESHOLD.
+    """
+    now = now or datetime.utcnow()
+    reason_names = list(WEIGHTS)
+    weights = np.array(list(WEIGHTS.values()), dtype=np.float64)
+
+    scored = flagged = 0
+    db.query(models.AtRiskEnrollment).delete(synchronize_session=False)
+
+    for rows in _iter_fact_chunks(db, chunk_size):
+        result = score_features(rows, now)
+        risk = result["risk"]
+        mask = risk >= RISK_THRESHOLD
+        scored += len(rows)
+        if not mask.any():
+            continue
+
+        # The two largest weighted contributions explain each flag
+        contributions = result["features"][mask] * weights
+        top_reasons = np.argsort(-contributions, axis=1)[:, :2]
+
+        records = []
+        for idx, row_index in enumerate(np.flatnonzero(mask)):
+            user_id, course_id = rows[row_index][0], rows[row_index][1]
+            reasons = [
+                REASON_LABELS[reason_names[r]]
+                for r in top_reasons[idx]
+                if contributions[idx, r] > 0
+            ]
+            records.append(
+                {
+                    "user_id": user_id,
+                    "course_id": course_id,
+                    "risk_score": round(float(risk[row_index]), 3),
+                    "reasons": ", ".join(reasons),
+                    "scored_at": now,
+                }
+            )
+        db.bulk_insert_mappings(models.AtRiskEnrollment, records)
+        flagged += len(records)
+
+    db.commit()
+    logger.info(f"Scored {scored} enrollments, flagged {flagged} as at risk")
+    return {"scored": scored, "flagged": flagged}
@@ -0,0 +1,180 @@
+"""
+Map-reduce helpers for generating quizzes from long documents
+Text is split into token-budgeted chunks, each chunk gets a share of the
+questions in proportion to its size, and the per-chunk results are merged
+and deduplicated
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from .limits import run_limited
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English prose; good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = int(os.getenv("QUIZ_CHUNK_TOKENS", "7500"))
+MAP_CONCURRENCY = int(os.getenv("QUIZ_MAP_CONCURRENCY", "4"))
+# Extra attempts for a chunk whose generation raised
+CHUNK_RETRIES = int(os.getenv("QUIZ_CHUNK_RETRIES", "1"))
+# Largest fraction of the requested questions a quiz may be missing; beyond
+# this generation fails, so the job is retried instead of saving a short quiz
+MAX_SHORTFALL = float(os.getenv("QUIZ_MAX_SHORTFALL", "0.2"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(piece: str, max_chars: int) -> List[str]:
+    """Split a paragraph longer than the budget on sentences, then hard-wrap"""
+    parts, current = [], ""
+    for sentence in _SENTENCE_END.split(piece):
+        while len(sentence) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            parts.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, breaking on paragraph
+    boundaries where possible so questions are not built from half a section
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks, current = [], ""
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = (
+            _split_oversized(paragraph, max_chars)
+            if len(paragraph) > max_chars
+            else [paragraph]
+        )
+        for piece in pieces:
+            if current and len(current) + len(piece) + 2 > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def allocate_quotas(sizes: List[int], total: int) -> List[int]:
+    """
+    Split total questions across chunks in proportion to their sizes using
+    largest remainders, so the quotas always add up to exactly total
+    """
+    weight = sum(sizes)
+    if not sizes or total <= 0:
+        return [0] * len(sizes)
+    if weight == 0:
+        sizes, weight = [1] * len(sizes), len(sizes)
+
+    exact = [total * size / weight for size in sizes]
+    quotas = [int(share) for share in exact]
+    by_remainder = sorted(
+        range(len(sizes)), key=lambda i: exact[i] - quotas[i], reverse=True
+    )
+    for i in by_remainder[: total - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+def normalize_stem(question: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]+", " ", question.lower()).split())
+
+
+def merge_questions(results: List[List[Dict]], num_questions: int) -> List[Dict]:
+    """Concatenate per-chunk questions in document order, dropping repeated stems"""
+    merged, seen = [], set()
+    for questions in results:
+        for question in questions:
+            stem = normalize_stem(question.get("question", ""))
+            if not stem or stem in seen:
+                continue
+            seen.add(stem)
+            merged.append(question)
+    return merged[:num_questions]
+
+
+def check_shortfall(generated: int, num_questions: int):
+    """Raise if generated is short of num_questions by more than MAX_SHORTFALL"""
+    if generated < num_questions * (1 - MAX_SHORTFALL):
+        raise ValueError(f"Generated only {generated} of {num_questions} questions")
+
+
+def map_reduce_questions(
+    text: str,
+    num_questions: int,
+    generate_chunk: Callable[[str, int], List[Dict]],
+    max_tokens: int = CHUNK_TOKENS,
+    concurrency: int = MAP_CONCURRENCY,
+    limit_key: str = "gemini",
+) -> List[Dict]:
+    """
+    Generate num_questions from the whole of text. generate_chunk(chunk, quota)
+    is called for every chunk with a non-zero quota, at most `concurrency` at a
+    time and each under the provider limit named by limit_key. A chunk that
+    raises is retried CHUNK_RETRIES times; the call fails if the merged result
+    is still short by more than MAX_SHORTFALL (see check_shortfall).
+    """
+    chunks = split_into_chunks(text, max_tokens)
+    quotas = allocate_quotas([len(chunk) for chunk in chunks], num_questions)
+    work = [(chunk, quota) for chunk, quota in zip(chunks, quotas) if quota > 0]
+    if len(chunks) > 1:
+        logger.info(
+            f"Split {len(text)} chars into {len(chunks)} chunks, quotas {quotas}"
+        )
+
+    def run(item):
+        chunk, quota = item
+        for attempt in range(CHUNK_RETRIES + 1):
+            try:
+                return run_limited(limit_key, generate_chunk, chunk, quota)
+            except Exception as e:
+                if attempt < CHUNK_RETRIES:
+                    logger.warning(f"Chunk generation failed, retrying: {e}")
+                    continue
+                if len(work) == 1:
+                    raise
+                logger.error(f"Chunk generation failed ({quota} questions lost): {e}")
+                return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(work)))) as pool:
+        results = list(pool.map(run, work))
+
+    if all(result is None for result in results):
+        raise ValueError("Failed to generate quiz: every chunk failed")
+
+    questions = merge_questions([r for r in results if r], num_questions)
+    if len(questions) < num_questions:
+        logger.warning(
+            f"Merged {len(questions)} unique questions instead of {num_questions}"
+        )
+        check_shortfall(len(questions), num_questions)
+    return questions
@@ -1,6 +1,21 @@
+import base64
+import json
+import random
+from datetime import date, datetime, timedelta
+from statistics import median
+from sqlalchemy import Date, case, func, or_, select, union, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
 from . import models, schemas, auth
+from .activity_feed import feed
+from .leaderboard import leaderboards
+from .pdf_cache import invalidate_resource as invalidate_pdf_text
+from .question_index import question_index
+from .sketches import ActivityBitmap, HyperLogLog, ScoreHistogram
+
+# Minimum quiz percentage that counts as a pass and completes the course
+PASSING_SCORE = 70
 
 
 def get_user_by_email(db: Session, email: str):
@@ -18,6 +33,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    feed.record("signup", user_id=db_user.id, full_name=db_user.full_name)
     return db_user
 
 
@@ -77,6 +93,7 @@ def update_course(db: Session, course_id: UUID, course_update: schemas.CourseUpd
     db.refresh(db_course)
     db.commit()
     db.refresh(db_course)
+    invalidate_course_funnel(course_id)
     return db_course
 
 
@@ -98,12 +115,21 @@ def assign_course(db: Session, user_id: UUID, course_id: UUID):
     if existing:
         return existing
 
-    enrollment = models.Enrollment(user_id=user_id, course_id=course_id)
+    now = datetime.utcnow()
+    enrollment = models.Enrollment(
+        user_id=user_id, course_id=course_id, assigned_at=now
+    )
     progress = models.Progress(user_id=user_id, course_id=course_id)
 
+    fact = get_learning_fact(db, user_id, course_id)
+    fact.enrolled_at = now
+    record_activity(db, new_enrollments=1)
+
     db.add(enrollment)
     db.add(progress)
     db.commit()
+    invalidate_course_funnel(course_id)
+    record_feed_event(db, "enrollment", user_id, course_id)
     return enrollment
 
 
@@ -132,11 +158,24 @@ def update_progress(
     if not progress:
         return None
 
+    was_completed = bool(progress.is_completed)
     progress.is_completed = updates.is_completed
     progress.playback_position = updates.playback_position
     progress.notes = updates.notes
+
+    fact = get_learning_fact(db, user_id, course_id)
+    fact.completed = bool(progress.is_completed)
+    fact.playback_position = progress.playback_position or 0.0
+    fact.started = bool(fact.started or fact.completed or fact.playback_position > 0)
+    fact.last_activity_at = datetime.utcnow()
+    record_activity(db, active_user_id=user_id, progress_updates=1)
+    mark_user_active(db, user_id)
+
     db.commit()
     db.refresh(progress)
+    invalidate_course_funnel(course_id)
+    if progress.is_completed and not was_completed:
+        record_feed_event(db, "completion", user_id, course_id)
     return progress
 
 
@@ -149,6 +188,7 @@ def create_quiz(db: Session, quiz: schemas.QuizCreate):
     db.add(db_quiz)
     db.commit()
     db.refresh(db_quiz)
+    question_index.add_quiz(db_quiz.course_id, db_quiz.id, db_quiz.questions)
     return db_quiz
 
 
@@ -217,8 +257,14 @@ def submit_quiz(db: Session, user_id: UUID, quiz_id: UUID, answers: list[int]):
     )
     db.add(submission)
 
+    fact = get_learning_fact(db, user_id, quiz.course_id)
+    fact.attempts = (fact.attempts or 0) + 1
+    fact.best_score = max(fact.best_score or 0, percentage)
+    fact.last_activity_at = datetime.utcnow()
+
     # If score >= 70%, mark course as completed
-    if percentage >= 70:
+    newly_completed = False
+    if percentage >= PASSING_SCORE:
         progress = (
             db.query(models.Progress)
             .filter(
@@ -227,6 +273,7 @@ def submit_quiz(db: Session, user_id: UUID, quiz_id: UUID, answers: list[int]):
             )
             .first()
         )
+        newly_completed = not (progress and progress.is_completed)
         if not progress:
             # Create progress record if it doesn't exist
             progress = models.Progress(
@@ -241,8 +288,26 @@ def submit_quiz(db: Session, user_id: UUID, quiz_id: UUID, answers: list[int]):
             progress.is_completed = True
             progress.playback_position = 1.0  # Mark as fully complete
 
+        fact.completed = True
+        fact.started = True
+        fact.playback_position = 1.0
+
+    record_quiz_score(db, quiz, percentage)
+    mark_user_active(db, user_id)
+    record_activity(
+        db,
+        active_user_id=user_id,
+        submissions=1,
+        passes=1 if percentage >= PASSING_SCORE else 0,
+    )
+
     db.commit()
     db.refresh(submission)
+    invalidate_course_funnel(quiz.course_id)
+    leaderboards.record(quiz.course_id, user_id, percentage)
+    record_feed_event(db, "quiz_submission", user_id, quiz.course_id, score=percentage)
+    if newly_completed:
+        record_feed_event(db, "completion", user_id, quiz.course_id)
     return submission
 
 
@@ -260,58 +325,236 @@ def get_resources(db: Session, course_id: UUID):
     )
 
 
-def get_user_reports(db: Session, skip: int = 0, limit: int = 100):
-    # Query all users (learners) and their progress
-    users = (
-        db.query(models.User)
-        .filter(models.User.role == "learner")
-        .options(joinedload(models.User.progress))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+REPORT_SORT_FIELDS = (
+    "full_name",
+    "email",
+    "courses_enrolled",
+    "courses_completed",
+    "completion_percentage",
+)
 
-    report_data = []
 
-    for user in users:
-        total_courses = len(
-            user.progress
-        )  # Correct way to count enrollments since progress is created on enrollment
-        completed_courses = sum(1 for p in user.progress if p.is_completed)
+def _learner_columns():
+    return (
+        models.User.id.label("user_id"),
+        func.coalesce(models.User.full_name, "").label("full_name"),
+        models.User.email.label("email"),
+    )
+
 
-        # Calculate completion percentage
-        # Logic: (Sum of individual course progress) / total_courses
-        # Each course progress is either 1.0 (completed) or playback_position (float 0-1)
-        total_progress_sum = sum(
-            1.0 if p.is_completed else (p.playback_position or 0.0)
-            for p in user.progress
+def _user_report_subquery(db: Session, learners=None):
+    """
+    Report aggregates per learner; only for the learners in `learners` (a
+    subquery with user_id, full_name and email) if given, otherwise for all
+    """
+    if learners is None:
+        learners = (
+            db.query(*_learner_columns())
+            .filter(models.User.role == "learner")
+            .subquery()
+        )
+    # Aggregate each learner's enrolled courses from the learning_facts table
+    # Each course progress is either 1.0 (completed) or playback_position (float 0-1)
+    enrolled_fact = (models.LearningFact.user_id == learners.c.user_id) & (
+        models.LearningFact.enrolled_at.isnot(None)
+    )
+    courses_enrolled = func.count(models.LearningFact.id)
+    progress_sum = func.coalesce(
+        func.sum(
+            case(
+                (models.LearningFact.completed.is_(True), 1.0),
+                else_=func.coalesce(models.LearningFact.playback_position, 0.0),
+            )
+        ),
+        0.0,
+    )
+    return (
+        db.query(
+            learners.c.user_id,
+            learners.c.full_name,
+            learners.c.email,
+            courses_enrolled.label("courses_enrolled"),
+            func.coalesce(
+                func.sum(case((models.LearningFact.completed.is_(True), 1), else_=0)),
+                0,
+            ).label("courses_completed"),
+            case(
+                (courses_enrolled > 0, progress_sum * 100.0 / courses_enrolled),
+                else_=0.0,
+            ).label("completion_percentage"),
         )
+        .outerjoin(models.LearningFact, enrolled_fact)
+        .group_by(learners.c.user_id, learners.c.full_name, learners.c.email)
+        .subquery()
+    )
+
+
+def _user_report_row(row) -> dict:
+    return {
+        "user_id": row.user_id,
+        "full_name": row.full_name,
+        "email": row.email,
+        "courses_enrolled": row.courses_enrolled,
+        "courses_completed": row.courses_completed,
+        "completion_percentage": round(float(row.completion_percentage), 1),
+    }
+
+
+def encode_report_cursor(sort_value, user_id) -> str:
+    payload = json.dumps([sort_value, str(user_id)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_report_cursor(cursor: str):
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        sort_value, user_id = json.loads(payload)
+        return sort_value, UUID(user_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
 
-        completion_percentage = 0.0
-        if total_courses > 0:
-            completion_percentage = (total_progress_sum / total_courses) * 100
-
-        report_data.append(
-            schemas.UserReportItem(
-                user_id=user.id,
-                full_name=user.full_name,
-                email=user.email,
-                courses_enrolled=total_courses,
-                courses_completed=completed_courses,
-                completion_percentage=round(completion_percentage, 1),
+def get_user_reports(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    sort_by: str = "full_name",
+    order: str = "asc",
+    min_completion: float = None,
+    max_completion: float = None,
+    search: str = None,
+    at_risk: bool = None,
+    cursor: str = None,
+):
+    """
+    Page through learner reports with filtering and sorting done in SQL.
+    at_risk filters on learners with (or without) a flagged enrollment.
+    When a cursor is given, keyset pagination on (sort_by, user_id) is used
+    instead of skip. Returns (items, next_cursor).
+    """
+    if sort_by not in REPORT_SORT_FIELDS:
+        raise ValueError(f"sort_by must be one of: {', '.join(REPORT_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+
+    descending = order == "desc"
+
+    def page(query, columns):
+        """Apply the user-level filters, keyset or offset, order and limit"""
+        sort_column, user_id = columns[sort_by], columns["user_id"]
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(
+                or_(
+                    columns["full_name"].ilike(pattern),
+                    columns["email"].ilike(pattern),
+                )
             )
+        if at_risk is not None:
+            flagged = db.query(models.AtRiskEnrollment.user_id).distinct()
+            membership = user_id.in_(flagged)
+            query = query.filter(membership if at_risk else ~membership)
+
+        if cursor:
+            sort_value, last_user_id = decode_report_cursor(cursor)
+            if descending:
+                query = query.filter(
+                    or_(
+                        sort_column < sort_value,
+                        (sort_column == sort_value) & (user_id < last_user_id),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        sort_column > sort_value,
+                        (sort_column == sort_value) & (user_id > last_user_id),
+                    )
+                )
+
+        if descending:
+            query = query.order_by(sort_column.desc(), user_id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), user_id.asc())
+        if skip and not cursor:
+            query = query.offset(skip)
+        # One extra row tells whether another page exists
+        return query.limit(limit + 1)
+
+    if sort_by in ("full_name", "email") and (
+        min_completion is None and max_completion is None
+    ):
+        # Everything the page depends on is a users column, so the page of
+        # learners is picked first and only those learners are aggregated
+        columns = _learner_columns()
+        learners = page(
+            db.query(*columns).filter(models.User.role == "learner"),
+            {column.name: column for column in columns},
+        ).subquery()
+        report = _user_report_subquery(db, learners)
+        sort_column = report.c[sort_by]
+        query = db.query(report).order_by(
+            sort_column.desc() if descending else sort_column.asc(),
+            report.c.user_id.desc() if descending else report.c.user_id.asc(),
         )
+    else:
+        # Sorting or filtering on aggregate columns needs every learner's
+        # aggregates, so these pages remain a full scan of learning_facts
+        report = _user_report_subquery(db)
+        query = db.query(report)
+        if min_completion is not None:
+            query = query.filter(report.c.completion_percentage >= min_completion)
+        if max_completion is not None:
+            query = query.filter(report.c.completion_percentage <= max_completion)
+        query = page(query, report.c)
+
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_report_cursor(getattr(last, sort_by), last.user_id)
+
+    return [
+        schemas.UserReportItem(**_user_report_row(row)) for row in rows
+    ], next_cursor
+
+
+def iter_user_reports(db: Session, batch_size: int = 1000):
+    """
+    Yield every learner's report row as a plain dict.
+    Rows are fetched through a server-side cursor in batches of batch_size,
+    so memory stays constant regardless of the number of learners.
+    """
+    report = _user_report_subquery(db)
+    query = db.query(report).order_by(report.c.user_id)
+    for row in query.execution_options(yield_per=batch_size):
+        yield _user_report_row(row)
 
-    return report_data
 
+def get_recent_activity(limit: int = 5, event_type: str = None):
+    # Served from the in-process ring buffer; no database work
+    return feed.recent(limit=limit, event_type=event_type)
 
-def get_recent_activity(db: Session, limit: int = 5):
-    return (
-        db.query(models.User)
-        .filter(models.User.role == "learner")
-        .order_by(models.User.created_at.desc())
-        .limit(limit)
-        .all()
+
+def record_feed_event(
+    db: Session, event_type: str, user_id: UUID, course_id: UUID, score: int = None
+):
+    """Look up display names in one query and add the event to the activity feed"""
+    row = (
+        db.query(models.User.full_name, models.Course.title)
+        .join(models.Course, models.Course.id == course_id)
+        .filter(models.User.id == user_id)
+        .first()
+    )
+    full_name, course_title = row if row else (None, None)
+    feed.record(
+        event_type,
+        user_id=user_id,
+        full_name=full_name,
+        course_id=course_id,
+        course_title=course_title,
+        score=score,
     )
 
 
@@ -320,6 +563,8 @@ def delete_user(db: Session, user_id: UUID):
     if user:
         db.delete(user)
         db.commit()
+        invalidate_course_funnel()
+        leaderboards.remove_user(user_id)
     return user
 
 
@@ -328,6 +573,9 @@ def delete_course(db: Session, course_id: UUID):
     if db_course:
         db.delete(db_course)
         db.commit()
+        invalidate_course_funnel(course_id)
+        leaderboards.remove_course(course_id)
+        question_index.remove_course(course_id)
     return db_course
 
 
@@ -336,6 +584,7 @@ def delete_resource(db: Session, resource_id: UUID):
         db.query(models.Resource).filter(models.Resource.id == resource_id).first()
     )
     if db_resource:
+        invalidate_pdf_text(db, resource_id)
         db.delete(db_resource)
         db.commit()
     return db_resource
@@ -370,7 +619,7 @@ def get_user_quiz_history(db: Session, user_id: UUID):
                 "course_title": course_title,
                 "score": sub.score,
                 "submitted_at": sub.submitted_at,
-                "status": "Passed" if sub.score >= 70 else "Failed",
+                "status": "Passed" if sub.score >= PASSING_SCORE else "Failed",
             }
         )
 
@@ -378,16 +627,18 @@ def get_user_quiz_history(db: Session, user_id: UUID):
 
 
 def get_user_quiz_stats(db: Session, user_id: UUID):
-    submissions = (
-        db.query(models.QuizSubmission)
+    avg_score, quizzes_taken = (
+        db.query(
+            func.avg(models.QuizSubmission.score),
+            func.count(models.QuizSubmission.id),
+        )
         .filter(models.QuizSubmission.user_id == user_id)
-        .all()
+        .one()
     )
-    if not submissions:
+    if not quizzes_taken:
         return {"average_score": 0, "quizzes_taken": 0}
 
-    avg_score = sum(s.score for s in submissions) / len(submissions)
-    return {"average_score": round(avg_score, 1), "quizzes_taken": len(submissions)}
+    return {"average_score": round(float(avg_score), 1), "quizzes_taken": quizzes_taken}
 
 
 def get_user_report_details(db: Session, user_id: UUID):
@@ -395,72 +646,30 @@ def get_user_report_details(db: Session, user_id: UUID):
     if not user:
         return None
 
-    # Get all enrollments for this user
-    enrollments = (
-        db.query(models.Enrollment).filter(models.Enrollment.user_id == user_id).all()
-    )
-
-    course_reports = []
-
-    for enrollment in enrollments:
-        course = (
-            db.query(models.Course)
-            .filter(models.Course.id == enrollment.course_id)
-            .first()
-        )
-        if not course:
-            continue
-
-        # Get progress
-        progress = (
-            db.query(models.Progress)
-            .filter(
-                models.Progress.user_id == user_id,
-                models.Progress.course_id == course.id,
-            )
-            .first()
+    # One row per enrolled course, read straight from learning_facts
+    facts = (
+        db.query(models.LearningFact, models.Course.title)
+        .join(models.Course, models.Course.id == models.LearningFact.course_id)
+        .filter(
+            models.LearningFact.user_id == user_id,
+            models.LearningFact.enrolled_at.isnot(None),
         )
+        .order_by(models.LearningFact.enrolled_at)
+        .all()
+    )
 
-        # Get max quiz score for this course
-        # Find quizzes for course
-        quizzes = db.query(models.Quiz).filter(models.Quiz.course_id == course.id).all()
-        quiz_ids = [q.id for q in quizzes]
-
-        max_score = 0
-        if quiz_ids:
-            submissions = (
-                db.query(models.QuizSubmission)
-                .filter(
-                    models.QuizSubmission.user_id == user_id,
-                    models.QuizSubmission.quiz_id.in_(quiz_ids),
-                )
-                .all()
-            )
-            if submissions:
-                max_score = max(s.score for s in submissions)
-
-        video_status = "Not Started"
-        is_completed = False
-
-        if progress:
-            is_completed = progress.is_completed
-            if progress.playback_position > 0:
-                video_status = "Started"
-            # If completed, we can also say video status is "Watched" or just keep as Started?
-            # User asked for "Video Status (Started/Not Started)".
-            # I'll stick to simple logic.
-
-        course_reports.append(
-            schemas.CourseProgressReport(
-                course_id=course.id,
-                course_title=course.title,
-                video_status=video_status,
-                quiz_score=(
-                    max_score if quiz_ids else None
-                ),  # None if no quiz exists? Or 0? Schema says Optional[int]
-                is_completed=is_completed,
-            )
+    course_reports = [
+        schemas.CourseProgressReport(
+            course_id=fact.course_id,
+            course_title=course_title,
+            video_status=(
+                "Started" if (fact.playback_position or 0) > 0 else "Not Started"
+            ),
+            quiz_score=fact.best_score,  # None until the learner attempts a quiz
+            is_completed=bool(fact.completed),
         )
+        for fact, course_title in facts
+    ]
 
     return schemas.UserDetailedReport(
         user_id=user.id,
@@ -474,85 +683,57 @@ def get_learner_progress_stats(db: Session, user_id: UUID):
     """
     Get comprehensive progress statistics for a learner
     Returns: total_assigned, completed, in_progress, avg_score, time_spent_estimate, streak
-    """
-    from datetime import datetime, timedelta
-
-    # Get all enrollments for the user
-    enrollments = (
-        db.query(models.Enrollment).filter(models.Enrollment.user_id == user_id).all()
-    )
 
-    total_assigned = len(enrollments)
-
-    # Get progress for each enrolled course
-    completed_courses = 0
-    in_progress_courses = 0
-
-    for enrollment in enrollments:
-        progress = (
-            db.query(models.Progress)
-            .filter(
-                models.Progress.user_id == user_id,
-                models.Progress.course_id == enrollment.course_id,
-            )
-            .first()
+    Runs a fixed number of queries regardless of how many courses are enrolled:
+    one grouped count over enrollments/progress, one quiz aggregate and one
+    primary-key read of the activity bitmap.
+    """
+    # Count enrollments by status in a single query
+    total_assigned, completed_courses, in_progress_courses = (
+        db.query(
+            func.count(models.Enrollment.id),
+            func.coalesce(
+                func.sum(case((models.Progress.is_completed.is_(True), 1), else_=0)),
+                0,
+            ),
+            func.coalesce(
+                func.sum(
+                    case(
+                        (
+                            (models.Progress.is_completed.isnot(True))
+                            & (models.Progress.playback_position > 0),
+                            1,
+                        ),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
         )
-
-        if progress and progress.is_completed:
-            completed_courses += 1
-        elif progress and progress.playback_position > 0:
-            in_progress_courses += 1
+        .outerjoin(
+            models.Progress,
+            (models.Progress.user_id == models.Enrollment.user_id)
+            & (models.Progress.course_id == models.Enrollment.course_id),
+        )
+        .filter(models.Enrollment.user_id == user_id)
+        .one()
+    )
 
     # Get quiz statistics
     quiz_stats = get_user_quiz_stats(db, user_id)
     avg_score = quiz_stats.get("average_score", 0)
     quizzes_taken = quiz_stats.get("quizzes_taken", 0)
 
-    # Calculate learning streak (days with activity in last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-    # Get unique days with quiz submissions
-    quiz_activity_days = (
-        db.query(models.QuizSubmission.submitted_at)
-        .filter(
-            models.QuizSubmission.user_id == user_id,
-            models.QuizSubmission.submitted_at >= thirty_days_ago,
-        )
-        .all()
-    )
-
-    # Get unique days with progress updates
-    progress_activity_days = (
-        db.query(models.Progress.last_updated)
-        .filter(
-            models.Progress.user_id == user_id,
-            models.Progress.last_updated >= thirty_days_ago,
-        )
-        .all()
+    # Streaks and active days come from the learner's daily activity bitmap
+    bitmap_row = (
+        db.query(models.UserActivityBitmap.bitmap)
+        .filter(models.UserActivityBitmap.user_id == user_id)
+        .first()
     )
-
-    # Combine and count unique days
-    activity_dates = set()
-    for (date,) in quiz_activity_days:
-        if date:
-            activity_dates.add(date.date())
-    for (date,) in progress_activity_days:
-        if date:
-            activity_dates.add(date.date())
-
-    # Calculate streak (consecutive days from today backwards)
+    activity = ActivityBitmap.from_bytes(bitmap_row[0] if bitmap_row else None)
     today = datetime.utcnow().date()
-    streak = 0
-    current_date = today
+    streak = activity.current_streak(today)
 
-    while current_date in activity_dates:
-        streak += 1
-        current_date -= timedelta(days=1)
-        if streak > 365:  # Safety limit
-            break
-
-    # Estimate time spent (rough calculation based on completed courses and quizzes)
-    # Assume: 1 hour per completed course + 15 min per quiz
     # Estimate time spent (rough calculation based on completed courses and quizzes)
     # Assume: 1 hour per completed course + 15 min per quiz
     time_spent_hours = (completed_courses * 1.0) + (quizzes_taken * 0.25)
@@ -568,6 +749,8 @@ def get_learner_progress_stats(db: Session, user_id: UUID):
         "quizzes_taken": quizzes_taken,
         "time_spent_hours": round(time_spent_hours, 1),
         "learning_streak_days": streak,
+        "longest_streak_days": activity.longest_streak(),
+        "active_days_last_30": activity.active_days(today, 30),
     }
 
 
@@ -577,3 +760,566 @@ def get_quiz_submission(db: Session, submission_id: UUID):
         .filter(models.QuizSubmission.id == submission_id)
         .first()
     )
+
+
+def get_learning_fact(db: Session, user_id: UUID, course_id: UUID):
+    """
+    Fetch the learning_facts row for (user, course), adding a fresh one to the
+    session if it does not exist yet. The caller is responsible for committing.
+    """
+    fact = (
+        db.query(models.LearningFact)
+        .filter_by(user_id=user_id, course_id=course_id)
+        .first()
+    )
+    if not fact:
+        fact = models.LearningFact(
+            user_id=user_id,
+            course_id=course_id,
+            started=False,
+            completed=False,
+            playback_position=0.0,
+            attempts=0,
+        )
+        db.add(fact)
+    return fact
+
+
+def rebuild_learning_facts(db: Session):
+    """
+    Rebuild the learning_facts table from enrollments, progress and quiz_submissions.
+    Returns the number of rows written.
+    """
+    facts = {}
+
+    def fact_for(user_id, course_id):
+        key = (user_id, course_id)
+        if key not in facts:
+            facts[key] = {
+                "user_id": user_id,
+                "course_id": course_id,
+                "enrolled_at": None,
+                "started": False,
+                "completed": False,
+                "playback_position": 0.0,
+                "best_score": None,
+                "attempts": 0,
+                "last_activity_at": None,
+            }
+        return facts[key]
+
+    enrollment_rows = db.query(
+        models.Enrollment.user_id,
+        models.Enrollment.course_id,
+        func.min(models.Enrollment.assigned_at),
+    ).group_by(models.Enrollment.user_id, models.Enrollment.course_id)
+    for user_id, course_id, enrolled_at in enrollment_rows:
+        fact_for(user_id, course_id)["enrolled_at"] = enrolled_at
+
+    progress_rows = db.query(
+        models.Progress.user_id,
+        models.Progress.course_id,
+        func.max(case((models.Progress.is_completed.is_(True), 1), else_=0)),
+        func.max(func.coalesce(models.Progress.playback_position, 0.0)),
+        func.max(models.Progress.last_updated),
+    ).group_by(models.Progress.user_id, models.Progress.course_id)
+    for user_id, course_id, completed, position, last_updated in progress_rows:
+        fact = fact_for(user_id, course_id)
+        fact["completed"] = bool(completed)
+        fact["playback_position"] = 1.0 if completed else float(position or 0.0)
+        fact["started"] = bool(completed) or fact["playback_position"] > 0
+        if fact["started"]:
+            fact["last_activity_at"] = last_updated
+
+    submission_rows = (
+        db.query(
+            models.QuizSubmission.user_id,
+            models.Quiz.course_id,
+            func.max(models.QuizSubmission.score),
+            func.count(models.QuizSubmission.id),
+            func.max(models.QuizSubmission.submitted_at),
+        )
+        .join(models.Quiz, models.Quiz.id == models.QuizSubmission.quiz_id)
+        .group_by(models.QuizSubmission.user_id, models.Quiz.course_id)
+    )
+    for user_id, course_id, best_score, attempts, submitted_at in submission_rows:
+        fact = fact_for(user_id, course_id)
+        fact["best_score"] = best_score
+        fact["attempts"] = attempts
+        if submitted_at and (
+            fact["last_activity_at"] is None or submitted_at > fact["last_activity_at"]
+        ):
+            fact["last_activity_at"] = submitted_at
+
+    db.query(models.LearningFact).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.LearningFact, list(facts.values()))
+    db.commit()
+    return len(facts)
+
+
+# Per-course funnel results, keyed by course id.
+# Entries are dropped by the write paths that touch the course, in this process
+# only, so like the activity feed and leaderboards this assumes a single API
+# process.
+_course_funnel_cache = {}
+
+
+def invalidate_course_funnel(course_id: UUID = None):
+    """Drop the cached funnel for one course, or for every course if none is given."""
+    if course_id is None:
+        _course_funnel_cache.clear()
+    else:
+        _course_funnel_cache.pop(course_id, None)
+
+
+def _compute_course_funnels(db: Session, course_ids: list = None):
+    """
+    Compute enrolled -> started -> attempted -> passed counts and the median best
+    score for the given courses (or all courses) with grouped aggregate queries.
+    """
+    course_query = db.query(models.Course.id, models.Course.title)
+    if course_ids is not None:
+        course_query = course_query.filter(models.Course.id.in_(course_ids))
+
+    funnels = {
+        course_id: {
+            "course_id": course_id,
+            "course_title": title,
+            "enrolled": 0,
+            "started": 0,
+            "attempted_quiz": 0,
+            "passed": 0,
+            "median_best_score": None,
+        }
+        for course_id, title in course_query
+    }
+    if not funnels:
+        return funnels
+    ids = list(funnels)
+
+    enrolled_rows = (
+        db.query(
+            models.Enrollment.course_id,
+            func.count(func.distinct(models.Enrollment.user_id)),
+        )
+        .filter(models.Enrollment.course_id.in_(ids))
+        .group_by(models.Enrollment.course_id)
+    )
+    for course_id, count in enrolled_rows:
+        funnels[course_id]["enrolled"] = count
+
+    started_rows = (
+        db.query(
+            models.Progress.course_id,
+            func.count(func.distinct(models.Progress.user_id)),
+        )
+        .filter(
+            models.Progress.course_id.in_(ids),
+            or_(
+                models.Progress.is_completed.is_(True),
+                models.Progress.playback_position > 0,
+            ),
+        )
+        .group_by(models.Progress.course_id)
+    )
+    for course_id, count in started_rows:
+        funnels[course_id]["started"] = count
+
+    # Best score per (course, learner); the median is taken over these
+    best_score_rows = (
+        db.query(
+            models.Quiz.course_id,
+            models.QuizSubmission.user_id,
+            func.max(models.QuizSubmission.score),
+        )
+        .join(models.Quiz, models.Quiz.id == models.QuizSubmission.quiz_id)
+        .filter(models.Quiz.course_id.in_(ids))
+        .group_by(models.Quiz.course_id, models.QuizSubmission.user_id)
+    )
+    best_scores = {}
+    for course_id, _user_id, best_score in best_score_rows:
+        funnel = funnels[course_id]
+        funnel["attempted_quiz"] += 1
+        if best_score is not None and best_score >= PASSING_SCORE:
+            funnel["passed"] += 1
+        if best_score is not None:
+            best_scores.setdefault(course_id, []).append(best_score)
+
+    for course_id, scores in best_scores.items():
+        funnels[course_id]["median_best_score"] = float(median(scores))
+
+    return funnels
+
+
+def get_course_funnel(db: Session, course_id: UUID):
+    if course_id not in _course_funnel_cache:
+        funnels = _compute_course_funnels(db, [course_id])
+        if course_id not in funnels:
+            return None
+        _course_funnel_cache[course_id] = schemas.CourseFunnel(**funnels[course_id])
+    return _course_funnel_cache[course_id]
+
+
+def get_course_funnels(db: Session):
+    course_ids = [
+        course_id
+        for (course_id,) in db.query(models.Course.id).order_by(models.Course.title)
+    ]
+    missing = [
+        course_id for course_id in course_ids if course_id not in _course_funnel_cache
+    ]
+    if missing:
+        for course_id, funnel in _compute_course_funnels(db, missing).items():
+            _course_funnel_cache[course_id] = schemas.CourseFunnel(**funnel)
+
+    return [
+        _course_funnel_cache[course_id]
+        for course_id in course_ids
+        if course_id in _course_funnel_cache
+    ]
+
+
+def _upsert_insert(db: Session):
+    """Dialect insert() supporting ON CONFLICT, or None if the backend has none"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+ACTIVITY_COUNTERS = ("new_enrollments", "progress_updates", "submissions", "passes")
+# Each day's activity is spread over this many activity_daily_shards rows, so
+# concurrent progress updates and submissions rarely wait on the same row lock
+ACTIVITY_SHARDS = 16
+
+
+def _add_to_sketch(data: bytes, user_id: UUID):
+    """Serialized sketch with user_id added, or None if it is unchanged"""
+    sketch = HyperLogLog.from_bytes(data) if data else HyperLogLog()
+    if sketch.add(user_id) or not data:
+        return sketch.to_bytes()
+    return None
+
+
+def record_activity(db: Session, active_user_id: UUID = None, **increments):
+    """
+    Add to today's activity counters and, if given, add the learner to the
+    day's distinct-learner sketch. The caller commits.
+
+    Writes go to one of ACTIVITY_SHARDS rows for the day, chosen by learner
+    (or at random), so only that row stays locked until the caller commits.
+    """
+    today = datetime.utcnow().date()
+    increments = {name: increments.get(name, 0) for name in ACTIVITY_COUNTERS}
+    seed = active_user_id.int if active_user_id else random.getrandbits(32)
+    shard = seed % ACTIVITY_SHARDS
+
+    insert = _upsert_insert(db)
+    if insert is None:
+        row = db.get(models.ActivityDailyShard, (today, shard))
+        if not row:
+            row = models.ActivityDailyShard(day=today, shard=shard, **increments)
+            db.add(row)
+        else:
+            for name, value in increments.items():
+                setattr(row, name, getattr(row, name) + value)
+        if active_user_id is not None:
+            sketch = _add_to_sketch(row.active_learners_sketch, active_user_id)
+            if sketch is not None:
+                row.active_learners_sketch = sketch
+        return
+
+    table = models.ActivityDailyShard.__table__
+    stmt = insert(table).values(day=today, shard=shard, **increments)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.shard],
+        set_={name: table.c[name] + stmt.excluded[name] for name in ACTIVITY_COUNTERS},
+    )
+    db.execute(stmt)
+    if active_user_id is None:
+        return
+
+    # The upsert holds this row's lock until the caller commits, so the sketch
+    # cannot change between this read and the write below
+    this_row = (table.c.day == today) & (table.c.shard == shard)
+    current = db.execute(
+        select(table.c.active_learners_sketch).where(this_row)
+    ).scalar_one()
+    sketch = _add_to_sketch(current, active_user_id)
+    if sketch is not None:
+        db.execute(update(table).where(this_row).values(active_learners_sketch=sketch))
+
+
+def get_activity_series(
+    db: Session, start_date: date, end_date: date, bucket: str = "day"
+):
+    """
+    Return activity buckets between start_date and end_date (inclusive) from the
+    activity_daily_shards table (and activity_daily for days recorded before
+    sharding). Cost is O(days) regardless of how much raw data exists.
+    """
+    rows = {}
+    for model in (models.ActivityDaily, models.ActivityDailyShard):
+        for row in db.query(model).filter(
+            model.day >= start_date, model.day <= end_date
+        ):
+            rows.setdefault(row.day, []).append(row)
+
+    step = 7 if bucket == "week" else 1
+    buckets = []
+    bucket_start = start_date
+    while bucket_start <= end_date:
+        counts = dict.fromkeys(ACTIVITY_COUNTERS, 0)
+        sketch = HyperLogLog()
+        for offset in range(step):
+            day = bucket_start + timedelta(days=offset)
+            if day > end_date:
+                break
+            for row in rows.get(day, []):
+                for name in ACTIVITY_COUNTERS:
+                    counts[name] += getattr(row, name) or 0
+                if row.active_learners_sketch:
+                    sketch.merge(HyperLogLog.from_bytes(row.active_learners_sketch))
+
+        pass_rate = 0.0
+        if counts["submissions"]:
+            pass_rate = round(counts["passes"] / counts["submissions"] * 100, 1)
+
+        buckets.append(
+            schemas.ActivityBucket(
+                start_date=bucket_start,
+                active_learners=sketch.count(),
+                pass_rate=pass_rate,
+                **counts,
+            )
+        )
+        bucket_start += timedelta(days=step)
+
+    return buckets
+
+
+def get_leaderboard(db: Session, course_id: UUID = None, limit: int = 10):
+    """Top learners by best score for a course, or globally by total best score"""
+    entries = leaderboards.top(limit, course_id=course_id)
+    user_ids = [user_id for _rank, user_id, _score in entries]
+    names = dict(
+        db.query(models.User.id, models.User.full_name)
+        .filter(models.User.id.in_(user_ids))
+        .all()
+    )
+    return [
+        schemas.LeaderboardEntry(
+            rank=rank, user_id=user_id, full_name=names.get(user_id), score=score
+        )
+        for rank, user_id, score in entries
+    ]
+
+
+def get_leaderboard_rank(user_id: UUID, course_id: UUID = None):
+    rank, score, total = leaderboards.rank(user_id, course_id=course_id)
+    return schemas.LeaderboardRank(
+        user_id=user_id, course_id=course_id, rank=rank, score=score, total_ranked=total
+    )
+
+
+def record_quiz_score(db: Session, quiz: models.Quiz, score: int):
+    """Add a score to the quiz's stored histogram. The caller commits."""
+    insert = _upsert_insert(db)
+    if insert is not None:
+        table = models.QuizScoreHistogram.__table__
+        db.execute(
+            insert(table)
+            .values(quiz_id=quiz.id, course_id=quiz.course_id)
+            .on_conflict_do_nothing(index_elements=[table.c.quiz_id])
+        )
+        row = (
+            db.query(models.QuizScoreHistogram)
+            .filter_by(quiz_id=quiz.id)
+            .with_for_update()
+            .one()
+        )
+    else:
+        row = db.query(models.QuizScoreHistogram).filter_by(quiz_id=quiz.id).first()
+        if not row:
+            row = models.QuizScoreHistogram(quiz_id=quiz.id, course_id=quiz.course_id)
+            db.add(row)
+
+    histogram = (
+        ScoreHistogram.from_bytes(row.counts) if row.counts else ScoreHistogram()
+    )
+    histogram.add(score)
+    row.counts = histogram.to_bytes()
+
+
+def _score_distribution(histogram: ScoreHistogram, **ids):
+    mean = histogram.mean()
+    return schemas.ScoreDistribution(
+        submissions=histogram.total,
+        mean=round(mean, 1) if mean is not None else None,
+        p50=histogram.quantile(0.5),
+        p90=histogram.quantile(0.9),
+        histogram=histogram.buckets(),
+        **ids,
+    )
+
+
+def get_quiz_score_distribution(db: Session, quiz_id: UUID):
+    row = db.query(models.QuizScoreHistogram).filter_by(quiz_id=quiz_id).first()
+    histogram = (
+        ScoreHistogram.from_bytes(row.counts)
+        if row and row.counts
+        else ScoreHistogram()
+    )
+    return _score_distribution(
+        histogram, quiz_id=quiz_id, course_id=row.course_id if row else None
+    )
+
+
+def get_course_score_distribution(db: Session, course_id: UUID):
+    """Merge the stored histograms of every quiz in the course"""
+    histogram = ScoreHistogram()
+    for (counts,) in db.query(models.QuizScoreHistogram.counts).filter(
+        models.QuizScoreHistogram.course_id == course_id
+    ):
+        if counts:
+            histogram.merge(ScoreHistogram.from_bytes(counts))
+    return _score_distribution(histogram, course_id=course_id)
+
+
+def rebuild_score_histograms(db: Session):
+    """
+    Rebuild every quiz's score histogram from a grouped count over quiz_submissions.
+    Returns the number of quizzes with submissions.
+    """
+    histograms = {}
+    rows = (
+        db.query(
+            models.QuizSubmission.quiz_id,
+            models.Quiz.course_id,
+            models.QuizSubmission.score,
+            func.count(models.QuizSubmission.id),
+        )
+        .join(models.Quiz, models.Quiz.id == models.QuizSubmission.quiz_id)
+        .group_by(
+            models.QuizSubmission.quiz_id,
+            models.Quiz.course_id,
+            models.QuizSubmission.score,
+        )
+    )
+    for quiz_id, course_id, score, count in rows:
+        if score is None:
+            continue
+        _course_id, histogram = histograms.setdefault(
+            quiz_id, (course_id, ScoreHistogram())
+        )
+        histogram.counts[min(max(int(score), 0), 100)] += count
+
+    db.query(models.QuizScoreHistogram).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        models.QuizScoreHistogram,
+        [
+            {"quiz_id": quiz_id, "course_id": course_id, "counts": h.to_bytes()}
+            for quiz_id, (course_id, h) in histograms.items()
+        ],
+    )
+    db.commit()
+    return len(histograms)
+
+
+def mark_user_active(db: Session, user_id: UUID, day: date = None):
+    """Set today's bit in the learner's activity bitmap. The caller commits."""
+    day = day or datetime.utcnow().date()
+    insert = _upsert_insert(db)
+    if insert is not None:
+        table = models.UserActivityBitmap.__table__
+        db.execute(
+            insert(table)
+            .values(user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[table.c.user_id])
+        )
+        row = (
+            db.query(models.UserActivityBitmap)
+            .filter_by(user_id=user_id)
+            .with_for_update()
+            .one()
+        )
+    else:
+        row = db.query(models.UserActivityBitmap).filter_by(user_id=user_id).first()
+        if not row:
+            row = models.UserActivityBitmap(user_id=user_id)
+            db.add(row)
+
+    bitmap = ActivityBitmap.from_bytes(row.bitmap)
+    if bitmap.mark(day) or row.bitmap is None:
+        row.bitmap = bitmap.to_bytes()
+
+
+def rebuild_activity_bitmaps(db: Session):
+    """
+    Backfill activity bitmaps from the distinct days of quiz submissions and
+    progress updates. Returns the number of learners with activity.
+    """
+    activity_days = union(
+        db.query(
+            models.QuizSubmission.user_id,
+            func.date(models.QuizSubmission.submitted_at, type_=Date),
+        ).statement,
+        db.query(
+            models.Progress.user_id,
+            func.date(models.Progress.last_updated, type_=Date),
+        )
+        .filter(
+            or_(
+                models.Progress.is_completed.is_(True),
+                models.Progress.playback_position > 0,
+            )
+        )
+        .statement,
+    )
+    bitmaps = {}
+    for user_id, day in db.execute(activity_days):
+        if user_id and day:
+            bitmaps.setdefault(user_id, ActivityBitmap()).mark(day)
+
+    db.query(models.UserActivityBitmap).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        models.UserActivityBitmap,
+        [
+            {"user_id": user_id, "bitmap": bitmap.to_bytes()}
+            for user_id, bitmap in bitmaps.items()
+        ],
+    )
+    db.commit()
+    return len(bitmaps)
+
+
+def backfill_reporting_tables(db: Session):
+    """
+    Run the reporting rebuilds whose table is still empty while its source
+    tables are not, as on a deployment that predates the table. Returns the
+    names of the tables rebuilt.
+    """
+    rebuilds = [
+        (models.LearningFact, [models.Enrollment], rebuild_learning_facts),
+        (
+            models.QuizScoreHistogram,
+            [models.QuizSubmission],
+            rebuild_score_histograms,
+        ),
+        (
+            models.UserActivityBitmap,
+            [models.QuizSubmission, models.Progress],
+            rebuild_activity_bitmaps,
+        ),
+    ]
+    rebuilt = []
+    for table, sources, rebuild in rebuilds:
+        if db.query(table).first() is not None:
+            continue
+        if all(db.query(source).first() is None for source in sources):
+            continue
+        rebuild(db)
+        rebuilt.append(table.__tablename__)
+    return rebuilt
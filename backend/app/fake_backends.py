@@ -0,0 +1,186 @@
+"""
+Offline stand-ins for the Gemini and AssemblyAI backends
+Registered as the "fake" LLM and transcription backends
+(QUIZ_LLM_BACKEND=fake, QUIZ_TRANSCRIPTION_BACKEND=fake) so the generation
+pipeline can be load tested without API keys or quota. Output is
+deterministic: the same prompt or source and the same attempt number always
+give the same latency, failure and text.
+
+Settings (environment):
+    FAKE_SEED                     base seed (default 0)
+    FAKE_TIME_SCALE               multiplier for every sleep, e.g. 0.01
+    FAKE_LLM_LATENCY              latency distribution, see parse_latency
+    FAKE_LLM_FAILURE_RATE         fraction of calls that raise
+    FAKE_LLM_TRUNCATE_RATE        fraction of responses cut off mid-array
+    FAKE_LLM_INVALID_RATE         fraction of questions that fail validation
+    FAKE_QUESTION_WORDS           words per question stem
+    FAKE_EXPLANATION_WORDS        words per explanation
+    FAKE_TRANSCRIBE_LATENCY       latency distribution for transcription
+    FAKE_TRANSCRIBE_FAILURE_RATE  fraction of transcriptions that raise
+    FAKE_TRANSCRIPT_WORDS         words per transcript
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List
+
+from .quiz_provider import (
+    LLMBackend,
+    TranscriptionBackend,
+    register_llm_backend,
+    register_transcription_backend,
+)
+
+_SYLLABLES = [
+    "ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "ba",
+    "de", "fi", "go", "hu", "ja", "pe", "qui", "ro", "su", "ty",
+]  # fmt: skip
+# 400 pseudo-words; random stems drawn from them rarely look alike, so the
+# near-duplicate filter does not eat the synthetic questions
+VOCABULARY = [a + b for a in _SYLLABLES for b in _SYLLABLES]
+
+_QUESTION_COUNT = re.compile(r"exactly (\d+)")
+
+
+class FakeProviderError(Exception):
+    """Injected failure from a fake backend"""
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency distribution from a spec string, in seconds:
+    "fixed:S", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA"
+    """
+    kind, *params = spec.split(":")
+    try:
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(values[0], values[1])
+        if kind == "lognormal" and len(values) == 2:
+            median, sigma = values
+            return lambda rng: median * rng.lognormvariate(0, sigma)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+class _Deterministic:
+    """Per-input RNGs; each repeat of an input counts as a new attempt"""
+
+    def __init__(self, kind: str):
+        self._kind = kind
+        self._seed = os.getenv("FAKE_SEED", "0")
+        self._time_scale = _env_float("FAKE_TIME_SCALE", "1")
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def rng(self, key: str) -> random.Random:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        return random.Random(f"{self._seed}:{self._kind}:{digest}:{attempt}")
+
+    def sleep(self, seconds: float):
+        time.sleep(max(0.0, seconds * self._time_scale))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(count))
+
+
+class FakeLLMBackend(LLMBackend):
+    name = "fake"
+
+    def __init__(self, model_name: str = "fake-model"):
+        super().__init__(model_name)
+        self._random = _Deterministic("llm")
+        self.latency = parse_latency(os.getenv("FAKE_LLM_LATENCY", "lognormal:4:0.4"))
+        self.failure_rate = _env_float("FAKE_LLM_FAILURE_RATE", "0")
+        self.truncate_rate = _env_float("FAKE_LLM_TRUNCATE_RATE", "0")
+        self.invalid_rate = _env_float("FAKE_LLM_INVALID_RATE", "0")
+        self.question_words = int(os.getenv("FAKE_QUESTION_WORDS", "14"))
+        self.explanation_words = int(os.getenv("FAKE_EXPLANATION_WORDS", "25"))
+
+    def _question(self, rng: random.Random) -> dict:
+        options = [f"{letter}) {_words(rng, 5)}" for letter in "ABCD"]
+        if rng.random() < self.invalid_rate:
+            options = options[:3]
+        return {
+            "question": _words(rng, self.question_words).capitalize() + "?",
+            "options": options,
+            "answer": rng.choice("ABCD"),
+            "explanation": _words(rng, self.explanation_words),
+        }
+
+    def _response(self, prompt: str):
+        """(latency, response text) for one call, raising injected failures"""
+        rng = self._random.rng(prompt)
+        latency = self.latency(rng)
+        if rng.random() < self.failure_rate:
+            self._random.sleep(latency / 2)
+            raise FakeProviderError("Fake LLM: 503 Service Unavailable")
+
+        match = _QUESTION_COUNT.search(prompt)
+        count = int(match.group(1)) if match else 10
+        text = json.dumps([self._question(rng) for _ in range(count)])
+        if rng.random() < self.truncate_rate:
+            text = text[: int(len(text) * 0.8)]
+        return latency, text
+
+    def complete(self, prompt: str, json_mode: bool = True) -> str:
+        latency, text = self._response(prompt)
+        self._random.sleep(latency)
+        return text
+
+    def stream(self, prompt: str, json_mode: bool = True) -> Iterator[str]:
+        latency, text = self._response(prompt)
+        pieces = [text[i : i + 200] for i in range(0, len(text), 200)] or [""]
+        # About a third of the latency before the first token, the rest spread out
+        self._random.sleep(latency / 3)
+        for piece in pieces:
+            self._random.sleep(latency * 2 / 3 / len(pieces))
+            yield piece
+
+
+class FakeTranscriptionBackend(TranscriptionBackend):
+    name = "fake"
+
+    def __init__(self):
+        self._random = _Deterministic("transcription")
+        self.latency = parse_latency(
+            os.getenv("FAKE_TRANSCRIBE_LATENCY", "lognormal:20:0.5")
+        )
+        self.failure_rate = _env_float("FAKE_TRANSCRIBE_FAILURE_RATE", "0")
+        self.words = int(os.getenv("FAKE_TRANSCRIPT_WORDS", "4000"))
+
+    def transcribe(self, file_path_or_url: str) -> str:
+        rng = self._random.rng(file_path_or_url)
+        latency = self.latency(rng)
+        if rng.random() < self.failure_rate:
+            self._random.sleep(latency / 2)
+            raise FakeProviderError("Fake transcription failed: audio unavailable")
+
+        self._random.sleep(latency)
+        sentences: List[str] = []
+        remaining = self.words
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 20))
+            sentences.append(_words(rng, length).capitalize() + ".")
+            remaining -= length
+        return " ".join(sentences)
+
+
+register_llm_backend("fake", FakeLLMBackend)
+register_transcription_backend("fake", FakeTranscriptionBackend)
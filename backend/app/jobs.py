@@ -0,0 +1,348 @@
+"""
+Durable background job queue backed by the jobs table
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL and an
+atomic conditional UPDATE on SQLite; failures are retried with exponential backoff.
+A running job's lock is refreshed by a heartbeat, and only the worker holding
+the lock can record its outcome.
+"""
+
+import logging
+import os
+import random
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower numbers are claimed first
+PRIORITY_INTERACTIVE = 0  # Admin-triggered generation and regeneration
+PRIORITY_BACKGROUND = 5  # Automatic generation on course creation
+PRIORITY_BULK = 10  # Catalog backfills from scripts
+
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = 3600
+# Running jobs refresh locked_at this often; a lock not refreshed for
+# STALE_LOCK_SECONDS means the worker died and the job is requeued
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+STALE_LOCK_SECONDS = int(os.getenv("JOB_STALE_LOCK_SECONDS", "300"))
+
+# Uploaded files are parked here until a worker picks the job up.
+# Workers on other hosts need this to be a shared volume.
+UPLOAD_DIR = os.getenv(
+    "JOB_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "learning-tracker-jobs")
+)
+UPLOAD_BLOCK_BYTES = 1024 * 1024
+
+_handlers: Dict[str, Callable[[Session, dict], dict]] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by handlers for failures that retrying cannot fix"""
+
+
+def register(kind: str):
+    """Decorator registering a job handler: handler(db, payload) -> result dict"""
+
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def save_upload(upload: BinaryIO, suffix: str, max_bytes: Optional[int] = None) -> str:
+    """
+    Stream an uploaded file to disk for a worker to process; returns the path
+
+    Raises:
+        ValueError: If the upload is larger than max_bytes (nothing is kept)
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        delete=False, suffix=suffix, dir=UPLOAD_DIR
+    ) as temp_file:
+        size = 0
+        for block in iter(lambda: upload.read(UPLOAD_BLOCK_BYTES), b""):
+            size += len(block)
+            if max_bytes is not None and size > max_bytes:
+                break
+            temp_file.write(block)
+        else:
+            return temp_file.name
+    os.unlink(temp_file.name)
+    raise ValueError(f"Upload exceeds the {max_bytes} byte limit")
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    priority: int = PRIORITY_INTERACTIVE,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> models.Job:
+    job = models.Job(
+        kind=kind,
+        payload=payload,
+        status="queued",
+        priority=priority,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Queued {kind} job {job.id} (priority {priority})")
+    return job
+
+
+def get_job(db: Session, job_id: UUID) -> Optional[models.Job]:
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+
+def _requeue_stale(db: Session, now: datetime):
+    """
+    Requeue jobs whose worker stopped heartbeating. The lost run counts as an
+    attempt (claim already incremented it), so a job that keeps killing its
+    worker fails once it runs out of attempts instead of looping forever.
+    """
+    cutoff = now - timedelta(seconds=STALE_LOCK_SECONDS)
+    stale = (
+        db.query(models.Job)
+        .filter(models.Job.status == "running", models.Job.locked_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        exhausted = (job.attempts or 0) >= job.max_attempts
+        values = {
+            models.Job.status: "failed" if exhausted else "queued",
+            models.Job.locked_by: None,
+            models.Job.last_error: "Worker lock expired",
+        }
+        if not exhausted:
+            values[models.Job.run_after] = now + timedelta(
+                seconds=retry_delay(job.attempts or 1)
+            )
+        # Conditional on the lock we saw, so concurrent claimers handle it once
+        updated = (
+            db.query(models.Job)
+            .filter(
+                models.Job.id == job.id,
+                models.Job.status == "running",
+                models.Job.locked_by == job.locked_by,
+                models.Job.locked_at < cutoff,
+            )
+            .update(values, synchronize_session=False)
+        )
+        if updated and exhausted:
+            logger.error(f"Job {job.id} failed permanently: worker lock expired")
+            _cleanup_upload(job)
+        elif updated:
+            logger.warning(f"Requeued job {job.id} with an expired worker lock")
+    db.commit()
+
+
+def claim(
+    db: Session, worker_id: str, max_priority: Optional[int] = None
+) -> Optional[models.Job]:
+    """Claim the next runnable job, highest priority lane first"""
+    now = datetime.utcnow()
+    _requeue_stale(db, now)
+
+    candidates = db.query(models.Job).filter(
+        models.Job.status == "queued", models.Job.run_after <= now
+    )
+    if max_priority is not None:
+        candidates = candidates.filter(models.Job.priority <= max_priority)
+    candidates = candidates.order_by(models.Job.priority, models.Job.created_at)
+
+    if db.get_bind().dialect.name == "postgresql":
+        job = candidates.with_for_update(skip_locked=True).first()
+        if not job:
+            db.commit()
+            return None
+        job.status = "running"
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts = (job.attempts or 0) + 1
+        db.commit()
+        return job
+
+    # SQLite fallback: writes are serialized, so a conditional UPDATE is atomic
+    for job_id, attempts in candidates.with_entities(
+        models.Job.id, models.Job.attempts
+    ).limit(5):
+        claimed = (
+            db.query(models.Job)
+            .filter(models.Job.id == job_id, models.Job.status == "queued")
+            .update(
+                {
+                    models.Job.status: "running",
+                    models.Job.locked_by: worker_id,
+                    models.Job.locked_at: now,
+                    models.Job.attempts: (attempts or 0) + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return get_job(db, job_id)
+    return None
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number"""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _cleanup_upload(job: models.Job):
+    file_path = (job.payload or {}).get("file_path")
+    if file_path and os.path.exists(file_path):
+        try:
+            os.unlink(file_path)
+        except Exception as e:
+            logger.warning(f"Failed to clean up job upload {file_path}: {e}")
+
+
+def _finish(db: Session, job: models.Job, worker_id: str, values: dict) -> bool:
+    """
+    Record a job outcome only if worker_id still holds its lock. A worker
+    whose lock expired must not overwrite the run that replaced it.
+    """
+    updated = (
+        db.query(models.Job)
+        .filter(
+            models.Job.id == job.id,
+            models.Job.status == "running",
+            models.Job.locked_by == worker_id,
+        )
+        .update({**values, models.Job.locked_by: None}, synchronize_session=False)
+    )
+    db.commit()
+    if not updated:
+        logger.warning(
+            f"{worker_id} lost the lock on job {job.id}; its outcome was discarded"
+        )
+    return bool(updated)
+
+
+def complete(db: Session, job: models.Job, worker_id: str, result: dict):
+    if _finish(
+        db,
+        job,
+        worker_id,
+        {
+            models.Job.status: "succeeded",
+            models.Job.result: result,
+            models.Job.last_error: None,
+        },
+    ):
+        _cleanup_upload(job)
+
+
+def fail(db: Session, job: models.Job, worker_id: str, error: Exception):
+    last_error = str(error)[:2000]
+    retryable = not isinstance(error, PermanentJobError)
+    if retryable and job.attempts < job.max_attempts:
+        run_after = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+        if _finish(
+            db,
+            job,
+            worker_id,
+            {
+                models.Job.status: "queued",
+                models.Job.last_error: last_error,
+                models.Job.run_after: run_after,
+            },
+        ):
+            logger.warning(
+                f"Job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), "
+                f"retrying at {run_after}: {error}"
+            )
+    elif _finish(
+        db,
+        job,
+        worker_id,
+        {models.Job.status: "failed", models.Job.last_error: last_error},
+    ):
+        logger.error(f"Job {job.id} failed permanently: {error}")
+        _cleanup_upload(job)
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes a running job's locked_at until stopped, on its own session"""
+
+    def __init__(self, db: Session, job_id: UUID, worker_id: str):
+        super().__init__(daemon=True, name=f"heartbeat-{job_id}")
+        self._bind = db.get_bind()
+        self._job_id = job_id
+        self._worker_id = worker_id
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(HEARTBEAT_SECONDS):
+            try:
+                with Session(bind=self._bind) as db:
+                    alive = (
+                        db.query(models.Job)
+                        .filter(
+                            models.Job.id == self._job_id,
+                            models.Job.status == "running",
+                            models.Job.locked_by == self._worker_id,
+                        )
+                        .update(
+                            {models.Job.locked_at: datetime.utcnow()},
+                            synchronize_session=False,
+                        )
+                    )
+                    db.commit()
+                if not alive:
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {self._job_id} failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def run_next(db: Session, worker_id: str, max_priority: Optional[int] = None) -> bool:
+    """Claim and run a single job. Returns False if nothing was runnable."""
+    job = claim(db, worker_id, max_priority=max_priority)
+    if not job:
+        return False
+
+    # Payload, attempts etc. are read before the handler commits and expires them
+    job_id, payload = job.id, dict(job.payload or {})
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        fail(
+            db,
+            job,
+            worker_id,
+            PermanentJobError(f"No handler registered for '{job.kind}'"),
+        )
+        return True
+
+    logger.info(f"{worker_id} running {job.kind} job {job_id} (attempt {job.attempts})")
+    heartbeat = _Heartbeat(db, job_id, worker_id)
+    heartbeat.start()
+    try:
+        result = handler(db, payload)
+    except Exception as e:
+        db.rollback()
+        fail(db, job, worker_id, e)
+    else:
+        complete(db, job, worker_id, result or {})
+    finally:
+        heartbeat.stop()
+    return True
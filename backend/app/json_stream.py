@@ -0,0 +1,104 @@
+"""
+Incremental parser for a streamed JSON array of objects
+Feed it text as it arrives from the model; each top-level object is returned
+as soon as its closing brace is seen, without waiting for the whole array.
+The same parser salvages complete objects from truncated or partly malformed
+responses (see salvage_objects).
+"""
+
+import json
+import logging
+import re
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _loads_element(element: str):
+    """json.loads, retried once without trailing commas, a common model slip"""
+    try:
+        return json.loads(element)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", element))
+
+
+class JsonArrayStreamParser:
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0  # Next character of _buffer to scan
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None  # Offset of the current element's "{"
+        self.started = False  # Seen the opening "[" of the array
+        self.finished = False  # Seen the matching "]"
+        self.skipped = 0  # Elements that were not valid JSON
+
+    def feed(self, text: str) -> List[dict]:
+        """Add streamed text; returns the objects completed by it"""
+        if self.finished:
+            return []
+
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            c = buffer[i]
+            if not self.started:
+                # Skip code fences or prose before the array
+                if c == "[":
+                    self.started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                if self._depth == 1 and c == "{":
+                    self._object_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and c == "}" and self._object_start is not None:
+                    element = buffer[self._object_start : i + 1]
+                    self._object_start = None
+                    try:
+                        completed.append(_loads_element(element))
+                    except json.JSONDecodeError:
+                        self.skipped += 1
+                        logger.warning(f"Skipping malformed element: {element[:200]}")
+                elif self._depth == 0:
+                    self.finished = True
+                    break
+            i += 1
+
+        # Drop everything before the element still being read
+        keep_from = self._object_start if self._object_start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._object_start is not None:
+            self._object_start = 0
+        self._pos = i - keep_from
+        return completed
+
+
+def salvage_objects(text: str) -> List[dict]:
+    """
+    Every complete top-level object in a JSON array that may be cut off or
+    contain malformed elements. Returns [] if no array is found.
+    """
+    parser = JsonArrayStreamParser()
+    objects = parser.feed(text)
+    if parser.skipped or not parser.finished:
+        logger.warning(
+            f"Salvaged {len(objects)} objects from a malformed JSON array "
+            f"({parser.skipped} skipped, {'complete' if parser.finished else 'truncated'})"
+        )
+    return objects
@@ -0,0 +1,163 @@
+"""
+Per-course and global quiz leaderboards
+Best score per learner is kept in sorted in-memory indexes that are updated on
+every quiz submission and rebuilt from quiz_submissions on startup. The API
+must run as a single process: with several uvicorn workers each one would
+only see the submissions it handled itself until its next restart.
+"""
+
+import logging
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+class SortedScoreIndex:
+    """
+    Scores kept sorted highest-first in a flat list of (-score, user_key) keys.
+    Lookups and rank queries are binary searches; ties share a rank.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set(self, user_id: UUID, score: int):
+        previous = self._scores.get(user_id)
+        if previous is not None:
+            if previous == score:
+                return
+            del self._keys[bisect_left(self._keys, (-previous, str(user_id)))]
+        self._scores[user_id] = score
+        insort(self._keys, (-score, str(user_id)))
+
+    def remove(self, user_id: UUID):
+        previous = self._scores.pop(user_id, None)
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, str(user_id)))]
+
+    def items(self) -> List[Tuple[UUID, int]]:
+        return list(self._scores.items())
+
+    def score(self, user_id: UUID) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: UUID) -> Optional[int]:
+        """1-based competition rank (1 + number of strictly higher scores)"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score,)) + 1
+
+    def top(self, k: int) -> List[Tuple[int, UUID, int]]:
+        """(rank, user_id, score) for the k highest scores"""
+        entries = []
+        for neg_score, user_key in self._keys[:k]:
+            rank = bisect_left(self._keys, (neg_score,)) + 1
+            entries.append((rank, UUID(user_key), -neg_score))
+        return entries
+
+
+class Leaderboards:
+    """
+    Best quiz score per learner for each course, plus a global board ranked by
+    the sum of a learner's per-course best scores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._courses: Dict[UUID, SortedScoreIndex] = {}
+        self._global = SortedScoreIndex()
+
+    def record(self, course_id: UUID, user_id: UUID, score: int):
+        """Apply a new quiz score; only improvements change the boards"""
+        with self._lock:
+            board = self._courses.setdefault(course_id, SortedScoreIndex())
+            best = board.score(user_id)
+            if best is not None and score <= best:
+                return
+            board.set(user_id, score)
+            total = (self._global.score(user_id) or 0) + score - (best or 0)
+            self._global.set(user_id, total)
+
+    def top(self, k: int = 10, course_id: Optional[UUID] = None):
+        with self._lock:
+            board = self._board(course_id)
+            return board.top(k) if board else []
+
+    def rank(self, user_id: UUID, course_id: Optional[UUID] = None):
+        """(rank, score, total ranked learners) for a learner on a board"""
+        with self._lock:
+            board = self._board(course_id)
+            if not board:
+                return None, None, 0
+            return board.rank(user_id), board.score(user_id), len(board)
+
+    def remove_user(self, user_id: UUID):
+        with self._lock:
+            for board in self._courses.values():
+                board.remove(user_id)
+            self._global.remove(user_id)
+
+    def remove_course(self, course_id: UUID):
+        with self._lock:
+            board = self._courses.pop(course_id, None)
+            if not board:
+                return
+            for user_id, score in board.items():
+                remaining = (self._global.score(user_id) or 0) - score
+                if remaining > 0:
+                    self._global.set(user_id, remaining)
+                else:
+                    self._global.remove(user_id)
+
+    def rebuild(self, db) -> int:
+        """Reload every board from the best score per (course, learner)"""
+        rows = (
+            db.query(
+                models.Quiz.course_id,
+                models.QuizSubmission.user_id,
+                func.max(models.QuizSubmission.score),
+            )
+            .join(models.Quiz, models.Quiz.id == models.QuizSubmission.quiz_id)
+            .group_by(models.Quiz.course_id, models.QuizSubmission.user_id)
+            .all()
+        )
+
+        courses: Dict[UUID, SortedScoreIndex] = {}
+        totals: Dict[UUID, int] = {}
+        for course_id, user_id, best_score in rows:
+            if best_score is None:
+                continue
+            courses.setdefault(course_id, SortedScoreIndex()).set(user_id, best_score)
+            totals[user_id] = totals.get(user_id, 0) + best_score
+
+        global_board = SortedScoreIndex()
+        for user_id, total in totals.items():
+            global_board.set(user_id, total)
+
+        with self._lock:
+            self._courses = courses
+            self._global = global_board
+
+        logger.info(f"Rebuilt leaderboards for {len(courses)} courses")
+        return len(rows)
+
+    def _board(self, course_id: Optional[UUID]) -> Optional[SortedScoreIndex]:
+        if course_id is None:
+            return self._global
+        return self._courses.get(course_id)
+
+
+# Shared leaderboards updated by crud.submit_quiz
+leaderboards = Leaderboards()
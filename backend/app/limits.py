@@ -0,0 +1,133 @@
+"""
+Concurrency limits and timeouts for calls to external providers
+Each provider gets its own semaphore so a burst of generation jobs cannot
+overload Gemini or AssemblyAI, and every call runs with a deadline. Recent
+slot-wait and call durations are kept per provider for latency reporting.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# provider -> (max concurrent calls per process, timeout in seconds)
+PROVIDERS = {
+    "gemini": (
+        int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+        float(os.getenv("GEMINI_TIMEOUT_SECONDS", "180")),
+    ),
+    "assemblyai": (
+        int(os.getenv("ASSEMBLYAI_MAX_CONCURRENCY", "2")),
+        float(os.getenv("ASSEMBLYAI_TIMEOUT_SECONDS", "1200")),
+    ),
+    "pdf": (
+        int(os.getenv("PDF_MAX_CONCURRENCY", "4")),
+        float(os.getenv("PDF_TIMEOUT_SECONDS", "120")),
+    ),
+}
+
+# Waiting for a free slot is normal under load (map-reduce chunks, batch
+# transcription), so it gets its own long bound instead of the call deadline.
+# It only guards against slots held forever by calls that never return.
+SLOT_WAIT_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_SLOT_TIMEOUT_SECONDS", "3600"))
+
+_semaphores = {
+    name: threading.BoundedSemaphore(limit) for name, (limit, _) in PROVIDERS.items()
+}
+# provider -> recent (slot wait, call duration) pairs in seconds
+LATENCY_SAMPLES = int(os.getenv("PROVIDER_LATENCY_SAMPLES", "10000"))
+_latencies = {name: deque(maxlen=LATENCY_SAMPLES) for name in PROVIDERS}
+
+_executor = ThreadPoolExecutor(
+    max_workers=sum(limit for limit, _ in PROVIDERS.values()),
+    thread_name_prefix="provider",
+)
+
+
+class ProviderTimeoutError(TimeoutError):
+    """Raised when a provider call does not finish within its deadline"""
+
+
+def run_limited(
+    provider: str,
+    func: Callable,
+    *args,
+    timeout: Optional[float] = None,
+    slot_timeout: Optional[float] = None,
+    **kwargs,
+):
+    """
+    Run func(*args, **kwargs) under the provider's concurrency limit and timeout
+
+    timeout bounds the call itself, once it has a slot; slot_timeout bounds
+    the wait for a slot (default SLOT_WAIT_TIMEOUT_SECONDS). A call that times
+    out keeps its slot until it actually returns, so abandoned calls still
+    count against the provider's limit.
+    """
+    limit, default_timeout = PROVIDERS[provider]
+    timeout = timeout or default_timeout
+    slot_timeout = slot_timeout or SLOT_WAIT_TIMEOUT_SECONDS
+    semaphore = _semaphores[provider]
+
+    requested = time.monotonic()
+    if not semaphore.acquire(timeout=slot_timeout):
+        raise ProviderTimeoutError(
+            f"Waited {slot_timeout:g}s for a {provider} slot ({limit} in use)"
+        )
+    waited = time.monotonic() - requested
+
+    def call():
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            semaphore.release()
+            _latencies[provider].append((waited, time.monotonic() - started))
+
+    try:
+        future = _executor.submit(call)
+    except Exception:
+        semaphore.release()
+        raise
+
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        logger.error(f"{provider} call {func.__name__} timed out after {timeout}s")
+        raise ProviderTimeoutError(f"{provider} call timed out after {timeout:g}s")
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def latency_stats() -> Dict[str, dict]:
+    """p50/p99 slot wait and call duration per provider over recent calls"""
+    stats = {}
+    for provider, samples in _latencies.items():
+        samples = list(samples)
+        waits = sorted(wait for wait, _ in samples)
+        calls = sorted(duration for _, duration in samples)
+        stats[provider] = {
+            "calls": len(samples),
+            "wait_p50": _percentile(waits, 0.5),
+            "wait_p99": _percentile(waits, 0.99),
+            "p50": _percentile(calls, 0.5),
+            "p99": _percentile(calls, 0.99),
+        }
+    return stats
+
+
+def reset_latency_stats():
+    for samples in _latencies.values():
+        samples.clear()
@@ -0,0 +1,152 @@
+"""
+Cache of LLM quiz generations
+Keyed by a hash of (model, prompt template version, content, parameters) and
+holding the parsed, validated questions, so a retry or a double-click does not
+pay for a second generation. Entries expire after a TTL; callers pass
+use_cache=False to force a fresh generation.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Process-local counters; per-entry hit counts are stored on the rows
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "bypassed": 0, "errors": 0}
+
+
+def _count(name: str):
+    with _lock:
+        _counters[name] += 1
+
+
+def fingerprint(model: str, template_version: str, content: str, **params) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "template_version": template_version,
+            "content_sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(db: Session, key: str) -> Optional[List[dict]]:
+    entry = db.get(models.LlmResponseCache, key)
+    if entry is None or entry.expires_at <= datetime.utcnow():
+        return None
+    entry.hits = (entry.hits or 0) + 1
+    db.commit()
+    return entry.questions
+
+
+def put(
+    db: Session,
+    key: str,
+    model: str,
+    template_version: str,
+    questions: List[dict],
+    ttl_seconds: Optional[int] = None,
+):
+    now = datetime.utcnow()
+    # Expired rows are only ever overwritten or purged here
+    db.query(models.LlmResponseCache).filter(
+        models.LlmResponseCache.expires_at <= now
+    ).delete(synchronize_session=False)
+
+    entry = db.get(models.LlmResponseCache, key)
+    if entry is None:
+        entry = models.LlmResponseCache(key=key)
+        db.add(entry)
+    entry.model = model
+    entry.template_version = template_version
+    entry.questions = questions
+    entry.hits = 0
+    entry.created_at = now
+    entry.expires_at = now + timedelta(seconds=ttl_seconds or TTL_SECONDS)
+    db.commit()
+
+
+def cached_generation(
+    generate: Callable[[], List[dict]],
+    model: str,
+    template_version: str,
+    content: str,
+    use_cache: bool = True,
+    **params,
+) -> List[dict]:
+    """
+    Return cached questions for this prompt fingerprint, or call generate() and
+    cache its result. With use_cache=False the lookup is skipped but the fresh
+    result still replaces the stored entry. Cache failures are logged and never
+    fail the generation.
+    """
+    from .database import SessionLocal
+
+    key = fingerprint(model, template_version, content, **params)
+    db = SessionLocal()
+    try:
+        if use_cache:
+            try:
+                cached = get(db, key)
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+                _count("errors")
+                db.rollback()
+                cached = None
+
+            if cached:
+                _count("hits")
+                logger.info(f"LLM cache hit for {model} ({key[:12]})")
+                return cached
+            _count("misses")
+        else:
+            _count("bypassed")
+
+        questions = generate()
+        if questions:
+            try:
+                put(db, key, model, template_version, questions)
+            except Exception as e:
+                logger.warning(f"Failed to cache LLM response: {e}")
+                _count("errors")
+                db.rollback()
+        return questions
+    finally:
+        db.close()
+
+
+def stats(db: Session) -> dict:
+    now = datetime.utcnow()
+    entries, stored_hits = (
+        db.query(
+            func.count(models.LlmResponseCache.key),
+            func.coalesce(func.sum(models.LlmResponseCache.hits), 0),
+        )
+        .filter(models.LlmResponseCache.expires_at > now)
+        .one()
+    )
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        **counters,
+        "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "entry_hits": int(stored_hits or 0),
+    }
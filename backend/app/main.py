@@ -6,20 +6,26 @@ from fastapi import (
     UploadFile,
     File,
     Form,
-    BackgroundTasks,
+    Query,
+    Response,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 from uuid import UUID
+import csv
+import io
+import json
 import logging
 import os
-import tempfile
 
-from . import models, schemas, crud, database, auth, utils
-from .gemini_quiz import GeminiQuizGenerator
-from .video_quiz import VideoQuizGenerator
+from . import models, schemas, crud, database, auth, utils, jobs, llm_cache
+from . import quiz_provider, quiz_tasks
+from .activity_feed import feed as activity_feed
+from .leaderboard import leaderboards
+from .question_index import DUPLICATE_THRESHOLD, MIN_THRESHOLD, question_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,10 +52,43 @@ def startup_event():
     except Exception as e:
         logger.error("Error creating database tables: %s", e)
 
+    # One generation provider per process, shared by every request
+    try:
+        quiz_provider.get_provider()
+    except Exception as e:
+        logger.warning("Quiz generation provider unavailable: %s", e)
+
+    # The activity feed, leaderboards and funnel cache live in process memory
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        logger.warning(
+            "WEB_CONCURRENCY > 1: the activity feed, leaderboards and course "
+            "funnels are per process and will differ between API workers"
+        )
+
+    db = database.SessionLocal()
+    try:
+        # Reporting tables added after the data they summarise start out empty
+        rebuilt = crud.backfill_reporting_tables(db)
+        if rebuilt:
+            logger.info("Backfilled reporting tables: %s", ", ".join(rebuilt))
+    except Exception as e:
+        db.rollback()
+        logger.error("Error backfilling reporting tables: %s", e)
+
+    try:
+        activity_feed.rehydrate(db)
+        leaderboards.rebuild(db)
+    except Exception as e:
+        logger.error("Error loading in-memory reporting state: %s", e)
+    finally:
+        db.close()
+    activity_feed.start()
+
 
 @app.on_event("shutdown")
 def shutdown_event():
     logger.info("Shutting down Application")
+    activity_feed.stop()
     database.engine.dispose()
     logger.info("Database connection closed")
 
@@ -60,6 +99,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -140,52 +180,21 @@ def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
 # ---- COURSE ENDPOINTS ----
 
 
-def generate_quiz_background(course_id: UUID, video_url: str):
-    """Background task to generate quiz for a new course."""
-    logger.info(f"Starting background quiz generation for {course_id}")
-    db = database.SessionLocal()
-    try:
-        generator = VideoQuizGenerator()
-        logger.info(f"Transcribing {video_url}...")
-        transcript = generator.transcribe_video(video_url)
-
-        course = crud.get_course(db, course_id=course_id)
-        if not course:
-            logger.error("Course not found in background task")
-            return
-
-        # Generate 15 questions (as per updated prompt in video_quiz.py)
-        logger.info(f"Generating questions for {course.title}...")
-        questions = generator.generate_quiz(transcript, course.title)
-
-        logger.info(f"Saving {len(questions)} questions to DB...")
-        new_quiz = models.Quiz(
-            course_id=course_id,
-            title=f"Video Quiz: {course.title}",
-            questions=questions,
-        )
-        db.add(new_quiz)
-        db.commit()
-        logger.info(f"Background quiz generation successful for {course_id}")
-
-    except Exception as e:
-        logger.error(f"Background quiz generation failed for {course_id}: {e}")
-    finally:
-        db.close()
-
-
 @app.post("/api/courses/", response_model=schemas.Course)
 def create_course(
     course: schemas.CourseCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_admin),
 ):
     new_course = crud.create_course(db=db, course=course)
 
     if new_course.video_url:
-        background_tasks.add_task(
-            generate_quiz_background, new_course.id, new_course.video_url
+        # Quiz generation runs on a queue worker (see run_worker.py)
+        jobs.enqueue(
+            db,
+            "video_quiz",
+            {"course_id": str(new_course.id), "video_url": new_course.video_url},
+            priority=jobs.PRIORITY_BACKGROUND,
         )
 
     return new_course
@@ -385,22 +394,108 @@ def read_users(
 
 @app.get("/api/admin/reports", response_model=List[schemas.UserReportItem])
 def read_admin_reports(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    sort_by: str = "full_name",
+    order: str = "asc",
+    min_completion: Optional[float] = None,
+    max_completion: Optional[float] = None,
+    search: Optional[str] = None,
+    at_risk: Optional[bool] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_admin),
 ):
-    reports = crud.get_user_reports(db, skip=skip, limit=limit)
+    """
+    Learner reports with server-side filtering, sorting and keyset pagination.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
+    try:
+        reports, next_cursor = crud.get_user_reports(
+            db,
+            skip=skip,
+            limit=limit,
+            sort_by=sort_by,
+            order=order,
+            min_completion=min_completion,
+            max_completion=max_completion,
+            search=search,
+            at_risk=at_risk,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return reports
 
 
-@app.get("/api/admin/recent-activity", response_model=List[schemas.User])
+REPORT_EXPORT_FIELDS = [
+    "user_id",
+    "full_name",
+    "email",
+    "courses_enrolled",
+    "courses_completed",
+    "completion_percentage",
+]
+
+
+def stream_report_export(export_format: str):
+    """Generator that encodes the full learner report row by row."""
+    # The response outlives the request-scoped session, so use our own
+    db = database.SessionLocal()
+    try:
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=REPORT_EXPORT_FIELDS)
+            writer.writeheader()
+            for row in crud.iter_user_reports(db):
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            yield buffer.getvalue()
+        else:
+            for row in crud.iter_user_reports(db):
+                yield json.dumps(row, default=str) + "\n"
+    finally:
+        db.close()
+
+
+@app.get("/api/admin/reports/export")
+def export_admin_reports(
+    format: str = "csv",
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """
+    Stream the full learner report as CSV or NDJSON.
+    Rows are read with a server-side cursor and written out as they arrive.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=400, detail="Unsupported format, use 'csv' or 'ndjson'"
+        )
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_report_export(format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="learner_report.{format}"'
+        },
+    )
+
+
+@app.get("/api/admin/recent-activity", response_model=List[schemas.ActivityEvent])
 def read_recent_activity(
-    limit: int = 5,
-    db: Session = Depends(database.get_db),
+    limit: int = Query(5, ge=1, le=500),
+    event_type: Optional[str] = None,
     current_user: models.User = Depends(get_current_active_admin),
 ):
-    return crud.get_recent_activity(db, limit=limit)
+    """Newest-first signups, enrollments, quiz submissions and completions"""
+    return crud.get_recent_activity(limit=limit, event_type=event_type)
 
 
 # ---- PROGRESS ENDPOINTS ----
@@ -511,6 +606,40 @@ def get_quiz_result(
     return submission
 
 
+# ---- LEADERBOARD ENDPOINTS ----
+
+
+@app.get("/api/leaderboards/global", response_model=List[schemas.LeaderboardEntry])
+def read_global_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    return crud.get_leaderboard(db, limit=limit)
+
+
+@app.get(
+    "/api/leaderboards/courses/{course_id}",
+    response_model=List[schemas.LeaderboardEntry],
+)
+def read_course_leaderboard(
+    course_id: UUID,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    return crud.get_leaderboard(db, course_id=course_id, limit=limit)
+
+
+@app.get("/api/leaderboards/me", response_model=schemas.LeaderboardRank)
+def read_my_leaderboard_rank(
+    course_id: Optional[UUID] = None,
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Current learner's rank on a course board, or on the global board"""
+    return crud.get_leaderboard_rank(current_user.id, course_id=course_id)
+
+
 # ---- RESOURCE ENDPOINTS ----
 
 
@@ -598,137 +727,113 @@ def get_user_detailed_report(
     return report
 
 
-# Validated schema and auth flow. created_at column confirmed to exist.
-
-
-# ---- QUIZ GENERATION ENDPOINT ----
-
-
-@app.post("/api/courses/{course_id}/generate-quiz")
-async def generate_quiz_from_resource(
-    course_id: UUID,
-    file: UploadFile = File(...),
-    num_questions: int = 25,
+@app.get("/api/admin/activity", response_model=List[schemas.ActivityBucket])
+def get_activity_series(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    bucket: str = "day",
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_admin),
 ):
     """
-    Generate a quiz from an uploaded PDF resource using AI
-
-    Args:
-        course_id: UUID of the course
-        file: Uploaded PDF file
-        num_questions: Number of questions to generate (default: 25)
-
-    Returns:
-        Created quiz with generated questions
+    Activity time series for the admin dashboard charts.
+    Defaults to the last 30 days; bucket can be 'day' or 'week'.
     """
+    if bucket not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="bucket must be 'day' or 'week'")
 
-    # Validate file type
-    if not file.filename.endswith(".pdf"):
+    end_date = end_date or datetime.utcnow().date()
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
         raise HTTPException(
-            status_code=400, detail="Only PDF files are supported for quiz generation"
+            status_code=400, detail="start_date must not be after end_date"
         )
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="Date range cannot exceed one year")
 
-    # Verify course exists
-    course = crud.get_course(db, course_id=course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+    return crud.get_activity_series(
+        db, start_date=start_date, end_date=end_date, bucket=bucket
+    )
 
-    try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
 
-        logger.info(f"Processing PDF: {file.filename} for course {course_id}")
+@app.get("/api/admin/courses/funnel", response_model=List[schemas.CourseFunnel])
+def get_course_funnels(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    return crud.get_course_funnels(db)
 
-        # Step 1: Extract text from PDF
-        logger.info(f"Extracting text from PDF: {file.filename}")
-        text_content = utils.extract_text_from_pdf_file(temp_file_path)
 
-        # Clean up temp file
-        os.unlink(temp_file_path)
+@app.get("/api/admin/courses/{course_id}/funnel", response_model=schemas.CourseFunnel)
+def get_course_funnel(
+    course_id: UUID,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    funnel = crud.get_course_funnel(db, course_id=course_id)
+    if not funnel:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return funnel
 
-        if not text_content or len(text_content) < 100:
-            raise HTTPException(
-                status_code=400, detail="Insufficient content extracted from the PDF"
-            )
 
-        # Step 2: Generate quiz using Gemini
-        logger.info(f"Generating {num_questions} questions using Gemini 1.5 Flash...")
-        quiz_gen = GeminiQuizGenerator()
-        questions = quiz_gen.generate_quiz(text_content, num_questions=num_questions)
+@app.get(
+    "/api/admin/quizzes/{quiz_id}/score-distribution",
+    response_model=schemas.ScoreDistribution,
+)
+def get_quiz_score_distribution(
+    quiz_id: UUID,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    return crud.get_quiz_score_distribution(db, quiz_id=quiz_id)
 
-        if not questions:
-            raise HTTPException(
-                status_code=500, detail="Failed to generate questions from the PDF"
-            )
 
-        # Questions are already in the correct database format
-        # Format: {"question": str, "options": [str], "answer": str}
-        quiz_questions = questions
+@app.get(
+    "/api/admin/courses/{course_id}/score-distribution",
+    response_model=schemas.ScoreDistribution,
+)
+def get_course_score_distribution(
+    course_id: UUID,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """Score distribution across all of a course's quizzes"""
+    return crud.get_course_score_distribution(db, course_id=course_id)
 
-        # Create quiz in database
-        quiz_title = f"Auto-Generated Quiz: {file.filename}"
-        new_quiz = models.Quiz(
-            course_id=course_id, title=quiz_title, questions=quiz_questions
-        )
 
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
+# Validated schema and auth flow. created_at column confirmed to exist.
 
-        logger.info(f"Successfully created quiz with {len(quiz_questions)} questions")
 
-        return {
-            "message": "Quiz generated successfully",
-            "quiz_id": new_quiz.id,
-            "title": quiz_title,
-            "num_questions": len(quiz_questions),
-            "questions": quiz_questions,
-        }
+# ---- QUIZ GENERATION ENDPOINT ----
+# Generation runs on queue workers; these endpoints validate, enqueue a job and
+# return 202 with a status URL to poll. They are plain defs so FastAPI runs the
+# database and disk work in its threadpool instead of on the event loop.
 
-    except ValueError as e:
-        logger.error(f"Validation error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.error(f"Error generating quiz: {e}", exc_info=True)
-        # Clean up temp file if it exists
-        if "temp_file_path" in locals() and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate quiz: {str(e)}"
-        )
 
+def queued_response(job: models.Job) -> JSONResponse:
+    body = schemas.JobQueued(
+        message="Quiz generation queued",
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/api/jobs/{job.id}",
+    )
+    return JSONResponse(status_code=202, content=body.model_dump(mode="json"))
 
-@app.post("/api/generate-quiz/{course_id}")
-async def generate_quiz_from_storage_resource(
-    course_id: UUID,
-    resource_id: UUID,
-    num_questions: int = 25,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_active_admin),
-):
-    """
-    Generate a quiz from an existing PDF resource stored in Supabase
 
-    Args:
-        course_id: UUID of the course
-        resource_id: UUID of the resource (PDF) in the database
-        num_questions: Number of questions to generate (default: 25)
+def save_pdf_upload(file: UploadFile) -> str:
+    """Save an uploaded PDF for generation; 413 if it is over utils.MAX_PDF_BYTES"""
+    try:
+        return jobs.save_upload(file.file, suffix=".pdf", max_bytes=utils.MAX_PDF_BYTES)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    Returns:
-        Created quiz with generated questions
-    """
 
-    # Verify course exists
+def get_pdf_resource(db: Session, course_id: UUID, resource_id: UUID):
+    """A course's PDF resource, or the 404/400 the generation endpoints return"""
     course = crud.get_course(db, course_id=course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # Get the resource from database
     resource = (
         db.query(models.Resource)
         .filter(
@@ -736,172 +841,318 @@ async def generate_quiz_from_storage_resource(
         )
         .first()
     )
-
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
 
-    # Validate it's a PDF
     if not resource.file_name.lower().endswith(".pdf"):
         raise HTTPException(
             status_code=400,
             detail="Only PDF resources are supported for quiz generation",
         )
+    return resource
 
-    try:
-        logger.info(
-            f"Generating quiz from resource: {resource.file_name} (ID: {resource_id})"
+
+def get_first_pdf_resource(db: Session, course_id: UUID):
+    """The course and its first PDF resource, used by auto-generation"""
+    course = crud.get_course(db, course_id=course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    resource = (
+        db.query(models.Resource)
+        .filter(
+            models.Resource.course_id == course_id,
+            models.Resource.file_name.ilike("%.pdf"),
         )
+        .first()
+    )
+    if not resource:
+        raise HTTPException(
+            status_code=404,
+            detail="No PDF resources found for this course. Please upload a PDF resource first.",
+        )
+    return course, resource
 
-        # Step 1: Extract text from PDF URL
-        text_content = utils.extract_text_from_pdf_url(resource.file_url)
 
-        # Step 2: Generate quiz using Gemini 1.5 Flash
-        logger.info(f"Generating {num_questions} questions using Gemini 1.5 Flash...")
-        quiz_gen = GeminiQuizGenerator()
-        questions = quiz_gen.generate_quiz(text_content, num_questions=num_questions)
+def sse_response(events) -> StreamingResponse:
+    """Encode (event, data) pairs from a quiz stream as server-sent events"""
 
-        if not questions:
-            raise HTTPException(
-                status_code=500, detail="Failed to generate questions from the PDF"
-            )
+    def encode():
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-        # Questions are already in the correct database format
-        # Format: {"question": str, "options": [str], "answer": str}
-        quiz_questions = questions
+    return StreamingResponse(
+        encode(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        # Create quiz in database
-        quiz_title = f"Auto-Generated Quiz: {resource.file_name}"
-        new_quiz = models.Quiz(
-            course_id=course_id, title=quiz_title, questions=quiz_questions
-        )
 
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
+@app.get("/api/jobs/{job_id}", response_model=schemas.Job)
+def read_job(
+    job_id: UUID,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-        logger.info(f"Successfully created quiz with {len(quiz_questions)} questions")
 
-        return {
-            "message": "Quiz generated successfully",
-            "quiz_id": str(new_quiz.id),
-            "title": quiz_title,
-            "num_questions": len(quiz_questions),
-            "questions": quiz_questions,
-        }
+@app.get("/api/admin/llm-cache/stats")
+def read_llm_cache_stats(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """
+    Generation cache metrics. hits/misses/bypassed count lookups made by this
+    process; entries and entry_hits cover every process sharing the database.
+    """
+    return llm_cache.stats(db)
 
-    except ValueError as e:
-        logger.error(f"Validation error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.error(f"Error generating quiz: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate quiz: {str(e)}"
-        )
+
+@app.get(
+    "/api/admin/question-duplicates", response_model=List[schemas.DuplicateCluster]
+)
+def read_question_duplicates(
+    course_id: Optional[UUID] = None,
+    threshold: float = Query(DUPLICATE_THRESHOLD, ge=MIN_THRESHOLD, le=1.0),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """
+    Clusters of near-identical questions across a course's quizzes (or every
+    course), largest first. threshold is the estimated Jaccard similarity of
+    the stems' character shingles.
+    """
+    question_index.sync(db, course_id)
+    return question_index.clusters(course_id, threshold=threshold)
 
 
-@app.post("/api/courses/{course_id}/auto-generate-quiz")
-async def auto_generate_quiz_for_course(
+@app.post("/api/courses/{course_id}/generate-quiz", status_code=202)
+def generate_quiz_from_resource(
     course_id: UUID,
+    file: UploadFile = File(...),
+    num_questions: int = 25,
+    regenerate: bool = False,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_admin),
 ):
     """
-    Automatically generate a 25-question Knowledge Check quiz for a course
-    Uses the first PDF resource found in the course
+    Queue quiz generation from an uploaded PDF resource using AI
 
     Args:
         course_id: UUID of the course
+        file: Uploaded PDF file
+        num_questions: Number of questions to generate (default: 25)
+        regenerate: Skip the generation cache and ask the model again
 
     Returns:
-        Created quiz with 25 generated questions
+        Job id and status URL for the queued generation
     """
 
+    # Validate file type
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(
+            status_code=400, detail="Only PDF files are supported for quiz generation"
+        )
+
     # Verify course exists
     course = crud.get_course(db, course_id=course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # Find PDF resources for this course
-    pdf_resources = (
-        db.query(models.Resource)
-        .filter(
-            models.Resource.course_id == course_id,
-            models.Resource.file_name.ilike("%.pdf"),
-        )
-        .all()
+    # Park the upload where a worker can read it
+    file_path = save_pdf_upload(file)
+
+    logger.info(f"Queueing quiz generation from {file.filename} for course {course_id}")
+    job = jobs.enqueue(
+        db,
+        "pdf_quiz",
+        {
+            "course_id": str(course_id),
+            "file_path": file_path,
+            "num_questions": num_questions,
+            "title": f"Auto-Generated Quiz: {file.filename}",
+            "regenerate": regenerate,
+        },
     )
+    return queued_response(job)
 
-    if not pdf_resources:
-        raise HTTPException(
-            status_code=404,
-            detail="No PDF resources found for this course. Please upload a PDF resource first.",
-        )
 
-    # Use the first PDF resource
-    resource = pdf_resources[0]
+@app.post("/api/generate-quiz/{course_id}", status_code=202)
+def generate_quiz_from_storage_resource(
+    course_id: UUID,
+    resource_id: UUID,
+    num_questions: int = 25,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """
+    Queue quiz generation from an existing PDF resource stored in Supabase
 
-    try:
-        logger.info(
-            f"Auto-generating quiz for course {course_id} using resource: {resource.file_name}"
-        )
+    Args:
+        course_id: UUID of the course
+        resource_id: UUID of the resource (PDF) in the database
+        num_questions: Number of questions to generate (default: 25)
+        regenerate: Skip the generation cache and ask the model again
 
-        # Step 1: Extract text from PDF
-        logger.info(f"Extracting text from PDF: {resource.file_url}")
-        text_content = utils.extract_text_from_pdf_url(resource.file_url)
+    Returns:
+        Job id and status URL for the queued generation
+    """
 
-        # Step 2: Generate quiz using Gemini 1.5 Flash
-        logger.info("Generating 25 questions using Gemini 1.5 Flash...")
-        quiz_gen = GeminiQuizGenerator()
-        questions = quiz_gen.generate_quiz(text_content, num_questions=25)
+    resource = get_pdf_resource(db, course_id, resource_id)
 
-        if not questions or len(questions) == 0:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to generate questions from the PDF content",
-            )
+    logger.info(
+        f"Queueing quiz generation from resource: {resource.file_name} (ID: {resource_id})"
+    )
+    job = jobs.enqueue(
+        db,
+        "pdf_quiz",
+        {
+            "course_id": str(course_id),
+            "resource_id": str(resource_id),
+            "num_questions": num_questions,
+            "title": f"Auto-Generated Quiz: {resource.file_name}",
+            "regenerate": regenerate,
+        },
+    )
+    return queued_response(job)
 
-        # Step 3: Save to database
-        quiz_title = f"Knowledge Check: {course.title}"
-        new_quiz = models.Quiz(
-            course_id=course_id, title=quiz_title, questions=questions
-        )
 
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
+@app.post("/api/courses/{course_id}/auto-generate-quiz", status_code=202)
+def auto_generate_quiz_for_course(
+    course_id: UUID,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """
+    Queue a 25-question Knowledge Check quiz for a course
+    Uses the first PDF resource found in the course
+
+    Args:
+        course_id: UUID of the course
+        regenerate: Skip the generation cache and ask the model again
+
+    Returns:
+        Job id and status URL for the queued generation
+    """
 
-        logger.info(f"Successfully created quiz with {len(questions)} questions")
+    course, resource = get_first_pdf_resource(db, course_id)
 
-        return {
-            "success": True,
-            "message": "Quiz generated successfully",
-            "quiz_id": str(new_quiz.id),
-            "title": quiz_title,
-            "num_questions": len(questions),
-            "resource_used": resource.file_name,
-            "questions": questions,
-        }
+    logger.info(
+        f"Queueing auto quiz generation for course {course_id} using resource: {resource.file_name}"
+    )
+    job = jobs.enqueue(
+        db,
+        "pdf_quiz",
+        {
+            "course_id": str(course_id),
+            "resource_id": str(resource.id),
+            "num_questions": 25,
+            "title": f"Knowledge Check: {course.title}",
+            "regenerate": regenerate,
+        },
+    )
+    return queued_response(job)
 
-    except ValueError as e:
-        logger.error(f"Validation error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.error(f"Error generating quiz: {e}", exc_info=True)
+
+# ---- STREAMING VARIANTS ----
+# Server-sent events: status, one question event per question as soon as it is
+# generated, then done (with the saved quiz id) or error. Generation runs in
+# the request instead of on a worker, so the client sees progress right away.
+# Video quizzes stay queue-only; transcription alone takes minutes.
+
+
+@app.post("/api/courses/{course_id}/generate-quiz/stream")
+def stream_quiz_from_upload(
+    course_id: UUID,
+    file: UploadFile = File(...),
+    num_questions: int = 25,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """Streaming variant of POST /api/courses/{course_id}/generate-quiz"""
+    if not file.filename.endswith(".pdf"):
         raise HTTPException(
-            status_code=500, detail=f"Failed to generate quiz: {str(e)}"
+            status_code=400, detail="Only PDF files are supported for quiz generation"
         )
+    if not crud.get_course(db, course_id=course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    # The upload is closed when the request returns, before the stream runs
+    file_path = save_pdf_upload(file)
+    return sse_response(
+        quiz_tasks.stream_pdf_quiz(
+            str(course_id),
+            f"Auto-Generated Quiz: {file.filename}",
+            num_questions=num_questions,
+            file_path=file_path,
+            regenerate=regenerate,
+        )
+    )
+
+
+@app.post("/api/generate-quiz/{course_id}/stream")
+def stream_quiz_from_storage_resource(
+    course_id: UUID,
+    resource_id: UUID,
+    num_questions: int = 25,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """Streaming variant of POST /api/generate-quiz/{course_id}"""
+    resource = get_pdf_resource(db, course_id, resource_id)
+    events = quiz_tasks.stream_pdf_quiz(
+        str(course_id),
+        f"Auto-Generated Quiz: {resource.file_name}",
+        num_questions=num_questions,
+        resource_id=str(resource.id),
+        file_url=resource.file_url,
+        resource_used=resource.file_name,
+        regenerate=regenerate,
+    )
+    return sse_response(events)
+
 
+@app.post("/api/courses/{course_id}/auto-generate-quiz/stream")
+def stream_auto_generated_quiz(
+    course_id: UUID,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_admin),
+):
+    """Streaming variant of POST /api/courses/{course_id}/auto-generate-quiz"""
+    course, resource = get_first_pdf_resource(db, course_id)
+    events = quiz_tasks.stream_pdf_quiz(
+        str(course_id),
+        f"Knowledge Check: {course.title}",
+        num_questions=25,
+        resource_id=str(resource.id),
+        file_url=resource.file_url,
+        resource_used=resource.file_name,
+        regenerate=regenerate,
+    )
+    return sse_response(events)
 
-@app.post("/api/courses/{course_id}/generate-quiz-from-video")
-async def generate_quiz_from_video(
+
+@app.post("/api/courses/{course_id}/generate-quiz-from-video", status_code=202)
+def generate_quiz_from_video(
     course_id: UUID,
     file: UploadFile = File(None),
     video_url: str = Form(None),
+    regenerate: bool = False,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_admin),
 ):
     """
-    Generate a quiz from a video file or URL for a specific course.
+    Queue quiz generation from a video file or URL for a specific course.
     """
     course = crud.get_course(db, course_id=course_id)
     if not course:
@@ -916,57 +1167,15 @@ async def generate_quiz_from_video(
                 detail="Either file, video_url provided, or course video_url is required",
             )
 
-    try:
-        generator = VideoQuizGenerator()
-
-        transcript_text = ""
-        if file:
-            suffix = os.path.splitext(file.filename)[1] if file.filename else ".mp4"
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                content = await file.read()
-                temp_file.write(content)
-                temp_path = temp_file.name
-
-            try:
-                transcript_text = generator.transcribe_video(temp_path)
-            finally:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-        else:
-            transcript_text = generator.transcribe_video(video_url)
-
-        if not transcript_text:
-            raise HTTPException(status_code=500, detail="Failed to transcribe video")
+    payload = {"course_id": str(course_id), "regenerate": regenerate}
+    if file:
+        suffix = os.path.splitext(file.filename)[1] if file.filename else ".mp4"
+        payload["file_path"] = jobs.save_upload(file.file, suffix=suffix)
+    else:
+        payload["video_url"] = video_url
 
-        # Generate quiz JSON
-        parsed_questions = generator.generate_quiz(transcript_text, course.title)
-
-        import json
-
-        quiz_markdown = json.dumps(parsed_questions, indent=2)
-
-        # Save to DB
-        quiz_title = f"Video Quiz: {course.title}"
-        new_quiz = models.Quiz(
-            course_id=course_id, title=quiz_title, questions=parsed_questions
-        )
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
-
-        return {
-            "success": True,
-            "message": "Quiz generated successfully",
-            "quiz_id": str(new_quiz.id),
-            "markdown": quiz_markdown,
-            "questions": parsed_questions,
-        }
-
-    except Exception as e:
-        logger.error(f"Error generating video quiz: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate quiz: {str(e)}"
-        )
+    job = jobs.enqueue(db, "video_quiz", payload)
+    return queued_response(job)
 
 
 if __name__ == "__main__":
@@ -6,10 +6,14 @@ from sqlalchemy import (
     String,
     Text,
     DateTime,
+    Date,
     Float,
     JSON,
     Integer,  # Keep for backwards compatibility if needed
+    LargeBinary,
     Uuid,  # Generic UUID type compatible with SQLite
+    UniqueConstraint,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -38,6 +42,15 @@ class User(Base):
     quiz_submissions = relationship(
         "QuizSubmission", back_populates="student", cascade="all, delete-orphan"
     )
+    learning_facts = relationship(
+        "LearningFact", back_populates="student", cascade="all, delete-orphan"
+    )
+    activity_bitmap = relationship(
+        "UserActivityBitmap",
+        back_populates="student",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
 
 class Course(Base):
@@ -61,6 +74,9 @@ class Course(Base):
     resources = relationship(
         "Resource", back_populates="course", cascade="all, delete-orphan"
     )
+    learning_facts = relationship(
+        "LearningFact", back_populates="course", cascade="all, delete-orphan"
+    )
 
 
 class Resource(Base):
@@ -88,6 +104,12 @@ class Quiz(Base):
     submissions = relationship(
         "QuizSubmission", back_populates="quiz", cascade="all, delete-orphan"
     )
+    score_histogram = relationship(
+        "QuizScoreHistogram",
+        back_populates="quiz",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
     @property
     def normalized_questions(self):
@@ -151,3 +173,202 @@ class Progress(Base):
 
     student = relationship("User", back_populates="progress")
     course = relationship("Course", back_populates="progress")
+
+
+class LearningFact(Base):
+    """
+    Materialized user x course reporting row.
+    Maintained incrementally by the assign, progress and quiz submit write paths
+    so admin reports never have to recompute from the raw tables.
+    """
+
+    __tablename__ = "learning_facts"
+    __table_args__ = (UniqueConstraint("user_id", "course_id"),)
+
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    user_id = Column(
+        Uuid(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    course_id = Column(
+        Uuid(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"), index=True
+    )
+    enrolled_at = Column(DateTime, nullable=True)
+    started = Column(Boolean, default=False)
+    completed = Column(Boolean, default=False)
+    playback_position = Column(Float, default=0.0)
+    best_score = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0)
+    last_activity_at = Column(DateTime, nullable=True)
+
+    student = relationship("User", back_populates="learning_facts")
+    course = relationship("Course", back_populates="learning_facts")
+
+
+class ActivityDaily(Base):
+    """
+    Pre-aggregated activity counters, one row per UTC day.
+    active_learners_sketch is a HyperLogLog of the learners active that day.
+    Only days recorded before activity_daily_shards existed are stored here.
+    """
+
+    __tablename__ = "activity_daily"
+
+    day = Column(Date, primary_key=True)
+    new_enrollments = Column(Integer, default=0, nullable=False)
+    progress_updates = Column(Integer, default=0, nullable=False)
+    submissions = Column(Integer, default=0, nullable=False)
+    passes = Column(Integer, default=0, nullable=False)
+    active_learners_sketch = Column(LargeBinary, nullable=True)
+
+
+class ActivityDailyShard(Base):
+    """
+    Activity counters for one UTC day, split over a few rows (shards) so that
+    concurrent writers rarely lock the same row. A day's totals are the sum of
+    its shards; its distinct learners are the union of the shard sketches.
+    """
+
+    __tablename__ = "activity_daily_shards"
+
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    new_enrollments = Column(Integer, default=0, nullable=False)
+    progress_updates = Column(Integer, default=0, nullable=False)
+    submissions = Column(Integer, default=0, nullable=False)
+    passes = Column(Integer, default=0, nullable=False)
+    active_learners_sketch = Column(LargeBinary, nullable=True)
+
+
+class ActivityLog(Base):
+    """Persisted copy of the admin activity feed, used to rehydrate it on startup"""
+
+    __tablename__ = "activity_log"
+
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_type = Column(String, index=True)
+    user_id = Column(Uuid(as_uuid=True), nullable=True)
+    full_name = Column(String, nullable=True)
+    course_id = Column(Uuid(as_uuid=True), nullable=True)
+    course_title = Column(String, nullable=True)
+    description = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class QuizScoreHistogram(Base):
+    """Per-quiz score distribution, stored as a serialized 0-100 ScoreHistogram"""
+
+    __tablename__ = "quiz_score_histograms"
+
+    quiz_id = Column(
+        Uuid(as_uuid=True),
+        ForeignKey("quizzes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    course_id = Column(
+        Uuid(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"), index=True
+    )
+    counts = Column(LargeBinary, nullable=True)
+
+    quiz = relationship("Quiz", back_populates="score_histogram")
+
+
+class UserActivityBitmap(Base):
+    """Per-learner daily activity bitmap (see sketches.ActivityBitmap)"""
+
+    __tablename__ = "user_activity_bitmaps"
+
+    user_id = Column(
+        Uuid(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    bitmap = Column(LargeBinary, nullable=True)
+
+    student = relationship("User", back_populates="activity_bitmap")
+
+
+class AtRiskEnrollment(Base):
+    """Enrollments flagged by the nightly at-risk detection job"""
+
+    __tablename__ = "at_risk_enrollments"
+
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        Uuid(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    course_id = Column(
+        Uuid(as_uuid=True), ForeignKey("courses.id", ondelete="CASCADE"), index=True
+    )
+    risk_score = Column(Float)
+    reasons = Column(String, nullable=True)
+    scored_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    """Durable background job (see jobs.py)"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_claim", "status", "priority", "run_after"),)
+
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    kind = Column(String, index=True)
+    payload = Column(JSON)
+    status = Column(String, default="queued")  # queued, running, succeeded, failed
+    priority = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TranscriptCache(Base):
+    """
+    Transcripts keyed by content (YouTube id, normalized URL or file SHA-256)
+    so regenerating a quiz never pays for the same transcription twice
+    """
+
+    __tablename__ = "transcript_cache"
+
+    key = Column(String, primary_key=True)
+    source = Column(Text)
+    transcript = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class PdfTextCache(Base):
+    """
+    zlib-compressed text extracted from a PDF. Rows are keyed by resource id
+    (revalidated with the storage ETag/Last-Modified) or by upload SHA-256.
+    """
+
+    __tablename__ = "pdf_text_cache"
+
+    key = Column(String, primary_key=True)
+    content_sha256 = Column(String, index=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    text_compressed = Column(LargeBinary, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LlmResponseCache(Base):
+    """Parsed, validated questions for a prompt fingerprint (see llm_cache.py)"""
+
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String, primary_key=True)
+    model = Column(String)
+    template_version = Column(String)
+    questions = Column(JSON, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
@@ -0,0 +1,186 @@
+"""
+Cache of text extracted from PDFs
+Stored resources are cached per Resource.id and revalidated with conditional
+GETs (ETag / Last-Modified); uploads are cached by content SHA-256. Text is
+zlib-compressed and the table is trimmed least-recently-used first once it
+passes its byte budget.
+"""
+
+import hashlib
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, utils
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(os.getenv("PDF_TEXT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+MIN_TEXT_CHARS = 100
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def _decompress(entry: models.PdfTextCache) -> str:
+    return zlib.decompress(entry.text_compressed).decode("utf-8")
+
+
+def _touch(db: Session, entry: models.PdfTextCache) -> str:
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+    return _decompress(entry)
+
+
+def _by_content(db: Session, digest: str) -> Optional[models.PdfTextCache]:
+    return (
+        db.query(models.PdfTextCache)
+        .filter(models.PdfTextCache.content_sha256 == digest)
+        .first()
+    )
+
+
+def _store(
+    db: Session,
+    key: str,
+    digest: str,
+    text: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+):
+    compressed = zlib.compress(text.encode("utf-8"), 6)
+    if len(compressed) > MAX_BYTES:
+        logger.warning(f"Extracted text for {key} exceeds the PDF cache budget")
+        return
+
+    entry = db.get(models.PdfTextCache, key)
+    if entry is None:
+        entry = models.PdfTextCache(key=key)
+        db.add(entry)
+    entry.content_sha256 = digest
+    entry.etag = etag
+    entry.last_modified = last_modified
+    entry.text_compressed = compressed
+    entry.size_bytes = len(compressed)
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+
+    evict(db)
+
+
+def _text_for_content(db: Session, content: bytes, digest: str) -> str:
+    """Reuse text already extracted from identical bytes, otherwise parse the PDF"""
+    existing = _by_content(db, digest)
+    if existing:
+        logger.info(
+            f"Reusing text extracted from identical PDF content ({digest[:12]})"
+        )
+        return _decompress(existing)
+    return utils.extract_text_from_pdf_bytes(content)
+
+
+def text_for_file(db: Session, pdf_path: str) -> str:
+    """Extracted text for an uploaded PDF, cached by content hash"""
+    sha256 = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        head = f.read(utils.PDF_HEADER_WINDOW)
+        utils.check_pdf_magic(head)
+        sha256.update(head)
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            sha256.update(block)
+    digest = sha256.hexdigest()
+
+    entry = _by_content(db, digest)
+    if entry:
+        logger.info(f"Using cached PDF text for upload ({digest[:12]})")
+        return _touch(db, entry)
+
+    text = utils.extract_text_from_pdf_file(pdf_path)
+    if len(text) >= MIN_TEXT_CHARS:
+        _store(db, f"sha256:{digest}", digest, text)
+    return text
+
+
+def text_for_resource(db: Session, resource_id, file_url: str) -> str:
+    """
+    Extracted text for a stored course resource. A cached copy is revalidated
+    with the storage server and reused when it answers 304 Not Modified.
+    """
+    key = f"resource:{resource_id}"
+    entry = db.get(models.PdfTextCache, key)
+
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    content, response_headers = utils.download_pdf(file_url, headers=headers)
+    if content is None:
+        if entry is not None:
+            logger.info(f"PDF for resource {resource_id} not modified, using cache")
+            return _touch(db, entry)
+        # 304 without validators sent; fetch unconditionally
+        content, response_headers = utils.download_pdf(file_url)
+
+    digest = hashlib.sha256(content).hexdigest()
+    if entry is not None and entry.content_sha256 == digest:
+        # Server ignored the validators but the bytes are unchanged
+        text = _decompress(entry)
+    else:
+        text = _text_for_content(db, content, digest)
+
+    if len(text) < MIN_TEXT_CHARS:
+        raise ValueError(
+            "Insufficient text content extracted from PDF (minimum 100 characters required)"
+        )
+
+    _store(
+        db,
+        key,
+        digest,
+        text,
+        etag=response_headers.get("ETag"),
+        last_modified=response_headers.get("Last-Modified"),
+    )
+    return text
+
+
+def invalidate_resource(db: Session, resource_id):
+    db.query(models.PdfTextCache).filter(
+        models.PdfTextCache.key == f"resource:{resource_id}"
+    ).delete(synchronize_session=False)
+
+
+def evict(db: Session, max_bytes: Optional[int] = None) -> int:
+    """Delete least recently used entries until the compressed total fits max_bytes"""
+    if max_bytes is None:
+        max_bytes = MAX_BYTES
+
+    total = (
+        db.query(func.coalesce(func.sum(models.PdfTextCache.size_bytes), 0)).scalar()
+        or 0
+    )
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    oldest_first = db.query(
+        models.PdfTextCache.key, models.PdfTextCache.size_bytes
+    ).order_by(models.PdfTextCache.last_used_at)
+    for key, size in oldest_first.all():
+        if total <= max_bytes:
+            break
+        db.query(models.PdfTextCache).filter(models.PdfTextCache.key == key).delete(
+            synchronize_session=False
+        )
+        total -= size
+        removed += 1
+    db.commit()
+
+    logger.info(f"Evicted {removed} cached PDF texts ({total} bytes remain)")
+    return removed
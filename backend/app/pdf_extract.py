@@ -0,0 +1,163 @@
+"""
+PDF text extraction service
+Small documents are parsed inline; large ones are split into page ranges and
+extracted in parallel worker processes, so one big manual does not hold the
+GIL for seconds. Results are joined in page order. Documents share one lazily
+started pool (spawning a pool costs more than parsing a mid-sized PDF); a
+timeout retires that pool, so the next document gets a fresh one and the hung
+worker is killed once the documents still using the old pool finish.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Documents with fewer pages than this are extracted inline
+INLINE_PAGE_THRESHOLD = int(os.getenv("PDF_INLINE_PAGE_THRESHOLD", "40"))
+MIN_PAGES_PER_RANGE = int(os.getenv("PDF_MIN_PAGES_PER_RANGE", "20"))
+# Worker processes in the shared pool
+POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+DOCUMENT_TIMEOUT_SECONDS = float(os.getenv("PDF_DOCUMENT_TIMEOUT_SECONDS", "90"))
+
+PdfSource = Union[str, bytes, bytearray]
+
+
+def _open(source: PdfSource) -> fitz.Document:
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _extract_range(path: str, start: int, end: int) -> str:
+    """Worker entry point: text of pages [start, end)"""
+    with fitz.open(path) as doc:
+        return "".join(doc[page].get_text() for page in range(start, end))
+
+
+def page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into at most `workers` contiguous ranges of similar size"""
+    count = max(1, min(workers, page_count // MIN_PAGES_PER_RANGE))
+    size, extra = divmod(page_count, count)
+    ranges, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+class _SharedPool:
+    """The process pool and how many extractions are using it"""
+
+    def __init__(self, size: int):
+        # spawn: MuPDF and our DB connections are not fork-safe
+        self.pool = multiprocessing.get_context("spawn").Pool(processes=size)
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        # Kills any worker still parsing, including a hung one
+        self.pool.terminate()
+        self.pool.join()
+
+
+_pool_lock = threading.Lock()
+_current: Optional[_SharedPool] = None
+
+
+def _acquire_pool() -> _SharedPool:
+    global _current
+    with _pool_lock:
+        if _current is None:
+            _current = _SharedPool(POOL_SIZE)
+        _current.users += 1
+        return _current
+
+
+def _release_pool(shared: _SharedPool, retire: bool):
+    """Give the pool back; a retired pool is closed by its last user"""
+    global _current
+    with _pool_lock:
+        shared.users -= 1
+        if retire and not shared.retired:
+            shared.retired = True
+            if _current is shared:
+                _current = None
+        close = shared.retired and shared.users == 0
+    if close:
+        shared.close()
+
+
+@atexit.register
+def shutdown_pool():
+    """Stop the shared pool's workers; the next extraction starts a new one"""
+    global _current
+    with _pool_lock:
+        shared, _current = _current, None
+        if shared:
+            shared.retired = True
+    if shared and shared.users == 0:
+        shared.close()
+
+
+def _extract_ranges(
+    path: str, ranges: List[Tuple[int, int]], timeout: float
+) -> List[str]:
+    """Extract page ranges of the PDF at path in parallel, in page order"""
+    shared = _acquire_pool()
+    timed_out = False
+    try:
+        results = [
+            shared.pool.apply_async(_extract_range, (path, s, e)) for s, e in ranges
+        ]
+        deadline = time.monotonic() + timeout
+        return [
+            result.get(timeout=max(0.0, deadline - time.monotonic()))
+            for result in results
+        ]
+    except multiprocessing.TimeoutError:
+        # Also what a crashed worker looks like: its range never returns
+        timed_out = True
+        raise ValueError(f"PDF extraction timed out after {timeout:g}s")
+    except Exception as e:
+        raise ValueError(f"PDF extraction worker failed: {e}")
+    finally:
+        # A worker may still be stuck on this document: stop handing out the
+        # pool, and kill it once other documents are done with it
+        _release_pool(shared, retire=timed_out)
+
+
+def extract_text(source: PdfSource, timeout: float = DOCUMENT_TIMEOUT_SECONDS) -> str:
+    """
+    Extract the text of a PDF given as a file path or in-memory bytes
+
+    Raises:
+        ValueError: If the PDF cannot be parsed or extraction times out
+    """
+    with _open(source) as doc:
+        page_count = doc.page_count
+        if page_count < INLINE_PAGE_THRESHOLD or POOL_SIZE <= 1:
+            return "".join(page.get_text() for page in doc)
+
+    ranges = page_ranges(page_count, POOL_SIZE)
+    logger.info(f"Extracting {page_count} pages in {len(ranges)} parallel ranges")
+
+    if isinstance(source, str):
+        return "".join(_extract_ranges(source, ranges, timeout))
+
+    # Workers open the document from disk rather than each receiving a copy
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(source)
+    try:
+        return "".join(_extract_ranges(f.name, ranges, timeout))
+    finally:
+        os.unlink(f.name)
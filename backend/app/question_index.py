@@ -0,0 +1,346 @@
+"""
+Near-duplicate detection for quiz questions
+Question stems are reduced to MinHash signatures over character shingles and
+bucketed with locality-sensitive hashing (LSH), so checking a new question
+against everything already in a course is a few dict lookups rather than a
+scan of every quiz. The index is per process and per course: a course is
+loaded from the quizzes table the first time it is used, kept current as
+quizzes are saved, and re-synced with the table before each lookup so quizzes
+written by other processes (workers, batch scripts) are picked up.
+"""
+
+import logging
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models
+from .chunking import normalize_stem
+from .sketches import MinHash
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: pairs at 0.7 similarity collide ~99% of the time
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# Lowest usable threshold for these bands: pairs at 0.6 still collide ~89% of
+# the time, but at 0.5 only ~64%, so lower thresholds would silently miss most
+# of the extra matches they promise
+MIN_THRESHOLD = 0.6
+DUPLICATE_THRESHOLD = max(
+    MIN_THRESHOLD, float(os.getenv("QUESTION_DUPLICATE_THRESHOLD", "0.7"))
+)
+SYNC_BATCH_SIZE = 500  # Quizzes loaded per query when catching up
+MAX_EXCLUSIONS = 200  # Existing stems listed when asking for replacements
+
+_minhash = MinHash(num_perm=NUM_PERM)
+
+
+def shingles(question: str) -> Set[str]:
+    stem = normalize_stem(question)
+    if len(stem) <= SHINGLE_SIZE:
+        return {stem} if stem else set()
+    return {stem[i : i + SHINGLE_SIZE] for i in range(len(stem) - SHINGLE_SIZE + 1)}
+
+
+def signature(question: str) -> np.ndarray:
+    return _minhash.signature(shingles(question))
+
+
+def _band_keys(sig: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [
+        (band, sig[band * ROWS : (band + 1) * ROWS].tobytes()) for band in range(BANDS)
+    ]
+
+
+class MinHashLSH:
+    """Signatures bucketed by band; query returns ids sharing any band"""
+
+    def __init__(self):
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def add(self, key: int, sig: np.ndarray):
+        self._signatures[key] = sig
+        for band_key in _band_keys(sig):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: int):
+        sig = self._signatures.pop(key, None)
+        if sig is None:
+            return
+        for band_key in _band_keys(sig):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def signature(self, key: int) -> np.ndarray:
+        return self._signatures[key]
+
+    def query(self, sig: np.ndarray, threshold: float = DUPLICATE_THRESHOLD):
+        """(key, similarity) of indexed signatures at or above threshold"""
+        candidates = set()
+        for band_key in _band_keys(sig):
+            candidates |= self._buckets.get(band_key, set())
+        matches = []
+        for key in candidates:
+            similarity = MinHash.similarity(sig, self._signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+
+@dataclass
+class IndexedQuestion:
+    quiz_id: UUID
+    index: int  # Position within the quiz
+    question: str
+
+
+class _CourseIndex:
+    def __init__(self):
+        self.lsh = MinHashLSH()
+        self.entries: Dict[int, IndexedQuestion] = {}
+        self.by_quiz: Dict[UUID, List[int]] = {}
+        self.next_key = 0
+
+
+class QuestionIndex:
+    """
+    Near-duplicate index over the question stems of every quiz, per course.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._courses: Dict[UUID, _CourseIndex] = {}
+
+    def add_quiz(self, course_id: UUID, quiz_id: UUID, questions: Optional[list]):
+        with self._lock:
+            self._add_quiz(course_id, quiz_id, questions)
+
+    def _add_quiz(self, course_id: UUID, quiz_id: UUID, questions: Optional[list]):
+        course = self._courses.setdefault(course_id, _CourseIndex())
+        if quiz_id in course.by_quiz:
+            return
+        keys = []
+        for position, question in enumerate(questions or []):
+            text = question.get("question") if isinstance(question, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                continue
+            key = course.next_key
+            course.next_key += 1
+            course.entries[key] = IndexedQuestion(quiz_id, position, text)
+            course.lsh.add(key, signature(text))
+            keys.append(key)
+        course.by_quiz[quiz_id] = keys
+
+    def _remove_quiz(self, course: _CourseIndex, quiz_id: UUID):
+        for key in course.by_quiz.pop(quiz_id, []):
+            course.lsh.remove(key)
+            del course.entries[key]
+
+    def remove_course(self, course_id: UUID):
+        with self._lock:
+            self._courses.pop(course_id, None)
+
+    def sync(self, db: Session, course_id: Optional[UUID] = None):
+        """
+        Bring the index in line with the quizzes table for one course (or
+        all): load quizzes not indexed yet and drop ones that were deleted.
+        Only quiz ids are read unless something changed.
+        """
+        query = db.query(models.Quiz.id, models.Quiz.course_id)
+        if course_id is not None:
+            query = query.filter(models.Quiz.course_id == course_id)
+        present: Dict[UUID, Set[UUID]] = {}
+        for quiz_id, quiz_course_id in query.all():
+            present.setdefault(quiz_course_id, set()).add(quiz_id)
+
+        missing = []
+        with self._lock:
+            scope = [course_id] if course_id is not None else set(self._courses)
+            for scoped_course in set(scope) | set(present):
+                course = self._courses.get(scoped_course)
+                indexed = set(course.by_quiz) if course else set()
+                current = present.get(scoped_course, set())
+                for quiz_id in indexed - current:
+                    self._remove_quiz(course, quiz_id)
+                missing.extend(current - indexed)
+
+        if not missing:
+            return
+        for start in range(0, len(missing), SYNC_BATCH_SIZE):
+            quizzes = (
+                db.query(models.Quiz.id, models.Quiz.course_id, models.Quiz.questions)
+                .filter(models.Quiz.id.in_(missing[start : start + SYNC_BATCH_SIZE]))
+                .all()
+            )
+            with self._lock:
+                for quiz_id, quiz_course_id, questions in quizzes:
+                    self._add_quiz(quiz_course_id, quiz_id, questions)
+        logger.info(f"Indexed {len(missing)} quizzes for duplicate detection")
+
+    def find_duplicates(
+        self,
+        course_id: UUID,
+        question: str,
+        threshold: float = DUPLICATE_THRESHOLD,
+    ) -> List[Tuple[IndexedQuestion, float]]:
+        """Indexed questions in the course similar to question, best first"""
+        return self.matches(course_id, signature(question), threshold)
+
+    def matches(
+        self,
+        course_id: UUID,
+        sig: np.ndarray,
+        threshold: float = DUPLICATE_THRESHOLD,
+    ) -> List[Tuple[IndexedQuestion, float]]:
+        with self._lock:
+            course = self._courses.get(course_id)
+            if not course:
+                return []
+            return [
+                (course.entries[key], similarity)
+                for key, similarity in course.lsh.query(sig, threshold)
+            ]
+
+    def questions(self, course_id: UUID) -> List[str]:
+        """Indexed question stems of a course"""
+        with self._lock:
+            course = self._courses.get(course_id)
+            if not course:
+                return []
+            return [entry.question for entry in course.entries.values()]
+
+    def new_filter(self, db: Session, course_id: UUID) -> "DuplicateFilter":
+        """A filter for one generation run, after syncing the course"""
+        self.sync(db, course_id)
+        return DuplicateFilter(self, course_id)
+
+    def clusters(
+        self,
+        course_id: Optional[UUID] = None,
+        threshold: float = DUPLICATE_THRESHOLD,
+    ) -> List[dict]:
+        """
+        Groups of two or more near-identical questions, largest first. Pairs
+        above the threshold are joined transitively (union-find).
+        """
+        result = []
+        with self._lock:
+            courses = (
+                [(course_id, self._courses.get(course_id))]
+                if course_id is not None
+                else list(self._courses.items())
+            )
+            for cid, course in courses:
+                if not course:
+                    continue
+                parent = {key: key for key in course.entries}
+
+                def find(key):
+                    while parent[key] != key:
+                        parent[key] = parent[parent[key]]
+                        key = parent[key]
+                    return key
+
+                for key in course.entries:
+                    sig = course.lsh.signature(key)
+                    for other, _ in course.lsh.query(sig, threshold):
+                        if other != key:
+                            parent[find(other)] = find(key)
+
+                groups: Dict[int, List[int]] = {}
+                for key in course.entries:
+                    groups.setdefault(find(key), []).append(key)
+                for keys in groups.values():
+                    if len(keys) < 2:
+                        continue
+                    members = [course.entries[key] for key in sorted(keys)]
+                    result.append(
+                        {
+                            "course_id": cid,
+                            "size": len(members),
+                            "questions": [
+                                {
+                                    "quiz_id": m.quiz_id,
+                                    "index": m.index,
+                                    "question": m.question,
+                                }
+                                for m in members
+                            ],
+                        }
+                    )
+        return sorted(result, key=lambda cluster: cluster["size"], reverse=True)
+
+
+class DuplicateFilter:
+    """
+    Accepts questions for one generation run, rejecting any that are near
+    duplicates of the course's existing questions or of ones already accepted
+    """
+
+    def __init__(self, index: QuestionIndex, course_id: UUID):
+        self._index = index
+        self._course_id = course_id
+        self._accepted = MinHashLSH()
+        self._matched: List[str] = []
+        # Quiz holding the best match of each question rejected against the index
+        self._repeated: Counter = Counter()
+        self.rejected = 0
+
+    @property
+    def accepted(self) -> int:
+        return len(self._accepted)
+
+    def accept(self, question: dict) -> bool:
+        text = question.get("question", "")
+        sig = signature(text)
+        existing = self._index.matches(self._course_id, sig)
+        self._matched.extend(entry.question for entry, _ in existing)
+        if existing:
+            self._repeated[existing[0][0].quiz_id] += 1
+        if existing or self._accepted.query(sig):
+            self.rejected += 1
+            logger.info(f"Dropping near-duplicate question: {text[:120]}")
+            return False
+        self._accepted.add(len(self._accepted), sig)
+        return True
+
+    def filter(self, questions: Iterable[dict]) -> List[dict]:
+        return [question for question in questions if self.accept(question)]
+
+    def repeated_quiz(self) -> Optional[UUID]:
+        """The existing quiz that most rejected questions came from"""
+        most_common = self._repeated.most_common(1)
+        return most_common[0][0] if most_common else None
+
+    def exclusions(self, limit: int = MAX_EXCLUSIONS) -> List[str]:
+        """
+        Existing stems that replacement questions must not repeat: the ones
+        matched by rejected questions first, then the rest of the course
+        """
+        stems = list(dict.fromkeys(self._matched))
+        matched = set(stems)
+        for stem in self._index.questions(self._course_id):
+            if len(stems) >= limit:
+                break
+            if stem not in matched:
+                stems.append(stem)
+        return stems[:limit]
+
+
+# Shared index updated when quizzes are saved
+question_index = QuestionIndex()
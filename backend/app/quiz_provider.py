@@ -0,0 +1,743 @@
+"""
+Shared quiz generation provider
+One long-lived QuizProvider per process (see get_provider) owns the LLM and
+transcription clients, so connections are reused instead of being rebuilt on
+every request. Backends are pluggable by name, and every generation goes
+through a single prompt / parse / validate path.
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from . import chunking
+from .json_stream import JsonArrayStreamParser, salvage_objects
+from .limits import run_limited
+from .llm_cache import cached_generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_BACKEND = os.getenv("QUIZ_LLM_BACKEND", "gemini")
+DEFAULT_LLM_MODEL = os.getenv("QUIZ_LLM_MODEL", "gemini-2.5-flash")
+DEFAULT_TRANSCRIPTION_BACKEND = os.getenv("QUIZ_TRANSCRIPTION_BACKEND", "assemblyai")
+
+OPTION_LETTERS = ["A", "B", "C", "D"]
+
+# Bump a template's version whenever its wording changes so cached
+# generations made from the old prompt are not reused
+DOCUMENT_PROMPT_VERSION = "2"
+TRANSCRIPT_PROMPT_VERSION = "2.1"
+
+DOCUMENT_PROMPT = """Based on this text, generate exactly {num_questions} multiple-choice questions in JSON format.
+
+TEXT:
+{text}
+
+REQUIREMENTS:
+1. Generate exactly {num_questions} questions
+2. Each question must have exactly 4 options labeled A, B, C, D
+3. Questions should test understanding and comprehension
+4. Cover different topics from the text
+5. Only ONE option should be correct
+6. The "answer" field must contain only the letter (A, B, C, or D)
+7. Make incorrect options plausible but clearly wrong
+8. Difficulty level: {difficulty}
+
+OUTPUT FORMAT (pure JSON array, no markdown, no code blocks):
+[
+  {{
+    "question": "What is the main concept of...",
+    "options": ["A) First option", "B) Second option", "C) Third option", "D) Fourth option"],
+    "answer": "A"
+  }},
+  {{
+    "question": "Which of the following...",
+    "options": ["A) Option one", "B) Option two", "C) Option three", "D) Option four"],
+    "answer": "C"
+  }}
+]
+
+CRITICAL RULES:
+- Return ONLY the JSON array, no additional text
+- No markdown formatting, no code blocks
+- Each option must start with its letter: A), B), C), D)
+- The "answer" field contains only the letter
+- Questions must be based on the provided text
+
+Generate the {num_questions} questions now:"""
+
+TRANSCRIPT_PROMPT = """
+Act as an Academic Content Engineer (v2.0).
+Your objective is to process the video transcript and produce a concise course assessment.
+
+Rules:
+1. Create exactly {num_questions} Multiple Choice Questions (MCQs).
+2. Format: 4 options (A, B, C, D) per question with 1 correct answer.
+3. Coverage: Ensure the {num_questions} questions are distributed evenly across the video content (beginning, middle, and end).
+4. Focus: Foundational concepts to advanced applications.
+
+Transcript:
+{text}
+
+Output must be a JSON array of objects. Each object should have:
+- "question": string
+- "options": list of 4 strings (e.g. ["A) Option 1", "B) Option 2", ...])
+- "correct_answer": string (e.g. "A", "B", "C", or "D")
+- "explanation": string
+"""
+
+VIDEO_QUIZ_QUESTIONS = 15
+
+# Appended to a prompt asking only for the questions still missing
+TOP_UP_INSTRUCTIONS = """
+
+These questions have already been written for this material. Do not repeat
+them or ask about the same fact in different words:
+{stems}"""
+
+# Follow-up requests made when a response has fewer valid questions than asked
+TOP_UP_ATTEMPTS = int(os.getenv("QUIZ_TOP_UP_ATTEMPTS", "1"))
+
+
+# ---- Parsing and validation ----
+
+
+def _answer_index(question: dict) -> Optional[int]:
+    """Correct option index from "answer", "correct_answer" or "correct_index" """
+    index = question.get("correct_index")
+    if isinstance(index, int) and not isinstance(index, bool):
+        return index if 0 <= index < 4 else None
+
+    answer = question.get("answer", question.get("correct_answer"))
+    if not isinstance(answer, str):
+        return None
+    letter = answer.strip().upper().lstrip("(")[:1]
+    return OPTION_LETTERS.index(letter) if letter in OPTION_LETTERS else None
+
+
+def normalize_question(question) -> Optional[dict]:
+    """
+    Validate one generated question and convert it to the stored format:
+    {"question", "options", "answer", "correct_index"[, "explanation"]}.
+    Returns None if the question is unusable.
+    """
+    if not isinstance(question, dict):
+        return None
+
+    text = question.get("question")
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    options = question.get("options")
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(opt, str) and opt.strip() for opt in options):
+        return None
+
+    index = _answer_index(question)
+    if index is None:
+        return None
+
+    normalized = {
+        "question": text.strip(),
+        "options": options,
+        "answer": OPTION_LETTERS[index],
+        "correct_index": index,
+    }
+    explanation = question.get("explanation")
+    if isinstance(explanation, str) and explanation.strip():
+        normalized["explanation"] = explanation.strip()
+    return normalized
+
+
+def strip_code_fences(response_text: str) -> str:
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    elif response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def parse_questions(response_text: str) -> List[dict]:
+    """Parse a model response into validated questions"""
+    response_text = strip_code_fences(response_text)
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        # Keep whatever complete questions a truncated or slightly broken
+        # array still holds rather than discarding a paid generation
+        data = salvage_objects(response_text)
+        if not data:
+            logger.error(f"Failed to parse JSON: {e}")
+            logger.error(f"Response: {response_text[:500]}")
+            raise ValueError("AI response is not valid JSON")
+
+    if isinstance(data, dict) and isinstance(data.get("questions"), list):
+        data = data["questions"]
+    if not isinstance(data, list):
+        raise ValueError("Response is not a JSON array")
+
+    validated = []
+    for item in data:
+        question = normalize_question(item)
+        if question is None:
+            logger.warning(f"Skipping invalid question: {str(item)[:200]}")
+            continue
+        validated.append(question)
+    return validated
+
+
+# ---- Backends ----
+
+
+class LLMBackend:
+    """Text completion backend. limit_key names its slot in limits.PROVIDERS."""
+
+    name = "base"
+    limit_key = "gemini"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def complete(self, prompt: str, json_mode: bool = True) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, json_mode: bool = True) -> Iterator[str]:
+        """Yield the response text as it is produced; backends without a
+        streaming API return it in one piece"""
+        yield self.complete(prompt, json_mode=json_mode)
+
+
+class TranscriptionBackend:
+    name = "base"
+    limit_key = "assemblyai"
+
+    def transcribe(self, file_path_or_url: str) -> str:
+        raise NotImplementedError
+
+
+_gemini_configure_lock = threading.Lock()
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = DEFAULT_LLM_MODEL, api_key: str = None):
+        super().__init__(model_name)
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        with _gemini_configure_lock:
+            genai.configure(api_key=api_key)
+        # The model holds the client and its connection; it is reused by every call
+        self._model = genai.GenerativeModel(model_name)
+        logger.info(f"Initialized Gemini backend ({model_name})")
+
+    def complete(self, prompt: str, json_mode: bool = True) -> str:
+        generation_config = (
+            {"response_mime_type": "application/json"} if json_mode else None
+        )
+        response = self._model.generate_content(
+            prompt, generation_config=generation_config
+        )
+        return response.text
+
+    def stream(self, prompt: str, json_mode: bool = True) -> Iterator[str]:
+        generation_config = (
+            {"response_mime_type": "application/json"} if json_mode else None
+        )
+        response = self._model.generate_content(
+            prompt, generation_config=generation_config, stream=True
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class AssemblyAIBackend(TranscriptionBackend):
+    name = "assemblyai"
+
+    def __init__(self, api_key: str = None):
+        import assemblyai as aai
+
+        api_key = api_key or os.getenv("ASSEMBLYAI_API_KEY")
+        if not api_key:
+            raise ValueError("AssemblyAI API key not found")
+
+        self._aai = aai
+        aai.settings.api_key = api_key
+        # One transcriber (and its HTTP client) for the life of the process
+        self._transcriber = aai.Transcriber()
+        # Using universal-2 as required by API key
+        self._config = aai.TranscriptionConfig(speech_models=["universal-2"])
+
+    def _download_youtube_audio(self, url: str) -> str:
+        import yt_dlp
+
+        # Create unique temp filename base (without extension yet)
+        temp_file_base = os.path.join(tempfile.gettempdir(), f"yt_{uuid.uuid4()}")
+        ydl_opts = {
+            "format": "bestaudio/best",
+            "outtmpl": f"{temp_file_base}.%(ext)s",
+            "quiet": True,
+            "noplaylist": True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            # Determine the actual filename
+            if "requested_downloads" in info:
+                downloaded_path = info["requested_downloads"][0]["filepath"]
+            else:
+                downloaded_path = ydl.prepare_filename(info)
+        logger.info(f"Downloaded locally to: {downloaded_path}")
+        return downloaded_path
+
+    def transcribe(self, file_path_or_url: str) -> str:
+        local_cleanup_needed = False
+
+        # Handle YouTube URLs
+        if "youtube.com" in file_path_or_url or "youtu.be" in file_path_or_url:
+            logger.info("Detected YouTube URL. Downloading audio locally...")
+            try:
+                file_path_or_url = self._download_youtube_audio(file_path_or_url)
+                local_cleanup_needed = True
+            except Exception as e:
+                logger.error(f"Failed to download YouTube audio: {e}")
+                raise e
+
+        logger.info(f"Starting transcription for: {file_path_or_url}")
+        try:
+            transcript = self._transcriber.transcribe(
+                file_path_or_url, config=self._config
+            )
+        except Exception as e:
+            logger.error(f"Transcription failed during API call: {e}")
+            raise e
+        finally:
+            if local_cleanup_needed and os.path.exists(file_path_or_url):
+                try:
+                    os.remove(file_path_or_url)
+                    logger.info("Cleaned up temp audio file.")
+                except Exception as cleanup_error:
+                    logger.warning(f"Failed to cleanup temp file: {cleanup_error}")
+
+        if transcript.status == self._aai.TranscriptStatus.error:
+            logger.error(f"Transcription failed: {transcript.error}")
+            raise Exception(f"Transcription failed: {transcript.error}")
+
+        logger.info("Transcription completed successfully")
+        return transcript.text
+
+
+_llm_backends: Dict[str, Callable[..., LLMBackend]] = {"gemini": GeminiBackend}
+_transcription_backends: Dict[str, Callable[..., TranscriptionBackend]] = {
+    "assemblyai": AssemblyAIBackend
+}
+
+
+def register_llm_backend(name: str, factory: Callable[..., LLMBackend]):
+    _llm_backends[name] = factory
+
+
+def register_transcription_backend(
+    name: str, factory: Callable[..., TranscriptionBackend]
+):
+    _transcription_backends[name] = factory
+
+
+# ---- Provider ----
+
+
+class QuizProvider:
+    """Generates quizzes from documents and videos using the configured backends"""
+
+    def __init__(
+        self,
+        llm: LLMBackend,
+        transcriber_factory: Optional[Callable[[], TranscriptionBackend]] = None,
+    ):
+        self.llm = llm
+        self._transcriber_factory = transcriber_factory
+        self._transcriber = None
+        self._lock = threading.Lock()
+
+    @property
+    def transcriber(self) -> TranscriptionBackend:
+        # Built on first use so PDF-only processes do not need transcription keys
+        with self._lock:
+            if self._transcriber is None:
+                if self._transcriber_factory is None:
+                    raise ValueError("No transcription backend configured")
+                self._transcriber = self._transcriber_factory()
+            return self._transcriber
+
+    def _top_up(
+        self,
+        template: str,
+        questions: List[dict],
+        missing: int,
+        exclude: Sequence[str] = (),
+        **fields,
+    ) -> List[dict]:
+        """
+        Ask only for the missing questions, passing the stems already written
+        (and any exclude stems) so the model does not repeat them. Failures are
+        logged, not raised: the caller keeps what it has.
+        """
+        seen = {chunking.normalize_stem(q["question"]) for q in questions}
+        seen |= {chunking.normalize_stem(stem) for stem in exclude}
+        added = []
+        for _ in range(TOP_UP_ATTEMPTS):
+            needed = missing - len(added)
+            if needed <= 0:
+                break
+            logger.info(f"Requesting {needed} more questions to make up the count")
+            written = [q["question"] for q in questions + added]
+            stems = "\n".join(f"- {stem}" for stem in [*exclude, *written])
+            prompt = template.format(
+                num_questions=needed, **fields
+            ) + TOP_UP_INSTRUCTIONS.format(stems=stems)
+            try:
+                extra = parse_questions(self.llm.complete(prompt))
+            except Exception as e:
+                logger.warning(f"Top-up request failed: {e}")
+                break
+            for question in extra:
+                stem = chunking.normalize_stem(question["question"])
+                if stem in seen:
+                    continue
+                seen.add(stem)
+                added.append(question)
+                if len(added) == missing:
+                    break
+        return added
+
+    def _complete_questions(
+        self, template: str, num_questions: int, **fields
+    ) -> List[dict]:
+        logger.info(
+            f"Generating {num_questions} quiz questions with {self.llm.model_name}..."
+        )
+        prompt = template.format(num_questions=num_questions, **fields)
+        questions = parse_questions(self.llm.complete(prompt))[:num_questions]
+        if len(questions) < num_questions:
+            questions += self._top_up(
+                template, questions, num_questions - len(questions), **fields
+            )
+        if len(questions) < num_questions:
+            logger.warning(
+                f"Generated only {len(questions)} questions instead of {num_questions}"
+            )
+        logger.info(f"Successfully generated {len(questions)} validated questions")
+        return questions
+
+    def generate_from_text(
+        self,
+        text: str,
+        num_questions: int = 25,
+        difficulty: str = "mixed",
+        use_cache: bool = True,
+    ) -> List[dict]:
+        """
+        Generate questions from document text. Long documents are split into
+        chunks and generated map-reduce style (see chunking.py).
+        """
+
+        def generate_chunk(chunk: str, quota: int) -> List[dict]:
+            return cached_generation(
+                lambda: self._complete_questions(
+                    DOCUMENT_PROMPT, quota, text=chunk, difficulty=difficulty
+                ),
+                self.llm.model_name,
+                DOCUMENT_PROMPT_VERSION,
+                chunk,
+                use_cache=use_cache,
+                num_questions=quota,
+                difficulty=difficulty,
+            )
+
+        return chunking.map_reduce_questions(
+            text, num_questions, generate_chunk, limit_key=self.llm.limit_key
+        )
+
+    def replace_from_text(
+        self,
+        text: str,
+        questions: List[dict],
+        missing: int,
+        exclude: Sequence[str] = (),
+        difficulty: str = "mixed",
+    ) -> List[dict]:
+        """
+        Up to `missing` more questions from document text that repeat neither
+        questions nor the exclude stems, e.g. to replace dropped near
+        duplicates. Never cached; long documents are tried chunk by chunk.
+        """
+        added = []
+        for chunk in chunking.split_into_chunks(text):
+            if len(added) >= missing:
+                break
+            added += run_limited(
+                self.llm.limit_key,
+                self._top_up,
+                DOCUMENT_PROMPT,
+                questions + added,
+                missing - len(added),
+                exclude=exclude,
+                text=chunk,
+                difficulty=difficulty,
+            )
+        return added
+
+    def _stream_questions(
+        self,
+        template: str,
+        num_questions: int,
+        emit: Callable[[dict], None],
+        **fields,
+    ) -> List[dict]:
+        """Stream one completion, emitting each question once it validates"""
+        prompt = template.format(num_questions=num_questions, **fields)
+        parser = JsonArrayStreamParser()
+        questions = []
+        for piece in self.llm.stream(prompt):
+            for item in parser.feed(piece):
+                question = normalize_question(item)
+                if question is None:
+                    logger.warning(f"Skipping invalid question: {str(item)[:200]}")
+                    continue
+                questions.append(question)
+                emit(question)
+                if len(questions) >= num_questions:
+                    return questions
+        if not parser.started:
+            raise ValueError("AI response is not valid JSON")
+
+        for question in self._top_up(
+            template, questions, num_questions - len(questions), **fields
+        ):
+            questions.append(question)
+            emit(question)
+        return questions
+
+    def stream_from_text(
+        self,
+        text: str,
+        num_questions: int = 25,
+        difficulty: str = "mixed",
+        use_cache: bool = True,
+    ) -> Iterator[dict]:
+        """
+        Like generate_from_text, but yields each validated question as soon as
+        the model produces it. Chunks stream concurrently; output is
+        deduplicated and stops at num_questions.
+        """
+        chunks = chunking.split_into_chunks(text)
+        quotas = chunking.allocate_quotas([len(c) for c in chunks], num_questions)
+        work = [(chunk, quota) for chunk, quota in zip(chunks, quotas) if quota > 0]
+        if not work:
+            return
+
+        events = queue.Queue()
+        finished = object()
+        failures = []
+
+        def run_chunk(chunk: str, quota: int):
+            streamed = []
+
+            def emit(question):
+                streamed.append(question)
+                events.put(question)
+
+            try:
+                for attempt in range(chunking.CHUNK_RETRIES + 1):
+                    try:
+                        questions = cached_generation(
+                            lambda: run_limited(
+                                self.llm.limit_key,
+                                self._stream_questions,
+                                DOCUMENT_PROMPT,
+                                quota,
+                                emit,
+                                text=chunk,
+                                difficulty=difficulty,
+                            ),
+                            self.llm.model_name,
+                            DOCUMENT_PROMPT_VERSION,
+                            chunk,
+                            use_cache=use_cache,
+                            num_questions=quota,
+                            difficulty=difficulty,
+                        )
+                        if not streamed:
+                            # Cache hit: nothing streamed, replay stored questions
+                            for question in questions:
+                                events.put(question)
+                        return
+                    except Exception as e:
+                        if attempt < chunking.CHUNK_RETRIES:
+                            logger.warning(f"Chunk generation failed, retrying: {e}")
+                            continue
+                        logger.error(
+                            f"Chunk generation failed ({quota} questions lost): {e}"
+                        )
+                        failures.append(e)
+            finally:
+                events.put(finished)
+
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(chunking.MAP_CONCURRENCY, len(work)))
+        )
+        try:
+            for chunk, quota in work:
+                pool.submit(run_chunk, chunk, quota)
+
+            seen, emitted, done = set(), 0, 0
+            while done < len(work) and emitted < num_questions:
+                item = events.get()
+                if item is finished:
+                    done += 1
+                    continue
+                stem = chunking.normalize_stem(item["question"])
+                if stem in seen:
+                    continue
+                seen.add(stem)
+                emitted += 1
+                yield item
+
+            if emitted == 0 and failures:
+                raise ValueError(f"Failed to generate quiz: {failures[0]}")
+            # Failed chunks and chunks that came back short both end here
+            chunking.check_shortfall(emitted, num_questions)
+        finally:
+            # Chunks still running finish in the background and fill the cache
+            pool.shutdown(wait=False)
+
+    def generate_from_transcript(
+        self,
+        transcript: str,
+        num_questions: int = VIDEO_QUIZ_QUESTIONS,
+        use_cache: bool = True,
+    ) -> List[dict]:
+        """Generate a video quiz with questions spread across the whole transcript"""
+        return cached_generation(
+            lambda: run_limited(
+                self.llm.limit_key,
+                self._complete_questions,
+                TRANSCRIPT_PROMPT,
+                num_questions,
+                text=transcript,
+            ),
+            self.llm.model_name,
+            TRANSCRIPT_PROMPT_VERSION,
+            transcript,
+            use_cache=use_cache,
+            num_questions=num_questions,
+        )
+
+    def replace_from_transcript(
+        self,
+        transcript: str,
+        questions: List[dict],
+        missing: int,
+        exclude: Sequence[str] = (),
+    ) -> List[dict]:
+        """Transcript counterpart of replace_from_text"""
+        return run_limited(
+            self.llm.limit_key,
+            self._top_up,
+            TRANSCRIPT_PROMPT,
+            questions,
+            missing,
+            exclude=exclude,
+            text=transcript,
+        )
+
+    def transcribe(self, file_path_or_url: str, use_cache: bool = True) -> str:
+        """
+        Returns the transcript for a video file or URL, transcribing only when
+        the content is not already in the transcript cache.
+        """
+        transcriber = self.transcriber
+        if not use_cache:
+            return run_limited(
+                transcriber.limit_key, transcriber.transcribe, file_path_or_url
+            )
+
+        from .database import SessionLocal
+        from . import transcript_cache
+
+        db = SessionLocal()
+        try:
+            key = transcript_cache.cache_key(file_path_or_url)
+            try:
+                cached = transcript_cache.get(db, key)
+            except Exception as e:
+                logger.warning(f"Transcript cache lookup failed: {e}")
+                db.rollback()
+                cached = None
+
+            if cached:
+                logger.info(f"Using cached transcript for {file_path_or_url} ({key})")
+                return cached
+
+            transcript = run_limited(
+                transcriber.limit_key, transcriber.transcribe, file_path_or_url
+            )
+
+            try:
+                transcript_cache.put(db, key, file_path_or_url, transcript)
+            except Exception as e:
+                logger.warning(f"Failed to cache transcript: {e}")
+                db.rollback()
+            return transcript
+        finally:
+            db.close()
+
+
+_provider: Optional[QuizProvider] = None
+_provider_lock = threading.Lock()
+
+
+def build_provider(
+    llm_backend: str = None, model: str = None, transcription_backend: str = None
+) -> QuizProvider:
+    llm_backend = llm_backend or DEFAULT_LLM_BACKEND
+    transcription_backend = transcription_backend or DEFAULT_TRANSCRIPTION_BACKEND
+    if "fake" in (llm_backend, transcription_backend):
+        from . import fake_backends  # noqa: F401 - registers the offline stand-ins
+    if llm_backend not in _llm_backends:
+        raise ValueError(f"Unknown LLM backend '{llm_backend}'")
+    if transcription_backend not in _transcription_backends:
+        raise ValueError(f"Unknown transcription backend '{transcription_backend}'")
+
+    llm = _llm_backends[llm_backend](model_name=model or DEFAULT_LLM_MODEL)
+    return QuizProvider(llm, _transcription_backends[transcription_backend])
+
+
+def get_provider() -> QuizProvider:
+    """The process-wide provider, created on first use"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = build_provider()
+        return _provider
+
+
+def set_provider(provider: Optional[QuizProvider]):
+    """Replace the process-wide provider (e.g. with offline backends)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,315 @@
+"""
+Quiz generation job handlers
+Run by queue workers (see run_worker.py) for the generation endpoints, or
+streamed directly by their SSE variants
+"""
+
+import logging
+import os
+from typing import Callable, Iterator, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from . import crud, models, pdf_cache
+from .chunking import check_shortfall
+from .database import SessionLocal
+from .jobs import PermanentJobError, register
+from .limits import run_limited
+from .question_index import DuplicateFilter, question_index
+from .quiz_provider import get_provider
+
+logger = logging.getLogger(__name__)
+
+
+def _get_course(db: Session, course_id: str) -> models.Course:
+    course = crud.get_course(db, course_id=UUID(course_id))
+    if not course:
+        raise PermanentJobError("Course not found")
+    return course
+
+
+def _save_quiz(db: Session, course_id: str, title: str, questions: list) -> dict:
+    new_quiz = models.Quiz(course_id=UUID(course_id), title=title, questions=questions)
+    db.add(new_quiz)
+    db.commit()
+    db.refresh(new_quiz)
+    question_index.add_quiz(new_quiz.course_id, new_quiz.id, questions)
+
+    logger.info(f"Successfully created quiz with {len(questions)} questions")
+    return {
+        "quiz_id": str(new_quiz.id),
+        "title": title,
+        "num_questions": len(questions),
+    }
+
+
+def _saved_repeat(
+    db: Session, duplicates: DuplicateFilter, use_cache: bool
+) -> Optional[dict]:
+    """
+    A cached generation whose questions are all already in the course is a
+    repeat of an earlier request (a double-click, a resubmitted file): return
+    the quiz that request saved instead of paying for a fresh generation
+    """
+    if not use_cache or duplicates.accepted or not duplicates.rejected:
+        return None
+    quiz_id = duplicates.repeated_quiz()
+    quiz = db.get(models.Quiz, quiz_id) if quiz_id else None
+    if quiz is None:
+        return None
+    logger.info(
+        f"Generated questions all repeat quiz {quiz.id}; returning it "
+        "(use regenerate=true for new questions)"
+    )
+    return {
+        "quiz_id": str(quiz.id),
+        "title": quiz.title,
+        "num_questions": len(quiz.questions or []),
+        "existing": True,
+    }
+
+
+def _drop_duplicates(
+    db: Session,
+    course_id: str,
+    questions: list,
+    replace: Callable,
+    use_cache: bool = True,
+) -> Tuple[list, Optional[dict]]:
+    """
+    Drop questions that nearly repeat the course's existing ones and make up
+    the count with replace(kept, missing, exclude), filtered the same way.
+    Returns (questions, None), or ([], saved quiz) for a repeated request
+    (see _saved_repeat).
+    """
+    duplicates = question_index.new_filter(db, UUID(course_id))
+    fresh = duplicates.filter(questions)
+    missing = duplicates.rejected
+    if not missing:
+        return fresh, None
+    existing = _saved_repeat(db, duplicates, use_cache)
+    if existing:
+        return [], existing
+    logger.info(f"Dropped {missing} near-duplicate questions, requesting replacements")
+    extra = replace(fresh, missing, duplicates.exclusions())
+    fresh += duplicates.filter(extra)[:missing]
+    if not fresh:
+        raise ValueError("Every generated question repeats one already in this course")
+    check_shortfall(len(fresh), len(questions))
+    return fresh, None
+
+
+def _cached_pdf_text(lookup, *args) -> str:
+    # Runs on a provider thread, so it gets its own session
+    db = SessionLocal()
+    try:
+        return lookup(db, *args)
+    finally:
+        db.close()
+
+
+@register("pdf_quiz")
+def generate_pdf_quiz(db: Session, payload: dict) -> dict:
+    """
+    Generate a quiz from a PDF, either an uploaded file (file_path) or a stored
+    course resource (resource_id).
+
+    Payload: course_id, title, num_questions, regenerate, and file_path or resource_id
+    """
+    course = _get_course(db, payload["course_id"])
+    num_questions = payload.get("num_questions", 25)
+    result = {}
+
+    if payload.get("file_path"):
+        logger.info(f"Extracting text from uploaded PDF for course {course.id}")
+        text_content = run_limited(
+            "pdf", _cached_pdf_text, pdf_cache.text_for_file, payload["file_path"]
+        )
+        if not text_content or len(text_content) < 100:
+            raise PermanentJobError("Insufficient content extracted from the PDF")
+    else:
+        resource = (
+            db.query(models.Resource)
+            .filter(
+                models.Resource.id == UUID(payload["resource_id"]),
+                models.Resource.course_id == course.id,
+            )
+            .first()
+        )
+        if not resource:
+            raise PermanentJobError("Resource not found")
+        logger.info(f"Extracting text from PDF: {resource.file_url}")
+        text_content = run_limited(
+            "pdf",
+            _cached_pdf_text,
+            pdf_cache.text_for_resource,
+            resource.id,
+            resource.file_url,
+        )
+        result["resource_used"] = resource.file_name
+
+    logger.info(f"Generating {num_questions} questions...")
+    # Chunk calls take their own LLM slots (see chunking.map_reduce_questions)
+    questions = get_provider().generate_from_text(
+        text_content,
+        num_questions=num_questions,
+        use_cache=not payload.get("regenerate", False),
+    )
+    if not questions:
+        raise ValueError("Failed to generate questions from the PDF")
+    questions, existing = _drop_duplicates(
+        db,
+        payload["course_id"],
+        questions,
+        lambda kept, missing, exclude: get_provider().replace_from_text(
+            text_content, kept, missing, exclude=exclude
+        ),
+        use_cache=not payload.get("regenerate", False),
+    )
+    if existing:
+        result.update(existing)
+        return result
+
+    result.update(_save_quiz(db, payload["course_id"], payload["title"], questions))
+    return result
+
+
+@register("video_quiz")
+def generate_video_quiz(db: Session, payload: dict) -> dict:
+    """
+    Transcribe a course video (uploaded file_path or video_url) and generate a quiz.
+
+    Payload: course_id, regenerate, and file_path or video_url
+    """
+    course = _get_course(db, payload["course_id"])
+    source = payload.get("file_path") or payload.get("video_url")
+    if not source:
+        raise PermanentJobError("No video file or URL to transcribe")
+    if payload.get("file_path") and not os.path.exists(source):
+        raise PermanentJobError("Uploaded video is no longer available")
+
+    provider = get_provider()
+    logger.info(f"Transcribing {source}...")
+    transcript = provider.transcribe(source)
+    if not transcript:
+        raise ValueError("Failed to transcribe video")
+
+    logger.info(f"Generating questions for {course.title}...")
+    use_cache = not payload.get("regenerate", False)
+    questions = provider.generate_from_transcript(transcript, use_cache=use_cache)
+    return save_video_quiz(
+        db,
+        payload["course_id"],
+        f"Video Quiz: {course.title}",
+        transcript,
+        questions,
+        use_cache=use_cache,
+    )
+
+
+def save_video_quiz(
+    db: Session,
+    course_id: str,
+    title: str,
+    transcript: str,
+    questions: list,
+    use_cache: bool = True,
+) -> dict:
+    """
+    Save questions generated from transcript as a new quiz, after dropping
+    (and replacing) near-duplicates of the course's existing questions.
+    Scripts that generate outside the job queue save through this too.
+    A repeated request returns the earlier quiz (see _saved_repeat).
+    """
+    questions, existing = _drop_duplicates(
+        db,
+        course_id,
+        questions,
+        lambda kept, missing, exclude: get_provider().replace_from_transcript(
+            transcript, kept, missing, exclude=exclude
+        ),
+        use_cache=use_cache,
+    )
+    if existing:
+        return existing
+    return _save_quiz(db, course_id, title, questions)
+
+
+def stream_pdf_quiz(
+    course_id: str,
+    title: str,
+    num_questions: int = 25,
+    resource_id: Optional[str] = None,
+    file_url: Optional[str] = None,
+    file_path: Optional[str] = None,
+    resource_used: Optional[str] = None,
+    regenerate: bool = False,
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming counterpart of the pdf_quiz job for the SSE endpoints. Yields
+    (event, data) pairs: status updates, each question as soon as the model
+    has produced it, then done with the saved quiz or error. The caller has
+    already validated the course and resource.
+    """
+    # The response outlives the request-scoped session, so use our own
+    db = SessionLocal()
+    try:
+        yield "status", {"stage": "extracting"}
+        if file_path:
+            text_content = run_limited(
+                "pdf", _cached_pdf_text, pdf_cache.text_for_file, file_path
+            )
+        else:
+            text_content = run_limited(
+                "pdf",
+                _cached_pdf_text,
+                pdf_cache.text_for_resource,
+                UUID(resource_id),
+                file_url,
+            )
+        if not text_content or len(text_content) < 100:
+            raise ValueError("Insufficient content extracted from the PDF")
+
+        yield "status", {"stage": "generating", "num_questions": num_questions}
+        duplicates = question_index.new_filter(db, UUID(course_id))
+        questions = []
+        for question in get_provider().stream_from_text(
+            text_content, num_questions=num_questions, use_cache=not regenerate
+        ):
+            if not duplicates.accept(question):
+                continue
+            questions.append(question)
+            yield "question", {"index": len(questions) - 1, "question": question}
+        existing = _saved_repeat(db, duplicates, use_cache=not regenerate)
+        if existing:
+            if resource_used:
+                existing["resource_used"] = resource_used
+            yield "done", existing
+            return
+        missing = duplicates.rejected
+        if missing:
+            wanted = len(questions) + missing
+            yield "status", {"stage": "replacing_duplicates", "missing": missing}
+            extra = get_provider().replace_from_text(
+                text_content, questions, missing, exclude=duplicates.exclusions()
+            )
+            for question in duplicates.filter(extra)[:missing]:
+                questions.append(question)
+                yield "question", {"index": len(questions) - 1, "question": question}
+            check_shortfall(len(questions), wanted)
+        if not questions:
+            raise ValueError("Failed to generate questions from the PDF")
+
+        result = _save_quiz(db, course_id, title, questions)
+        if resource_used:
+            result["resource_used"] = resource_used
+        yield "done", result
+    except Exception as e:
+        logger.error(f"Streaming quiz generation failed for course {course_id}: {e}")
+        db.rollback()
+        yield "error", {"detail": f"Failed to generate quiz: {e}"}
+    finally:
+        db.close()
+        if file_path and os.path.exists(file_path):
+            os.unlink(file_path)
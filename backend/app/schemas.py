@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from uuid import UUID
@@ -209,3 +209,103 @@ class UserDetailedReport(BaseModel):
     full_name: str
     email: str
     courses: List[CourseProgressReport]
+
+
+class CourseFunnel(BaseModel):
+    course_id: UUID
+    course_title: str
+    enrolled: int
+    started: int  # Learners who started the video
+    attempted_quiz: int
+    passed: int
+    median_best_score: Optional[float] = None
+
+
+class ActivityBucket(BaseModel):
+    start_date: date
+    active_learners: int
+    new_enrollments: int
+    progress_updates: int
+    submissions: int
+    passes: int
+    pass_rate: float
+
+
+class ActivityEvent(BaseModel):
+    id: UUID
+    event_type: str  # "signup", "enrollment", "quiz_submission" or "completion"
+    user_id: Optional[UUID] = None
+    full_name: Optional[str] = None
+    course_id: Optional[UUID] = None
+    course_title: Optional[str] = None
+    description: str
+    created_at: datetime
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: UUID
+    full_name: Optional[str] = None
+    score: int  # Best quiz score, or sum of best scores on the global board
+
+
+class LeaderboardRank(BaseModel):
+    user_id: UUID
+    course_id: Optional[UUID] = None
+    rank: Optional[int] = None  # None if the learner has no score on this board
+    score: Optional[int] = None
+    total_ranked: int
+
+
+class ScoreBucket(BaseModel):
+    start: int
+    end: int
+    count: int
+
+
+class ScoreDistribution(BaseModel):
+    quiz_id: Optional[UUID] = None
+    course_id: Optional[UUID] = None
+    submissions: int
+    mean: Optional[float] = None
+    p50: Optional[int] = None
+    p90: Optional[int] = None
+    histogram: List[ScoreBucket]
+
+
+class DuplicateQuestion(BaseModel):
+    quiz_id: UUID
+    index: int  # Position within the quiz
+    question: str
+
+
+class DuplicateCluster(BaseModel):
+    course_id: UUID
+    size: int
+    questions: List[DuplicateQuestion]
+
+
+# Jobs
+class Job(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_after: Optional[datetime] = None
+    last_error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobQueued(BaseModel):
+    success: bool = True
+    message: str
+    job_id: UUID
+    status: str
+    status_url: str
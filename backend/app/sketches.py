@@ -0,0 +1,236 @@
+"""
+Compact, mergeable sketches used by the reporting tables
+Includes a HyperLogLog distinct counter for daily active learners, a
+fixed 0-100 histogram for quiz score distributions and a per-learner
+daily activity bitmap, plus the MinHash signatures behind near-duplicate
+question detection
+"""
+
+import hashlib
+import math
+import struct
+import zlib
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch.
+
+    With the default precision of 10 the sketch is 1024 one-byte registers
+    (~1 KB) and estimates cardinality with ~3% standard error. Sketches with
+    the same precision can be merged to count distinct items across buckets.
+    """
+
+    def __init__(self, precision: int = 10, registers: bytes = None):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        if registers:
+            if len(registers) != self.num_registers:
+                raise ValueError("Register size does not match sketch precision")
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.num_registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = 10) -> "HyperLogLog":
+        return cls(precision=precision, registers=data)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    def add(self, item) -> bool:
+        """Add an item; returns True if the sketch changed"""
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+
+        index = value >> (64 - self.precision)
+        remaining = value & ((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1-bit in the remaining bits
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch into this one in place"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(
+            max(a, b) for a, b in zip(self.registers, other.registers)
+        )
+        return self
+
+    def count(self) -> int:
+        """Estimate the number of distinct items added"""
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+
+        # Small-range correction: fall back to linear counting
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+
+class ScoreHistogram:
+    """
+    Exact distribution of integer quiz scores (0-100) as 101 counters.
+
+    Serialized as 101 little-endian uint32 values (404 bytes). Histograms are
+    merged by adding counters, so quiz distributions roll up to course level.
+    """
+
+    NUM_BINS = 101
+    _FORMAT = "<101I"
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts else [0] * self.NUM_BINS
+        if len(self.counts) != self.NUM_BINS:
+            raise ValueError("Score histogram must have 101 bins")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ScoreHistogram":
+        return cls(struct.unpack(cls._FORMAT, data))
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(self._FORMAT, *self.counts)
+
+    def add(self, score: int):
+        self.counts[min(max(int(score), 0), 100)] += 1
+
+    def merge(self, other: "ScoreHistogram") -> "ScoreHistogram":
+        """Merge another histogram into this one in place"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def mean(self):
+        total = self.total
+        if not total:
+            return None
+        return sum(score * count for score, count in enumerate(self.counts)) / total
+
+    def quantile(self, q: float):
+        """Smallest score with at least q of the submissions at or below it"""
+        total = self.total
+        if not total:
+            return None
+        target = max(1, math.ceil(q * total))
+        cumulative = 0
+        for score, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return score
+        return 100
+
+    def buckets(self, width: int = 10):
+        """Counts grouped into [start, end] score ranges; 100 joins the last range"""
+        result = []
+        for start in range(0, 100, width):
+            end = 100 if start + width >= 100 else start + width - 1
+            result.append(
+                {"start": start, "end": end, "count": sum(self.counts[start : end + 1])}
+            )
+        return result
+
+
+class ActivityBitmap:
+    """
+    One bit per day of learner activity, bit n meaning EPOCH + n days.
+
+    Stored as little-endian bytes (~46 bytes per year of history). Streaks and
+    window counts are computed with integer bit operations instead of scanning
+    timestamps.
+    """
+
+    EPOCH = date(2020, 1, 1)
+
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ActivityBitmap":
+        return cls(int.from_bytes(data or b"", "little"))
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+
+    @classmethod
+    def day_index(cls, day: date) -> int:
+        return (day - cls.EPOCH).days
+
+    def mark(self, day: date) -> bool:
+        """Set the bit for a day; returns True if it was not already set"""
+        bit = 1 << self.day_index(day)
+        if self.bits & bit:
+            return False
+        self.bits |= bit
+        return True
+
+    def is_active(self, day: date) -> bool:
+        return bool(self.bits >> self.day_index(day) & 1)
+
+    def current_streak(self, today: date) -> int:
+        """Consecutive active days ending on today (0 if today is inactive)"""
+        n = self.day_index(today)
+        mask = (1 << (n + 1)) - 1
+        inactive = ~self.bits & mask
+        # Highest inactive day at or before today ends the streak
+        return n + 1 - inactive.bit_length()
+
+    def active_days(self, today: date, window: int) -> int:
+        """Number of active days in the window of days ending on today"""
+        start = max(self.day_index(today) - window + 1, 0)
+        return ((self.bits >> start) & ((1 << window) - 1)).bit_count()
+
+    def longest_streak(self) -> int:
+        """Longest run of consecutive active days"""
+        bits, length = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            length += 1
+        return length
+
+
+class MinHash:
+    """
+    MinHash signatures for estimating Jaccard similarity between sets.
+
+    Each of num_perm multiply-shift hash functions keeps the minimum hash seen
+    over the set's items; the fraction of positions where two signatures agree
+    estimates the Jaccard similarity of the sets (standard error about
+    1/sqrt(num_perm)). Signatures from the same MinHash are comparable across
+    processes because the hash functions come from a fixed seed.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | 1
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint64
+        )
+        if not hashes.size:
+            return np.zeros(self.num_perm, dtype=np.uint32)
+        # (a * x + b) mod 2^64, high 32 bits; uint64 overflow wraps as intended
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> 32
+        return permuted.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the sets behind two signatures"""
+        return float(np.count_nonzero(a == b)) / len(a)
@@ -0,0 +1,146 @@
+"""
+Content-addressed transcript store
+Keys are a YouTube video id, a normalized URL or the SHA-256 of an uploaded
+file; the table is trimmed least-recently-used first once it passes its byte budget
+"""
+
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Query parameters that never change what a URL points at
+_TRACKING_PARAMS = {
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_term",
+    "utm_content",
+}
+
+
+def youtube_video_id(url: str) -> Optional[str]:
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www.") or host.startswith("m."):
+        host = host.split(".", 1)[1]
+
+    candidate = None
+    if host == "youtu.be":
+        candidate = parts.path.strip("/").split("/")[0]
+    elif host in ("youtube.com", "music.youtube.com"):
+        if parts.path == "/watch":
+            candidate = dict(parse_qsl(parts.query)).get("v")
+        else:
+            segments = parts.path.strip("/").split("/")
+            if len(segments) >= 2 and segments[0] in ("shorts", "embed", "live", "v"):
+                candidate = segments[1]
+
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host, drop fragments and tracking params, sort the query"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), "")
+    )
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(source: str) -> str:
+    """Content key for a video URL or local file path"""
+    if os.path.exists(source):
+        return f"sha256:{file_sha256(source)}"
+
+    video_id = youtube_video_id(source)
+    if video_id:
+        return f"youtube:{video_id}"
+
+    normalized = normalize_url(source)
+    return f"url:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+
+def get(db: Session, key: str) -> Optional[str]:
+    entry = db.get(models.TranscriptCache, key)
+    if not entry:
+        return None
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+    return entry.transcript
+
+
+def put(db: Session, key: str, source: str, transcript: str):
+    size = len(transcript.encode("utf-8"))
+    if size > MAX_BYTES:
+        logger.warning(f"Transcript for {source} ({size} bytes) exceeds cache budget")
+        return
+
+    entry = db.get(models.TranscriptCache, key)
+    if entry is None:
+        entry = models.TranscriptCache(key=key)
+        db.add(entry)
+    entry.source = source
+    entry.transcript = transcript
+    entry.size_bytes = size
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+
+    evict(db)
+
+
+def evict(db: Session, max_bytes: Optional[int] = None) -> int:
+    """Delete least recently used transcripts until the table fits max_bytes"""
+    if max_bytes is None:
+        max_bytes = MAX_BYTES
+    total = (
+        db.query(func.coalesce(func.sum(models.TranscriptCache.size_bytes), 0)).scalar()
+        or 0
+    )
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    oldest_first = db.query(
+        models.TranscriptCache.key, models.TranscriptCache.size_bytes
+    ).order_by(models.TranscriptCache.last_used_at)
+    for key, size in oldest_first.all():
+        if total <= max_bytes:
+            break
+        db.query(models.TranscriptCache).filter(
+            models.TranscriptCache.key == key
+        ).delete(synchronize_session=False)
+        total -= size
+        removed += 1
+    db.commit()
+
+    logger.info(f"Evicted {removed} cached transcripts ({total} bytes remain)")
+    return removed
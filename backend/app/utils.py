@@ -3,80 +3,125 @@ Utility functions for the Learning Tracker LMS
 Includes PDF text extraction and other helper functions
 """
 
-import fitz  # PyMuPDF
 import requests
-import tempfile
 import os
 import logging
-from typing import Optional
+from typing import Optional, Tuple, Union
+
+from . import pdf_extract
 
 logger = logging.getLogger(__name__)
 
 
-def extract_text_from_pdf_url(pdf_url: str) -> str:
+# Shared session so downloads reuse pooled keep-alive connections
+http_session = requests.Session()
+http_session.mount(
+    "https://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20)
+)
+http_session.mount(
+    "http://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20)
+)
+
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+# The PDF header may be preceded by junk bytes, but must start within the first 1KB
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+
+def download_pdf(
+    pdf_url: str, headers: Optional[dict] = None, max_bytes: int = MAX_PDF_BYTES
+) -> Tuple[Optional[bytearray], dict]:
     """
-    Extract text from a PDF file stored in Supabase storage
+    Stream a PDF into a single buffer, aborting early if it is too large or
+    does not look like a PDF
 
     Args:
-        pdf_url: Public URL of the PDF in Supabase storage
+        pdf_url: Public URL of the PDF
+        headers: Extra request headers (e.g. conditional GET validators)
+        max_bytes: Hard cap on the download size
 
     Returns:
-        Extracted text as a string
+        (content, response headers); content is None on 304 Not Modified
 
     Raises:
-        ValueError: If PDF cannot be downloaded or text cannot be extracted
+        ValueError: If the download fails, exceeds max_bytes or is not a PDF
     """
-    temp_file_path = None
-
+    logger.info(f"Downloading PDF from: {pdf_url}")
     try:
-        # Download PDF from URL
-        logger.info(f"Downloading PDF from: {pdf_url}")
-        response = requests.get(pdf_url, timeout=30)
-        response.raise_for_status()
+        with http_session.get(
+            pdf_url, headers=headers or {}, timeout=30, stream=True
+        ) as response:
+            if response.status_code == 304:
+                return None, dict(response.headers)
+            response.raise_for_status()
+
+            declared = int(response.headers.get("Content-Length") or 0)
+            if declared > max_bytes:
+                raise ValueError(
+                    f"PDF is too large ({declared} bytes, limit {max_bytes})"
+                )
+
+            # Pre-size the buffer when the server tells us the length
+            buffer = bytearray(declared)
+            size = 0
+            checked_magic = False
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                end = size + len(chunk)
+                if end > max_bytes:
+                    raise ValueError(f"PDF exceeds the {max_bytes} byte limit")
+                if end <= len(buffer):
+                    buffer[size:end] = chunk
+                else:
+                    del buffer[size:]
+                    buffer += chunk
+                size = end
+
+                if not checked_magic and size >= PDF_HEADER_WINDOW:
+                    check_pdf_magic(buffer, size)
+                    checked_magic = True
+
+            if not checked_magic:
+                check_pdf_magic(buffer, size)
+            del buffer[size:]
+            return buffer, dict(response.headers)
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
+    except requests.RequestException as e:
+        logger.error(f"Error downloading PDF: {e}")
+        raise ValueError(f"Failed to download PDF from URL: {str(e)}")
 
-        logger.info(f"PDF downloaded to temporary file: {temp_file_path}")
 
-        # Extract text using PyMuPDF
-        doc = fitz.open(temp_file_path)
-        text_content = ""
+def check_pdf_magic(buffer: Union[bytes, bytearray], size: Optional[int] = None):
+    """Raise ValueError unless the buffer starts like a PDF"""
+    if size is None:
+        size = len(buffer)
+    window = bytes(buffer[: min(size, PDF_HEADER_WINDOW)])
+    if PDF_MAGIC not in window:
+        raise ValueError("Downloaded file is not a PDF")
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text_content += page.get_text()
 
-        doc.close()
+def extract_text_from_pdf_url(pdf_url: str) -> str:
+    """
+    Extract text from a PDF file stored in Supabase storage
 
-        # Clean up text
-        text_content = text_content.strip()
+    Args:
+        pdf_url: Public URL of the PDF in Supabase storage
 
-        logger.info(f"Extracted {len(text_content)} characters from PDF")
+    Returns:
+        Extracted text as a string
 
-        if len(text_content) < 100:
-            raise ValueError(
-                "Insufficient text content extracted from PDF (minimum 100 characters required)"
-            )
+    Raises:
+        ValueError: If PDF cannot be downloaded or text cannot be extracted
+    """
+    content, _ = download_pdf(pdf_url)
+    text_content = extract_text_from_pdf_bytes(content)
 
-        return text_content
+    if len(text_content) < 100:
+        raise ValueError(
+            "Insufficient text content extracted from PDF (minimum 100 characters required)"
+        )
 
-    except requests.RequestException as e:
-        logger.error(f"Error downloading PDF: {e}")
-        raise ValueError(f"Failed to download PDF from URL: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {e}")
-        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Cleaned up temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file: {e}")
+    return text_content
 
 
 def extract_text_from_pdf_file(pdf_path: str) -> str:
@@ -90,14 +135,7 @@ def extract_text_from_pdf_file(pdf_path: str) -> str:
         Extracted text as a string
     """
     try:
-        doc = fitz.open(pdf_path)
-        text_content = ""
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text_content += page.get_text()
-
-        doc.close()
+        text_content = pdf_extract.extract_text(pdf_path)
 
         text_content = text_content.strip()
         logger.info(f"Extracted {len(text_content)} characters from local PDF")
@@ -109,23 +147,27 @@ def extract_text_from_pdf_file(pdf_path: str) -> str:
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
 
-def truncate_text(text: str, max_chars: int = 30000) -> str:
+def extract_text_from_pdf_bytes(content: Union[bytes, bytearray]) -> str:
     """
-    Truncate text to a maximum number of characters
-    Useful for API token limits
+    Extract text from PDF bytes already in memory (no temporary file)
 
     Args:
-        text: Text to truncate
-        max_chars: Maximum number of characters
+        content: Raw PDF file content
 
     Returns:
-        Truncated text
+        Extracted text as a string
     """
-    if len(text) <= max_chars:
-        return text
+    try:
+        text_content = pdf_extract.extract_text(content)
+
+        text_content = text_content.strip()
+        logger.info(f"Extracted {len(text_content)} characters from PDF")
 
-    logger.warning(f"Truncating text from {len(text)} to {max_chars} characters")
-    return text[:max_chars]
+        return text_content
+
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {e}")
+        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
 
 def validate_pdf_url(url: str) -> bool:
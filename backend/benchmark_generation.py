@@ -0,0 +1,426 @@
+"""
+Offline load test for quiz generation
+
+Runs the generation pipeline against the fake Gemini/AssemblyAI backends
+(app/fake_backends.py), so capacity can be measured without API quota, and
+reports jobs per minute, p50/p99 job and provider-stage latencies and peak RSS.
+
+    api    Submits PDF uploads and video URLs through the real HTTP endpoints
+           (in-process) and runs the queue workers on threads in this process.
+    batch  Seeds courses with videos and runs generate_all_quizzes.py.
+
+Point --database-url at a scratch database: batch mode fills every course
+without a quiz there, and both modes write courses, quizzes and jobs. api mode
+uses FastAPI's TestClient, which needs httpx installed.
+
+    python benchmark_generation.py api --database-url postgresql://.../bench \
+        --jobs 100 --workers 8 --time-scale 0.05
+"""
+
+import sys
+import os
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import random
+import resource
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+# Setup path to import app modules
+sys.path.append(os.getcwd())
+
+logging.basicConfig(
+    level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("GenerationBenchmark")
+
+
+def configure_environment(args):
+    """Must run before any app import: settings are read at import time"""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["QUIZ_LLM_BACKEND"] = "fake"
+    os.environ["QUIZ_TRANSCRIPTION_BACKEND"] = "fake"
+    os.environ["FAKE_SEED"] = str(args.seed)
+    os.environ["FAKE_TIME_SCALE"] = str(args.time_scale)
+    os.environ["FAKE_LLM_LATENCY"] = args.llm_latency
+    os.environ["FAKE_LLM_FAILURE_RATE"] = str(args.llm_failure_rate)
+    os.environ["FAKE_LLM_TRUNCATE_RATE"] = str(args.truncate_rate)
+    os.environ["FAKE_TRANSCRIBE_LATENCY"] = args.transcribe_latency
+    os.environ["FAKE_TRANSCRIBE_FAILURE_RATE"] = str(args.transcribe_failure_rate)
+    os.environ["FAKE_TRANSCRIPT_WORDS"] = str(args.transcript_words)
+    # Retries back off on the same compressed clock as the fake latencies
+    os.environ.setdefault("JOB_RETRY_BASE_SECONDS", str(30 * args.time_scale))
+
+
+def make_pdf(rng: random.Random, pages: int) -> bytes:
+    import fitz  # PyMuPDF
+    from app.fake_backends import VOCABULARY
+
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = " ".join(rng.choice(VOCABULARY) for _ in range(350))
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def percentile(values, q: float):
+    """Nearest-rank percentile"""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _high_water_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process, and of the largest child process
+    (PDF extraction workers) whether still running or already reaped
+    """
+    # ru_maxrss is in KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    for child in multiprocessing.active_children():
+        children = max(children, _high_water_mb(child.pid))
+    return own, children
+
+
+def worker_loop(worker_id: str, stop: threading.Event, poll_interval: float):
+    from app.database import SessionLocal
+    from app import jobs, quiz_tasks  # noqa: F401 - registers the job handlers
+
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            ran = jobs.run_next(db, worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {e}")
+            ran = False
+        finally:
+            db.close()
+        if not ran:
+            stop.wait(poll_interval)
+
+
+def wait_for_jobs(job_ids, timeout: float, poll_interval: float = 0.5):
+    from app.database import SessionLocal
+    from app import models
+
+    deadline = time.monotonic() + timeout
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Job).filter(models.Job.id.in_(job_ids)).all()
+            done = [job for job in rows if job.status in ("succeeded", "failed")]
+            if len(done) == len(job_ids) or time.monotonic() > deadline:
+                for job in rows:
+                    db.expunge(job)
+                return rows
+        finally:
+            db.close()
+        time.sleep(poll_interval)
+
+
+def job_report(rows) -> dict:
+    finished = [job for job in rows if job.status in ("succeeded", "failed")]
+    by_kind = {}
+    for job in rows:
+        counts = by_kind.setdefault(job.kind, {})
+        counts[job.status] = counts.get(job.status, 0) + 1
+
+    def seconds(start, end):
+        return [(end(job) - start(job)).total_seconds() for job in finished]
+
+    stages = {
+        "queue wait": seconds(lambda j: j.created_at, lambda j: j.locked_at),
+        "run": seconds(lambda j: j.locked_at, lambda j: j.updated_at),
+        "end to end": seconds(lambda j: j.created_at, lambda j: j.updated_at),
+    }
+    return {
+        "by_kind": by_kind,
+        "retried": sum(1 for job in rows if (job.attempts or 0) > 1),
+        "latency": {
+            name: {"p50": percentile(values, 0.5), "p99": percentile(values, 0.99)}
+            for name, values in stages.items()
+        },
+    }
+
+
+def run_api(args, run_id: str) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app import auth, crud, models
+    from app.database import SessionLocal, engine
+    from app.main import app
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    admin = models.User(
+        email=f"bench-{run_id}@bench.local",
+        full_name="Benchmark Admin",
+        hashed_password="!",
+        role="admin",
+    )
+    db.add(admin)
+    db.commit()
+    token = auth.create_access_token(
+        {"sub": admin.email, "role": "admin"}, expires_delta=timedelta(hours=12)
+    )
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=worker_loop, args=(f"bench-{i}", stop, 0.2), daemon=True
+        )
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    rng = random.Random(f"{args.seed}:{run_id}")
+    course_ids, job_ids = [], []
+    started = time.monotonic()
+    try:
+        for i in range(args.jobs):
+            response = client.post(
+                "/api/courses/",
+                # No video_url here, so creation itself enqueues nothing
+                json={"title": f"[bench {run_id}] Course {i}", "video_url": ""},
+                headers=headers,
+            )
+            response.raise_for_status()
+            course_id = response.json()["id"]
+            course_ids.append(course_id)
+
+            if rng.random() < args.video_share:
+                response = client.post(
+                    f"/api/courses/{course_id}/generate-quiz-from-video",
+                    data={"video_url": f"https://bench.local/{run_id}/{i}.mp4"},
+                    headers=headers,
+                )
+            else:
+                response = client.post(
+                    f"/api/courses/{course_id}/generate-quiz"
+                    f"?num_questions={args.questions}",
+                    files={
+                        "file": (
+                            f"bench-{i}.pdf",
+                            make_pdf(rng, args.pages),
+                            "application/pdf",
+                        )
+                    },
+                    headers=headers,
+                )
+            response.raise_for_status()
+            job_ids.append(uuid.UUID(response.json()["job_id"]))
+            if args.rate:
+                time.sleep(1 / args.rate)
+
+        rows = wait_for_jobs(job_ids, args.timeout)
+        elapsed = time.monotonic() - started
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=5)
+        if not args.keep:
+            for course_id in course_ids:
+                crud.delete_course(db, uuid.UUID(course_id))
+            db.query(models.Job).filter(models.Job.id.in_(job_ids)).delete(
+                synchronize_session=False
+            )
+            db.delete(admin)
+            db.commit()
+        db.close()
+
+    report = job_report(rows)
+    completed = sum(
+        count
+        for counts in report["by_kind"].values()
+        for status, count in counts.items()
+        if status in ("succeeded", "failed")
+    )
+    report.update(
+        submitted=len(job_ids),
+        completed=completed,
+        elapsed=elapsed,
+        jobs_per_minute=completed / elapsed * 60 if elapsed else None,
+    )
+    return report
+
+
+def run_batch(args, run_id: str) -> dict:
+    import generate_all_quizzes
+    from app import crud, models
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    courses = [
+        models.Course(
+            title=f"[bench {run_id}] Course {i}",
+            video_url=f"https://bench.local/{run_id}/{i}.mp4",
+        )
+        for i in range(args.jobs)
+    ]
+    db.add_all(courses)
+    db.commit()
+
+    checkpoint = os.path.join(tempfile.gettempdir(), f"bench-{run_id}.jsonl")
+    started = time.monotonic()
+    try:
+        generate_all_quizzes.generate_all(
+            concurrency=args.workers, checkpoint_path=checkpoint
+        )
+        elapsed = time.monotonic() - started
+        saved = (
+            db.query(models.Quiz)
+            .filter(models.Quiz.course_id.in_([course.id for course in courses]))
+            .count()
+        )
+    finally:
+        if not args.keep:
+            for course in courses:
+                crud.delete_course(db, course.id)
+        db.close()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    return {
+        "submitted": len(courses),
+        "completed": saved,
+        "elapsed": elapsed,
+        "jobs_per_minute": saved / elapsed * 60 if elapsed else None,
+    }
+
+
+def format_seconds(value) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def print_report(mode: str, report: dict):
+    print(f"\n=== Generation benchmark ({mode}) ===")
+    print(f"Submitted:        {report['submitted']}")
+    print(f"Completed:        {report['completed']}")
+    for kind, counts in report.get("by_kind", {}).items():
+        print(f"  {kind:<15} {counts}")
+    if "retried" in report:
+        print(f"Retried:          {report['retried']}")
+    print(f"Elapsed:          {report['elapsed']:.1f}s")
+    if report["jobs_per_minute"] is not None:
+        print(f"Throughput:       {report['jobs_per_minute']:.1f} jobs/min")
+
+    if report.get("latency"):
+        print("\nJob latency        p50       p99")
+        for name, values in report["latency"].items():
+            print(
+                f"  {name:<14} {format_seconds(values['p50']):>9} "
+                f"{format_seconds(values['p99']):>9}"
+            )
+
+    print("\nProvider stage     calls     p50       p99       slot wait p50/p99")
+    for provider, stats in report["stages"].items():
+        if not stats["calls"]:
+            continue
+        print(
+            f"  {provider:<14} {stats['calls']:>6} {format_seconds(stats['p50']):>9} "
+            f"{format_seconds(stats['p99']):>9}   "
+            f"{format_seconds(stats['wait_p50'])} / {format_seconds(stats['wait_p99'])}"
+        )
+
+    print(
+        f"\nPeak RSS:         {report['peak_rss_mb']:.0f} MB "
+        f"(largest child process {report['peak_child_rss_mb']:.0f} MB)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test quiz generation against offline fake providers"
+    )
+    parser.add_argument("mode", choices=["api", "batch"])
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database to run against (or BENCH_DATABASE_URL)",
+    )
+    parser.add_argument("--jobs", type=int, default=50, help="Jobs or courses to run")
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Worker threads / batch concurrency"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Submissions per second (0 = burst)"
+    )
+    parser.add_argument(
+        "--video-share",
+        type=float,
+        default=0.3,
+        help="Fraction of api jobs that are video quizzes",
+    )
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF")
+    parser.add_argument("--questions", type=int, default=25, help="Questions per PDF")
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=0.05,
+        help="Multiplier for fake provider latencies (1 = real time)",
+    )
+    parser.add_argument("--llm-latency", default="lognormal:4:0.4")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.02)
+    parser.add_argument("--truncate-rate", type=float, default=0.05)
+    parser.add_argument("--transcribe-latency", default="lognormal:20:0.5")
+    parser.add_argument("--transcribe-failure-rate", type=float, default=0.02)
+    parser.add_argument("--transcript-words", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--timeout", type=float, default=1800, help="Give up waiting after this long"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the benchmark courses and jobs"
+    )
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url (or BENCH_DATABASE_URL) is required")
+
+    configure_environment(args)
+    from app import limits
+
+    run_id = uuid.uuid4().hex[:8]
+    limits.reset_latency_stats()
+    report = run_api(args, run_id) if args.mode == "api" else run_batch(args, run_id)
+
+    report["stages"] = limits.latency_stats()
+    report["peak_rss_mb"], report["peak_child_rss_mb"] = peak_rss_mb()
+    report["settings"] = {
+        key: value for key, value in vars(args).items() if key != "database_url"
+    }
+    print_report(args.mode, report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
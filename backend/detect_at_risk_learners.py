@@ -0,0 +1,37 @@
+import sys
+import os
+import logging
+
+# Setup path to import app modules
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal, engine
+from app import models
+from app.at_risk import detect_at_risk
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("AtRiskDetector")
+
+
+def run():
+    """Nightly job: rescore open enrollments and refresh at_risk_enrollments"""
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        result = detect_at_risk(db)
+        logger.info(
+            f"Done. {result['flagged']} of {result['scored']} open enrollments flagged."
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"At-risk detection failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,13 +1,19 @@
 import sys
 import os
+import argparse
+import json
 import logging
+import queue
+import threading
+import time
+from datetime import datetime
 
 # Setup path to import app modules
 sys.path.append(os.getcwd())
 
 from app.database import SessionLocal
-from app import crud, models
-from app.video_quiz import VideoQuizGenerator
+from app import jobs, models, quiz_tasks
+from app.quiz_provider import get_provider
 
 # Setup logging
 logging.basicConfig(
@@ -15,74 +21,349 @@ logging.basicConfig(
 )
 logger = logging.getLogger("BatchQuizGenerator")
 
+DEFAULT_CHECKPOINT = "generate_all_quizzes.checkpoint.jsonl"
+_DONE = object()  # Queue sentinel: no more work for this stage
 
-def generate_all():
+
+class Checkpoint:
+    """
+    Append-only JSON-lines log of per-course progress. The last record for a
+    course wins, so a crashed run resumes from where each course stopped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn write from a crash
+                    self.state[record["course_id"]] = record
+
+    def status(self, course_id: str):
+        record = self.state.get(course_id)
+        return record["status"] if record else None
+
+    def record(self, course_id: str, status: str, **details):
+        record = {
+            "course_id": course_id,
+            "status": status,
+            "at": datetime.utcnow().isoformat(),
+            **details,
+        }
+        with self._lock:
+            self.state[course_id] = record
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"saved": 0, "failed": 0}
+        self.stage_seconds = {"transcribe": [], "generate": [], "save": []}
+
+    def timing(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage].append(seconds)
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+
+def find_pending_courses(db, checkpoint: Checkpoint, skip_failed: bool):
+    """Courses with a video and no quiz that the checkpoint does not mark as done"""
+    pending = []
+    courses = db.query(models.Course).all()
+    logger.info(f"Scanning {len(courses)} courses for missing quizzes...")
+
+    for course in courses:
+        if not course.video_url:
+            logger.debug(f"Skipping {course.title}: No video URL")
+            continue
+        if course.quizzes:
+            continue
+
+        status = checkpoint.status(str(course.id))
+        if status == "saved":
+            continue
+        if status == "failed" and skip_failed:
+            logger.info(f"Skipping {course.title}: failed in a previous run")
+            continue
+        pending.append((str(course.id), course.title, course.video_url))
+    return pending
+
+
+def enqueue_pending(db, pending, checkpoint: Checkpoint) -> int:
+    """
+    Queue a bulk-priority video_quiz job per course instead of generating
+    in-process, so queue workers pick them up behind interactive requests.
+    Courses that already have a generation job queued or running are skipped.
+    """
+    active = {
+        (job.payload or {}).get("course_id")
+        for job in db.query(models.Job).filter(
+            models.Job.kind == "video_quiz",
+            models.Job.status.in_(("queued", "running")),
+        )
+    }
+    queued = 0
+    for course_id, title, video_url in pending:
+        if course_id in active:
+            logger.info(f"Skipping {title}: generation already queued")
+            continue
+        job = jobs.enqueue(
+            db,
+            "video_quiz",
+            {"course_id": course_id, "video_url": video_url, "regenerate": False},
+            priority=jobs.PRIORITY_BULK,
+        )
+        checkpoint.record(course_id, "queued", job_id=str(job.id))
+        queued += 1
+    return queued
+
+
+def transcribe_worker(inbox, outbox, checkpoint: Checkpoint, stats: Stats):
+    provider = get_provider()
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        course_id, title, video_url = item
+        started = time.monotonic()
+        try:
+            logger.info(f"[transcribe] {title} ({video_url})")
+            # Transcripts are cached by content, so resumed courses skip this cost
+            transcript = provider.transcribe(video_url)
+            if not transcript:
+                raise ValueError("Empty transcript")
+        except Exception as e:
+            logger.error(f"FAILED to transcribe {title}: {e}")
+            checkpoint.record(course_id, "failed", stage="transcribe", error=str(e))
+            stats.count("failed")
+            continue
+        stats.timing("transcribe", time.monotonic() - started)
+        checkpoint.record(course_id, "transcribed", chars=len(transcript))
+        outbox.put((course_id, title, transcript))
+
+
+def generate_worker(inbox, outbox, checkpoint: Checkpoint, stats: Stats):
+    provider = get_provider()
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        course_id, title, transcript = item
+        started = time.monotonic()
+        try:
+            logger.info(f"[generate] {title}")
+            questions = provider.generate_from_transcript(transcript)
+            if not questions:
+                raise ValueError("No questions generated")
+        except Exception as e:
+            logger.error(f"FAILED to generate quiz for {title}: {e}")
+            checkpoint.record(course_id, "failed", stage="generate", error=str(e))
+            stats.count("failed")
+            continue
+        stats.timing("generate", time.monotonic() - started)
+        checkpoint.record(course_id, "generated", questions=len(questions))
+        # The transcript rides along so the writer can replace near-duplicates
+        outbox.put((course_id, title, transcript, questions))
+
+
+def save_results(inbox, checkpoint: Checkpoint, stats: Stats):
+    """
+    Single writer: quizzes are committed from one thread with one session,
+    through the same near-duplicate filter as the job handlers
+    """
     db = SessionLocal()
     try:
-        # 1. Fetch all courses
-        courses = db.query(models.Course).all()
-        logger.info(f"Scanning {len(courses)} courses for missing quizzes...")
-
-        pending_courses = []
-        for course in courses:
-            if not course.video_url:
-                logger.debug(f"Skipping {course.title}: No video URL")
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            course_id, title, transcript, questions = item
+            started = time.monotonic()
+            try:
+                saved = quiz_tasks.save_video_quiz(
+                    db, course_id, f"Video Quiz: {title}", transcript, questions
+                )
+            except Exception as e:
+                logger.error(f"FAILED to save quiz for {title}: {e}")
+                db.rollback()
+                checkpoint.record(course_id, "failed", stage="save", error=str(e))
+                stats.count("failed")
                 continue
+            stats.timing("save", time.monotonic() - started)
+            checkpoint.record(course_id, "saved", quiz_id=saved["quiz_id"])
+            stats.count("saved")
+            logger.info(f"SUCCESS: Quiz saved and linked for {title}")
+    finally:
+        db.close()
 
-            # Check if quiz exists
-            # course.quizzes is a relationship, returns list
-            if not course.quizzes:
-                pending_courses.append(course)
 
-        logger.info(
-            f"Found {len(pending_courses)} courses needing quizzes: {[c.title for c in pending_courses]}"
-        )
+def run_stage(target, count: int, args) -> list:
+    threads = [
+        threading.Thread(target=target, args=args, daemon=True) for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
 
-        if not pending_courses:
-            logger.info(
-                "All applicable courses already have quizzes. No action needed."
+
+def print_summary(stats: Stats, total: int, elapsed: float):
+    done = stats.counts["saved"] + stats.counts["failed"]
+    print("\n=== Batch quiz generation summary ===")
+    print(f"Courses queued:   {total}")
+    print(f"Saved:            {stats.counts['saved']}")
+    print(f"Failed:           {stats.counts['failed']}")
+    print(f"Elapsed:          {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput:       {done / elapsed * 3600:.1f} courses/hour")
+    for stage, seconds in stats.stage_seconds.items():
+        if seconds:
+            print(
+                f"{stage:<17} avg {sum(seconds) / len(seconds):.1f}s, "
+                f"max {max(seconds):.1f}s over {len(seconds)} courses"
             )
-            return
 
-        # Initialize Generator once
-        generator = VideoQuizGenerator()
 
-        # 2. Process Loop
-        for i, course in enumerate(pending_courses, 1):
+def generate_all(
+    concurrency: int = 4,
+    transcribe_concurrency: int = None,
+    dry_run: bool = False,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    skip_failed: bool = False,
+    enqueue: bool = False,
+):
+    checkpoint = Checkpoint(checkpoint_path)
+    db = SessionLocal()
+    try:
+        pending = find_pending_courses(db, checkpoint, skip_failed)
+        if enqueue and pending and not dry_run:
+            queued = enqueue_pending(db, pending, checkpoint)
             logger.info(
-                f"--- Processing {i}/{len(pending_courses)}: {course.title} ({course.id}) ---"
+                f"Queued {queued} of {len(pending)} courses at bulk priority; "
+                "run_worker.py processes them"
             )
-            try:
-                # A. Transcription
-                logger.info(f"Step A: Transcribing video ({course.video_url})...")
-                # This uses our robust method (Youtube download proxy or direct)
-                transcript = generator.transcribe_video(course.video_url)
-                logger.info(f"Transcription complete ({len(transcript)} chars).")
-
-                # B. Quiz Generation
-                logger.info("Step B: Generating Quiz with Gemini...")
-                questions = generator.generate_quiz(transcript, course.title)
-                logger.info(f"Generated {len(questions)} questions.")
-
-                # C. Database Injection
-                logger.info("Step C: Saving to Database...")
-                quiz_title = f"Video Quiz: {course.title}"
-                new_quiz = models.Quiz(
-                    course_id=course.id, title=quiz_title, questions=questions
-                )
-                db.add(new_quiz)
-                db.commit()
-                db.refresh(new_quiz)
-                logger.info(f"SUCCESS: Quiz saved and linked for {course.title}")
+            return
+    finally:
+        db.close()
 
-            except Exception as e:
-                logger.error(f"FAILED to process {course.title}: {e}")
-                db.rollback()
+    logger.info(
+        f"Found {len(pending)} courses needing quizzes: {[title for _, title, _ in pending]}"
+    )
+    if not pending:
+        logger.info("All applicable courses already have quizzes. No action needed.")
+        return
+
+    transcribe_concurrency = transcribe_concurrency or concurrency
+    if dry_run:
+        for course_id, title, video_url in pending:
+            previous = checkpoint.status(course_id) or "new"
+            print(f"{course_id}  {title}  [{previous}]  {video_url}")
+        print(
+            f"\nDry run: {len(pending)} courses would be processed with "
+            f"{transcribe_concurrency} transcription and {concurrency} generation workers"
+        )
+        return
+
+    # Bounded queues give backpressure: transcription cannot run far ahead of
+    # generation and hold many transcripts in memory
+    course_queue = queue.Queue()
+    transcript_queue = queue.Queue(maxsize=concurrency * 2)
+    result_queue = queue.Queue(maxsize=concurrency * 2)
+    stats = Stats()
+    started = time.monotonic()
+
+    for item in pending:
+        course_queue.put(item)
+    for _ in range(transcribe_concurrency):
+        course_queue.put(_DONE)
 
+    transcribers = run_stage(
+        transcribe_worker,
+        transcribe_concurrency,
+        (course_queue, transcript_queue, checkpoint, stats),
+    )
+    generators = run_stage(
+        generate_worker,
+        concurrency,
+        (transcript_queue, result_queue, checkpoint, stats),
+    )
+    writer = run_stage(save_results, 1, (result_queue, checkpoint, stats))
+
+    try:
+        for thread in transcribers:
+            thread.join()
+        for _ in generators:
+            transcript_queue.put(_DONE)
+        for thread in generators:
+            thread.join()
+        result_queue.put(_DONE)
+        writer[0].join()
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; progress so far is in the checkpoint file")
     finally:
-        db.close()
+        print_summary(stats, len(pending), time.monotonic() - started)
         logger.info("Batch processing complete.")
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate quizzes for every course with a video and no quiz"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Quiz generation workers (also transcription workers unless set)",
+    )
+    parser.add_argument(
+        "--transcribe-concurrency",
+        type=int,
+        default=None,
+        help="Download/transcription workers",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="List the courses that would be processed and exit",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=DEFAULT_CHECKPOINT,
+        help="Progress file used to resume an interrupted run",
+    )
+    parser.add_argument(
+        "--skip-failed",
+        action="store_true",
+        help="Do not retry courses that failed in a previous run",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Queue bulk-priority jobs for the queue workers instead of "
+        "generating in this process",
+    )
+    args = parser.parse_args()
+
+    generate_all(
+        concurrency=max(1, args.concurrency),
+        transcribe_concurrency=args.transcribe_concurrency,
+        dry_run=args.dry_run,
+        checkpoint_path=args.checkpoint,
+        skip_failed=args.skip_failed,
+        enqueue=args.enqueue,
+    )
+
+
 if __name__ == "__main__":
-    generate_all()
+    main()
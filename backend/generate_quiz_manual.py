@@ -5,8 +5,8 @@ import os
 sys.path.append(os.getcwd())
 
 from app.database import SessionLocal
-from app import crud, models
-from app.video_quiz import VideoQuizGenerator
+from app import crud, models, quiz_tasks
+from app.quiz_provider import get_provider
 
 
 def generate():
@@ -21,25 +21,22 @@ def generate():
         print(f"Generating quiz for course: {course.title} ({course_id})")
         print(f"Video URL: {course.video_url}")
 
-        generator = VideoQuizGenerator()
+        generator = get_provider()
 
         print("Step 1: Transcribing video via AssemblyAI...")
-        transcript = generator.transcribe_video(course.video_url)
+        transcript = generator.transcribe(course.video_url)
         print(f"Transcription complete! Length: {len(transcript)} characters.")
 
         print("Step 2: Generating quiz questions via Gemini...")
-        questions = generator.generate_quiz(transcript, course.title)
+        questions = generator.generate_from_transcript(transcript)
         print(f"Generated {len(questions)} questions.")
 
         print("Step 3: Saving to database...")
         quiz_title = f"Video Quiz: {course.title}"
-        new_quiz = models.Quiz(
-            course_id=course_id, title=quiz_title, questions=questions
+        saved = quiz_tasks.save_video_quiz(
+            db, course_id, quiz_title, transcript, questions
         )
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
-        print(f"Success! Quiz saved with ID: {new_quiz.id}")
+        print(f"Success! Quiz saved with ID: {saved['quiz_id']}")
         print("Knowledge Check is now AVAILABLE.")
 
     except Exception as e:
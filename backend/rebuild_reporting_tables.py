@@ -0,0 +1,45 @@
+import sys
+import os
+import logging
+
+# Setup path to import app modules
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal, engine
+from app import crud, models
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("ReportingRebuild")
+
+
+def rebuild():
+    # Make sure the reporting tables exist before rebuilding them
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        logger.info(
+            "Rebuilding learning_facts from enrollments, progress and submissions..."
+        )
+        count = crud.rebuild_learning_facts(db)
+        logger.info(f"Rebuilt {count} learning fact rows.")
+
+        logger.info("Rebuilding quiz score histograms from submissions...")
+        count = crud.rebuild_score_histograms(db)
+        logger.info(f"Rebuilt score histograms for {count} quizzes.")
+
+        logger.info("Backfilling learner activity bitmaps...")
+        count = crud.rebuild_activity_bitmaps(db)
+        logger.info(f"Rebuilt activity bitmaps for {count} learners.")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Rebuild failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,110 @@
+import sys
+import os
+import argparse
+import logging
+import multiprocessing
+import socket
+import threading
+import time
+
+# Setup path to import app modules
+sys.path.append(os.getcwd())
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("JobWorker")
+
+
+def worker_loop(index, max_priority, poll_interval: float):
+    from app.database import SessionLocal
+    from app import jobs, quiz_tasks  # noqa: F401 - registers the job handlers
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    logger.info(f"Worker {worker_id} started (max priority: {max_priority})")
+
+    while True:
+        db = SessionLocal()
+        try:
+            ran = jobs.run_next(db, worker_id, max_priority=max_priority)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {e}", exc_info=True)
+            ran = False
+        finally:
+            db.close()
+
+        if not ran:
+            time.sleep(poll_interval)
+
+
+def worker_process(index: int, threads: int, max_priority, poll_interval: float):
+    """
+    Run several claim loops in one process. They share the per-provider limits in
+    app.limits, so slow transcriptions cannot starve Gemini calls or vice versa.
+    """
+    from app.quiz_provider import get_provider
+
+    # Build the shared provider once, before the claim loops start using it
+    try:
+        get_provider()
+    except Exception as e:
+        logger.warning(f"Quiz generation provider unavailable: {e}")
+
+    loops = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f"{index}.{t}", max_priority, poll_interval),
+            daemon=True,
+        )
+        for t in range(threads)
+    ]
+    for loop in loops:
+        loop.start()
+    for loop in loops:
+        loop.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run quiz generation job workers")
+    parser.add_argument(
+        "--processes", type=int, default=2, help="Number of worker processes"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=4, help="Concurrent jobs per worker process"
+    )
+    parser.add_argument(
+        "--max-priority",
+        type=int,
+        default=None,
+        help="Only claim jobs at or above this lane (0 = interactive only)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds to wait when the queue is empty",
+    )
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(
+            target=worker_process,
+            args=(i, args.threads, args.max_priority, args.poll_interval),
+            # Not daemonic: workers start their own PDF extraction pools
+        )
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping workers...")
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
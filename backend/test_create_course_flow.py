@@ -8,7 +8,7 @@ sys.path.append(os.getcwd())
 
 from fastapi.testclient import TestClient
 from app.main import app, get_current_active_admin
-from app import models
+from app import models, jobs, quiz_tasks  # noqa: F401 - registers job handlers
 from app.database import SessionLocal
 
 
@@ -34,8 +34,6 @@ def test_flow():
     }
 
     print("Sending POST /api/courses/ ...")
-    # Note: TestClient runs background tasks synchronously, so this will block until quiz is done.
-    # This proves the logic works.
     response = client.post("/api/courses/", json=course_data)
 
     if response.status_code != 200:
@@ -49,6 +47,11 @@ def test_flow():
     print("Checking database for quiz...")
     db = SessionLocal()
     try:
+        # Creation only enqueues generation; run the queued job in-process
+        print("Running queued generation job...")
+        while jobs.run_next(db, "test-worker"):
+            pass
+
         # Loop briefly to simulated async delay if any (though TestClient is sync)
         for _ in range(5):
             quiz = (
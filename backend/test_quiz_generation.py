@@ -0,0 +1,229 @@
+import json
+import os
+import queue
+import sys
+import tempfile
+import uuid
+
+# Add backend to path
+sys.path.append(os.getcwd())
+
+# Offline generation: fake backends with no simulated latency
+os.environ.setdefault("FAKE_TIME_SCALE", "0")
+
+import fitz  # PyMuPDF
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, get_current_active_admin
+from app import crud, models, jobs, quiz_provider, quiz_tasks  # noqa: F401
+from app.database import SessionLocal
+import generate_all_quizzes
+
+
+def make_admin():
+    return models.User(
+        id="00000000-0000-0000-0000-000000000000",
+        email="admin@test.com",
+        role="admin",
+        is_active=True,
+    )
+
+
+def make_pdf(text: str) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 540, 770), text)
+    return doc.tobytes()
+
+
+def counting_provider():
+    """Fake provider that counts the LLM calls it makes"""
+    provider = quiz_provider.build_provider("fake", "fake-model", "fake")
+    calls = []
+    complete, stream = provider.llm.complete, provider.llm.stream
+
+    def counted_complete(prompt, json_mode=True):
+        calls.append(prompt)
+        return complete(prompt, json_mode)
+
+    def counted_stream(prompt, json_mode=True):
+        calls.append(prompt)
+        return stream(prompt, json_mode)
+
+    provider.llm.complete = counted_complete
+    provider.llm.stream = counted_stream
+    return provider, calls
+
+
+def run_jobs(db):
+    while jobs.run_next(db, "test-worker"):
+        pass
+
+
+def test_same_pdf_twice_reuses_saved_quiz():
+    app.dependency_overrides[get_current_active_admin] = make_admin
+    client = TestClient(app)
+    provider, calls = counting_provider()
+    quiz_provider.set_provider(provider)
+
+    db = SessionLocal()
+    course = models.Course(title=f"Dedup test {uuid.uuid4()}", video_url="")
+    db.add(course)
+    db.commit()
+    try:
+        # Unique text so an earlier run's cache entry is not reused
+        pdf = make_pdf(f"Run {uuid.uuid4()}. " + "Load balancers spread traffic. " * 40)
+
+        def submit():
+            response = client.post(
+                f"/api/courses/{course.id}/generate-quiz?num_questions=5",
+                files={"file": ("notes.pdf", pdf, "application/pdf")},
+            )
+            assert response.status_code == 202, response.text
+            run_jobs(db)
+            job = db.get(models.Job, uuid.UUID(response.json()["job_id"]))
+            db.refresh(job)
+            assert job.status == "succeeded", job.last_error
+            return job.result
+
+        first = submit()
+        calls_after_first = len(calls)
+        assert calls_after_first > 0
+
+        second = submit()
+        assert second["quiz_id"] == first["quiz_id"]
+        assert second.get("existing") is True
+        assert len(calls) == calls_after_first, "repeat should not call the model"
+        quizzes = db.query(models.Quiz).filter(models.Quiz.course_id == course.id)
+        assert quizzes.count() == 1
+    finally:
+        quiz_provider.set_provider(None)
+        crud.delete_course(db, course.id)
+        db.close()
+
+
+def test_interactive_jobs_claimed_before_bulk():
+    db = SessionLocal()
+    course = models.Course(
+        title=f"Priority test {uuid.uuid4()}", video_url="https://example.com/v.mp4"
+    )
+    db.add(course)
+    db.commit()
+    ours = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = generate_all_quizzes.Checkpoint(
+                os.path.join(tmp, "checkpoint.jsonl")
+            )
+            pending = [(str(course.id), course.title, course.video_url)]
+            assert generate_all_quizzes.enqueue_pending(db, pending, checkpoint) == 1
+            # A rerun does not queue the course a second time
+            assert generate_all_quizzes.enqueue_pending(db, pending, checkpoint) == 0
+            bulk_id = uuid.UUID(checkpoint.state[str(course.id)]["job_id"])
+        ours.append(bulk_id)
+        assert db.get(models.Job, bulk_id).priority == jobs.PRIORITY_BULK
+
+        # Queued after the bulk job, but must be claimed first
+        interactive = jobs.enqueue(
+            db,
+            "video_quiz",
+            {"course_id": str(course.id), "video_url": course.video_url},
+            priority=jobs.PRIORITY_INTERACTIVE,
+        )
+        ours.append(interactive.id)
+
+        claimed = []
+        while bulk_id not in claimed:
+            job = jobs.claim(db, "test-worker")
+            assert job is not None, "bulk job was never claimed"
+            claimed.append(job.id)
+        assert claimed.index(interactive.id) < claimed.index(bulk_id)
+    finally:
+        db.query(models.Job).filter(models.Job.id.in_(ours)).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        crud.delete_course(db, course.id)
+        db.close()
+
+
+def test_batch_writer_skips_questions_already_in_course():
+    provider = quiz_provider.build_provider("fake", "fake-model", "fake")
+    quiz_provider.set_provider(provider)
+    db = SessionLocal()
+    video_url = f"https://example.com/{uuid.uuid4()}.mp4"
+    course = models.Course(
+        title=f"Batch dedup test {uuid.uuid4()}", video_url=video_url
+    )
+    db.add(course)
+    db.commit()
+    try:
+        transcript = provider.transcribe(video_url)
+        questions = provider.generate_from_transcript(transcript)
+        # Stands in for a quiz saved by an earlier run of some other script
+        earlier = quiz_tasks.save_video_quiz(
+            db, str(course.id), "Earlier quiz", transcript, questions
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = generate_all_quizzes.Checkpoint(
+                os.path.join(tmp, "checkpoint.jsonl")
+            )
+            inbox = queue.Queue()
+            inbox.put((str(course.id), course.title, transcript, questions))
+            inbox.put(generate_all_quizzes._DONE)
+            generate_all_quizzes.save_results(
+                inbox, checkpoint, generate_all_quizzes.Stats()
+            )
+            record = checkpoint.state[str(course.id)]
+
+        assert record["status"] == "saved"
+        assert record["quiz_id"] == earlier["quiz_id"]
+        quizzes = db.query(models.Quiz).filter(models.Quiz.course_id == course.id)
+        assert quizzes.count() == 1
+    finally:
+        quiz_provider.set_provider(None)
+        crud.delete_course(db, course.id)
+        db.close()
+
+
+class ShortLLMBackend(quiz_provider.LLMBackend):
+    """Always answers with the same two questions, whatever was asked for"""
+
+    name = "short"
+
+    def complete(self, prompt: str, json_mode: bool = True) -> str:
+        return json.dumps(
+            [
+                {
+                    "question": f"Which layer handles concern number {i}?",
+                    "options": ["A) one", "B) two", "C) three", "D) four"],
+                    "answer": "A",
+                }
+                for i in range(2)
+            ]
+        )
+
+
+def test_stream_fails_when_chunks_come_back_short():
+    quiz_provider.register_llm_backend("short", ShortLLMBackend)
+    provider = quiz_provider.build_provider("short", "short-model", "fake")
+    text = f"Run {uuid.uuid4()}. " + "Caches trade memory for latency. " * 40
+
+    streamed = []
+    with pytest.raises(ValueError, match="Generated only 2 of 10"):
+        for question in provider.stream_from_text(
+            text, num_questions=10, use_cache=False
+        ):
+            streamed.append(question)
+    # Questions already produced were still streamed before the error
+    assert len(streamed) == 2
+
+
+if __name__ == "__main__":
+    test_same_pdf_twice_reuses_saved_quiz()
+    test_interactive_jobs_claimed_before_bulk()
+    test_batch_writer_skips_questions_already_in_course()
+    test_stream_fails_when_chunks_come_back_short()
+    print("OK")
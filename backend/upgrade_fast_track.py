@@ -4,8 +4,8 @@ import logging
 
 sys.path.append(os.getcwd())
 from app.database import SessionLocal
-from app import crud, models
-from app.video_quiz import VideoQuizGenerator
+from app import crud, models, quiz_tasks
+from app.quiz_provider import get_provider
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -17,7 +17,7 @@ def fast_track():
     db = SessionLocal()
     try:
         courses = db.query(models.Course).all()
-        generator = VideoQuizGenerator()
+        generator = get_provider()
 
         for course in courses:
             # Skip massive files for urgent sync
@@ -49,19 +49,19 @@ def fast_track():
                 logger.info(f"--- Processing {course.title} ---")
                 try:
                     logger.info("Transcribing...")
-                    transcript = generator.transcribe_video(course.video_url)
+                    transcript = generator.transcribe(course.video_url)
 
                     logger.info("Generating 15 questions...")
-                    questions = generator.generate_quiz(transcript, course.title)
+                    questions = generator.generate_from_transcript(transcript)
 
                     logger.info(f"Saving {len(questions)} questions...")
-                    new_quiz = models.Quiz(
-                        course_id=course.id,
-                        title=f"Video Quiz v2: {course.title}",
-                        questions=questions,
+                    quiz_tasks.save_video_quiz(
+                        db,
+                        str(course.id),
+                        f"Video Quiz v2: {course.title}",
+                        transcript,
+                        questions,
                     )
-                    db.add(new_quiz)
-                    db.commit()
                     logger.info(f"SUCCESS: {course.title} updated.")
                 except Exception as e:
                     logger.error(f"Failed {course.title}: {e}")
@@ -6,8 +6,8 @@ import logging
 sys.path.append(os.getcwd())
 
 from app.database import SessionLocal
-from app import crud, models
-from app.video_quiz import VideoQuizGenerator
+from app import crud, models, quiz_tasks
+from app.quiz_provider import get_provider
 
 # Setup logging
 logging.basicConfig(
@@ -23,7 +23,7 @@ def upgrade_v2():
         logger.info(f"Scanning {len(courses)} courses for legacy quiz formats...")
 
         # Initialize generator
-        generator = VideoQuizGenerator()
+        generator = get_provider()
 
         for course in courses:
             if not course.video_url:
@@ -66,10 +66,10 @@ def upgrade_v2():
 def process_course(db, generator, course):
     try:
         logger.info(f"Step A: Transcribing '{course.title}' ({course.video_url})...")
-        transcript = generator.transcribe_video(course.video_url)
+        transcript = generator.transcribe(course.video_url)
 
         logger.info(f"Step B: Generating 15-Question Quiz...")
-        questions = generator.generate_quiz(transcript, course.title)
+        questions = generator.generate_from_transcript(transcript)
 
         if len(questions) != 15:
             logger.warning(
@@ -77,15 +77,14 @@ def process_course(db, generator, course):
             )
 
         logger.info(f"Step C: Saving {len(questions)} questions to DB...")
-        new_quiz = models.Quiz(
-            course_id=course.id,
-            title=f"Video Quiz v2: {course.title}",
-            questions=questions,
+        saved = quiz_tasks.save_video_quiz(
+            db,
+            str(course.id),
+            f"Video Quiz v2: {course.title}",
+            transcript,
+            questions,
         )
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
-        logger.info(f"SUCCESS: v2 Quiz saved for '{course.title}'")
+        logger.info(f"SUCCESS: v2 Quiz {saved['quiz_id']} saved for '{course.title}'")
 
     except Exception as e:
         logger.error(f"FAILED to process '{course.title}': {e}")
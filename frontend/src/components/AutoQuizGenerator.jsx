@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Sparkles, Loader2, AlertCircle } from 'lucide-react';
 import toast from 'react-hot-toast';
+import { jobService } from '../services/api';
 
 const AutoQuizGenerator = ({ courseId, onQuizGenerated }) => {
     const [isGenerating, setIsGenerating] = useState(false);
@@ -11,30 +12,20 @@ const AutoQuizGenerator = ({ courseId, onQuizGenerated }) => {
         setProgress('Finding PDF resources...');
 
         try {
-            const token = localStorage.getItem('token');
-
-            setProgress('Extracting text from PDF...');
-
-            const response = await fetch(
-                `http://localhost:8000/api/courses/${courseId}/auto-generate-quiz`,
-                {
-                    method: 'POST',
-                    headers: {
-                        'Authorization': `Bearer ${token}`,
-                        'Content-Type': 'application/json'
+            // Questions arrive one at a time as the model writes them
+            const result = await jobService.streamGeneration(
+                `/courses/${courseId}/auto-generate-quiz/stream`,
+                (event, data) => {
+                    if (event === 'status' && data.stage === 'extracting') {
+                        setProgress('Extracting text from PDF...');
+                    } else if (event === 'status' && data.stage === 'generating') {
+                        setProgress(`Generating ${data.num_questions} questions with AI...`);
+                    } else if (event === 'question') {
+                        setProgress(`Generated ${data.index + 1} of 25 questions...`);
                     }
                 }
             );
 
-            if (!response.ok) {
-                const error = await response.json();
-                throw new Error(error.detail || 'Failed to generate quiz');
-            }
-
-            setProgress('Generating 25 questions with AI...');
-
-            const result = await response.json();
-
             toast.success(`Generated ${result.num_questions} questions from ${result.resource_used}!`);
 
             // Callback to parent to refresh course data
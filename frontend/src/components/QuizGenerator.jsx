@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Sparkles, Loader2, CheckCircle, AlertCircle } from 'lucide-react';
 import toast from 'react-hot-toast';
+import { jobService } from '../services/api';
 
 const QuizGeneratorFromResource = ({ courseId, resources, onQuizGenerated }) => {
     const [selectedResourceId, setSelectedResourceId] = useState('');
@@ -44,7 +45,8 @@ const QuizGeneratorFromResource = ({ courseId, resources, onQuizGenerated }) =>
 
             setProgress('Generating 25 questions with AI...');
 
-            const result = await response.json();
+            const job = await response.json();
+            const result = await jobService.waitForJob(job.job_id);
 
             setProgress('Quiz generated successfully!');
 
@@ -388,7 +388,7 @@ const AdminDashboardContent = () => {
                     <div className="flex justify-between items-start">
                         <div>
                             <p className="text-xs font-semibold text-gray-500 uppercase tracking-wider">New Sign-ups</p>
-                            <h3 className="text-2xl font-bold text-gray-900 mt-1">{recentActivity ? recentActivity.length : 0}</h3>
+                            <h3 className="text-2xl font-bold text-gray-900 mt-1">{recentActivity ? recentActivity.filter(e => e.event_type === "signup").length : 0}</h3>
                         </div>
                         <span className="flex items-center text-green-500 text-xs font-medium bg-green-50 px-2 py-1 rounded-full">
                             <ArrowUpRight className="w-3 h-3 mr-1" /> +8.5%
@@ -402,21 +402,21 @@ const AdminDashboardContent = () => {
             {/* Recent Activity */}
             <div className="bg-white rounded-xl shadow-sm border border-gray-100 overflow-hidden">
                 <div className="p-6 border-b border-gray-100 flex justify-between items-center">
-                    <h3 className="text-lg font-bold text-gray-900">Recent Student Activity (New Signups)</h3>
+                    <h3 className="text-lg font-bold text-gray-900">Recent Student Activity</h3>
                     <button className="text-sm font-medium text-indigo-600 hover:text-indigo-700">View All</button>
                 </div>
                 <ul className="divide-y divide-gray-100">
-                    {recentActivity && recentActivity.length > 0 ? recentActivity.map((user, i) => (
-                        <li key={i} className="p-4 hover:bg-gray-50 transition-colors flex items-center">
+                    {recentActivity && recentActivity.length > 0 ? recentActivity.map((event, i) => (
+                        <li key={event.id || i} className="p-4 hover:bg-gray-50 transition-colors flex items-center">
                             <div className="h-10 w-10 rounded-full flex items-center justify-center bg-blue-100 text-blue-600 mr-4 font-bold">
-                                {user.full_name?.charAt(0)}
+                                {event.full_name?.charAt(0)}
                             </div>
                             <div className="flex-1">
-                                <p className="text-sm font-medium text-gray-900">{user.full_name}</p>
-                                <p className="text-xs text-gray-500">New Learner Signup</p>
+                                <p className="text-sm font-medium text-gray-900">{event.full_name}</p>
+                                <p className="text-xs text-gray-500">{event.description}</p>
                             </div>
                             <span className="text-xs text-gray-400">
-                                {new Date(user.created_at || Date.now()).toLocaleDateString()}
+                                {new Date(event.created_at || Date.now()).toLocaleDateString()}
                             </span>
                         </li>
                     )) : (
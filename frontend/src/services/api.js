@@ -186,4 +186,64 @@ export const userService = {
     }
 };
 
+export const jobService = {
+    getJob: async (jobId) => {
+        const response = await api.get(`/jobs/${jobId}`);
+        return response.data;
+    },
+    // Poll a queued generation job until it finishes; resolves with the job result
+    waitForJob: async (jobId, { interval = 2000, timeout = 600000 } = {}) => {
+        const deadline = Date.now() + timeout;
+        while (Date.now() < deadline) {
+            const job = await jobService.getJob(jobId);
+            if (job.status === "succeeded") return job.result;
+            if (job.status === "failed") {
+                throw new Error(job.last_error || "Quiz generation failed");
+            }
+            await new Promise((resolve) => setTimeout(resolve, interval));
+        }
+        throw new Error("Timed out waiting for quiz generation");
+    },
+    // POST to a streaming generation endpoint and call onEvent(event, data) for
+    // each server-sent event; resolves with the data of the final "done" event
+    streamGeneration: async (path, onEvent = () => {}) => {
+        const token = localStorage.getItem("token");
+        const response = await fetch(`${API_URL}${path}`, {
+            method: "POST",
+            headers: { Authorization: `Bearer ${token}` }
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || "Failed to generate quiz");
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                const message = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = "message";
+                let data = "";
+                for (const line of message.split("\n")) {
+                    if (line.startsWith("event: ")) event = line.slice(7);
+                    else if (line.startsWith("data: ")) data += line.slice(6);
+                }
+                const payload = data ? JSON.parse(data) : {};
+                if (event === "error") {
+                    throw new Error(payload.detail || "Quiz generation failed");
+                }
+                onEvent(event, payload);
+                if (event === "done") return payload;
+            }
+        }
+        throw new Error("Quiz generation stream ended unexpectedly");
+    }
+};
+
 export default api;